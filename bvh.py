@@ -0,0 +1,384 @@
+"""
+Bounding volume hierarchy over object or triangle bounds.
+
+The tree is array-backed and implicit:
+
+1. Items (boxes given as lo/hi corners) are sorted along a Morton curve of
+   their centers, so items close in space are close in the order
+2. Consecutive runs of leaf_size sorted items form the leaves; the leaf
+   count is padded to a power of two with empty boxes
+3. Level k of the tree is a pair of (2^k, 3) arrays; node i of level k has
+   children 2i and 2i + 1 on level k + 1
+
+There are no per-node Python objects: building, refitting and every query
+work on a whole level at a time with NumPy.
+
+- refit() updates the boxes after items moved, keeping the order (all
+  items, or only the ancestors of the changed ones)
+- cull() walks down with the frustum planes; a node completely inside
+  accepts its whole subtree without further tests
+- ray_candidates() walks down with a slab test; TriangleBVH.pick()
+  intersects the candidate triangles and returns the nearest hit
+"""
+
+import functools
+
+import numpy as np
+
+from projection import unproject_pixels
+
+MORTON_BITS = 10  # Per axis
+
+
+def spread_bits(values):
+    """Insert two zero bits between each of the low 10 bits (for Morton codes)"""
+    v = values.astype(np.uint64) & 0x3FF
+    v = (v | (v << 16)) & 0x030000FF
+    v = (v | (v << 8)) & 0x0300F00F
+    v = (v | (v << 4)) & 0x030C30C3
+    v = (v | (v << 2)) & 0x09249249
+    return v
+
+
+def morton_order(centers):
+    """Indices sorting points along a 3D Morton (Z-order) curve"""
+    lo = centers.min(axis=0)
+    extent = np.maximum(centers.max(axis=0) - lo, 1e-9)
+    cells = ((centers - lo) / extent * (2**MORTON_BITS - 1)).astype(np.uint64)
+    codes = (
+        spread_bits(cells[:, 0])
+        | (spread_bits(cells[:, 1]) << 1)
+        | (spread_bits(cells[:, 2]) << 2)
+    )
+    return np.argsort(codes, kind="stable")
+
+
+def reduce_middle(values, ufunc):
+    """ufunc (np.minimum/np.maximum) over axis 1 of an (N, k, 3) array
+
+    Combining the k slices pairwise is about twice as fast as
+    values.min(axis=1) when k is small.
+    """
+    return functools.reduce(ufunc, (values[:, i] for i in range(values.shape[1])))
+
+
+def box_plane_tests(lo, hi, planes):
+    """For (N, 3) boxes: (completely outside one plane, inside all planes)"""
+    normals, offsets = planes[:, :3], planes[:, 3]
+    # Corner furthest along each plane normal, and the opposite one
+    positive = normals[None, :, :] >= 0  # (1, P, 3)
+    far = np.where(positive, hi[:, None, :], lo[:, None, :])
+    near = np.where(positive, lo[:, None, :], hi[:, None, :])
+    outside = np.any(np.einsum("npk,pk->np", far, normals) + offsets < 0, axis=1)
+    inside = np.all(np.einsum("npk,pk->np", near, normals) + offsets >= 0, axis=1)
+    return outside, inside
+
+
+def frustum_planes(mvp_matrix, width, height, w_sign=-1.0, near=0.1):
+    """Planes (a, b, c, d) with a*x + b*y + c*z + d >= 0 inside the view
+
+    A point is visible when 0 <= X/W <= width, 0 <= Y/W <= height and
+    w_sign * W > near (W is negative in front of the camera with the
+    matrices from projection.py).
+    """
+    m = np.asarray(mvp_matrix, dtype=float)
+    s = w_sign
+    planes = np.array(
+        [
+            s * m[0],  # left
+            s * (width * m[3] - m[0]),  # right
+            s * m[1],  # top
+            s * (height * m[3] - m[1]),  # bottom
+            s * m[3],  # near
+        ]
+    )
+    planes[4, 3] -= near
+    return planes
+
+
+def camera_w_sign(camera, mvp_matrix):
+    """Sign of W for points in front of the camera"""
+    forward = np.array(camera.target, float) - np.array(camera.position, float)
+    return float(np.sign(np.asarray(mvp_matrix)[3, :3] @ forward))
+
+
+def screen_ray(x, y, camera, mvp_matrix):
+    """World-space ray (origin, unit direction) through screen pixel (x, y)"""
+    point = unproject_pixels([x], [y], [1.0], camera, mvp_matrix)[0]
+    origin = np.array(camera.position, dtype=float)
+    direction = point - origin
+    return origin, direction / np.linalg.norm(direction)
+
+
+def ray_triangle_distances(origin, direction, v0, v1, v2, epsilon=1e-9):
+    """Möller-Trumbore for many triangles at once; inf where missed"""
+    edge1 = v1 - v0
+    edge2 = v2 - v0
+    p = np.cross(direction, edge2)
+    det = np.einsum("ij,ij->i", edge1, p)
+    ok = np.abs(det) > epsilon
+    inv_det = np.where(ok, 1.0 / np.where(ok, det, 1.0), 0.0)
+
+    offset = origin - v0
+    u = np.einsum("ij,ij->i", offset, p) * inv_det
+    q = np.cross(offset, edge1)
+    v = (q @ direction) * inv_det
+    t = np.einsum("ij,ij->i", edge2, q) * inv_det
+
+    hit = ok & (u >= 0) & (v >= 0) & (u + v <= 1) & (t > epsilon)
+    return np.where(hit, t, np.inf)
+
+
+class BVH:
+    """Implicit binary BVH over item boxes (lo, hi: (N, 3) arrays)"""
+
+    def __init__(self, lo, hi, leaf_size=8):
+        self.leaf_size = leaf_size
+        self.build(lo, hi)
+
+    def build(self, lo, hi):
+        """Sort the items and create all levels"""
+        lo = np.asarray(lo, dtype=float)
+        hi = np.asarray(hi, dtype=float)
+        self.count = len(lo)
+        leaves = max(1, -(-self.count // self.leaf_size))
+        self.depth = int(np.ceil(np.log2(leaves))) if leaves > 1 else 0
+
+        self.order = morton_order((lo + hi) / 2) if self.count else np.arange(0)
+        # Position of every item in the sorted order, for partial refits
+        self.slot = np.empty(self.count, dtype=np.int64)
+        self.slot[self.order] = np.arange(self.count)
+
+        self.lo_levels = [None] * (self.depth + 1)
+        self.hi_levels = [None] * (self.depth + 1)
+        self.refit(lo, hi)
+
+    def _leaf_boxes(self, lo, hi, leaves=None):
+        """Boxes of the given leaves (all when None) from the item boxes"""
+        size = self.leaf_size
+        if leaves is None:
+            # Sort once, pad with empty boxes and reduce runs of leaf_size
+            padding = 2**self.depth * size - self.count
+            sorted_lo = np.concatenate([lo[self.order], np.full((padding, 3), np.inf)])
+            sorted_hi = np.concatenate([hi[self.order], np.full((padding, 3), -np.inf)])
+            return (
+                reduce_middle(sorted_lo.reshape(-1, size, 3), np.minimum),
+                reduce_middle(sorted_hi.reshape(-1, size, 3), np.maximum),
+            )
+        slots = leaves[:, None] * size + np.arange(size)  # (L, leaf_size)
+        valid = slots < self.count
+        items = self.order[np.minimum(slots, self.count - 1)]
+        leaf_lo = np.where(valid[..., None], lo[items], np.inf).min(axis=1)
+        leaf_hi = np.where(valid[..., None], hi[items], -np.inf).max(axis=1)
+        return leaf_lo, leaf_hi
+
+    def refit(self, lo, hi, changed=None):
+        """Recompute boxes after items moved (keeps the tree layout)
+
+        Args:
+            lo, hi: Current (N, 3) item boxes
+            changed: Optional indices of the items that moved; only their
+                leaves and ancestors are updated
+        """
+        lo = np.asarray(lo, dtype=float)
+        hi = np.asarray(hi, dtype=float)
+        self.item_lo, self.item_hi = lo, hi
+        if self.count == 0:
+            empty = np.full((1, 3), np.inf)
+            self.lo_levels[0], self.hi_levels[0] = empty, -empty
+            return
+
+        if changed is None or self.lo_levels[self.depth] is None:
+            self.lo_levels[self.depth], self.hi_levels[self.depth] = self._leaf_boxes(
+                lo, hi
+            )
+            for level in range(self.depth - 1, -1, -1):
+                below_lo = self.lo_levels[level + 1]
+                below_hi = self.hi_levels[level + 1]
+                self.lo_levels[level] = np.minimum(below_lo[0::2], below_lo[1::2])
+                self.hi_levels[level] = np.maximum(below_hi[0::2], below_hi[1::2])
+            return
+
+        nodes = np.unique(self.slot[np.asarray(changed)] // self.leaf_size)
+        leaf_lo, leaf_hi = self._leaf_boxes(lo, hi, nodes)
+        self.lo_levels[self.depth][nodes] = leaf_lo
+        self.hi_levels[self.depth][nodes] = leaf_hi
+        for level in range(self.depth - 1, -1, -1):
+            nodes = np.unique(nodes // 2)
+            below_lo = self.lo_levels[level + 1]
+            below_hi = self.hi_levels[level + 1]
+            self.lo_levels[level][nodes] = np.minimum(
+                below_lo[2 * nodes], below_lo[2 * nodes + 1]
+            )
+            self.hi_levels[level][nodes] = np.maximum(
+                below_hi[2 * nodes], below_hi[2 * nodes + 1]
+            )
+
+    def _items_of_leaves(self, leaf_mask):
+        """Item indices covered by the leaves set in a boolean leaf mask"""
+        item_mask = np.repeat(leaf_mask, self.leaf_size)[: self.count]
+        return self.order[item_mask]
+
+    def cull(self, planes):
+        """Indices of the items whose boxes are not outside any plane
+
+        Subtrees completely inside are accepted without further tests; in
+        leaves crossing a plane every item box is tested on its own.
+        """
+        accepted = np.zeros(2**self.depth, dtype=bool)  # Per leaf
+        nodes = np.array([0])
+        for level in range(self.depth + 1):
+            lo = self.lo_levels[level][nodes]
+            hi = self.hi_levels[level][nodes]
+            nonempty = np.all(lo <= hi, axis=1)
+            nodes, lo, hi = nodes[nonempty], lo[nonempty], hi[nonempty]
+            outside, inside = box_plane_tests(lo, hi, planes)
+
+            if inside.any():
+                # The whole subtree is visible: mark all its leaves
+                level_mask = np.zeros(2**level, dtype=bool)
+                level_mask[nodes[inside]] = True
+                accepted |= np.repeat(level_mask, 2 ** (self.depth - level))
+            partial = nodes[~outside & ~inside]
+            if level < self.depth:
+                nodes = np.concatenate([2 * partial, 2 * partial + 1])
+                if len(nodes) == 0:
+                    break
+
+        visible = self._items_of_leaves(accepted)
+        if level == self.depth and len(partial):
+            leaf_mask = np.zeros(2**self.depth, dtype=bool)
+            leaf_mask[partial] = True
+            items = self._items_of_leaves(leaf_mask)
+            outside, _ = box_plane_tests(
+                self.item_lo[items], self.item_hi[items], planes
+            )
+            visible = np.concatenate([visible, items[~outside]])
+        return visible
+
+    def ray_candidates(self, origin, direction):
+        """Indices of the items in leaves whose boxes the ray passes through"""
+        with np.errstate(divide="ignore"):
+            inv = 1.0 / np.where(direction == 0, 1e-300, direction)
+        nodes = np.array([0])
+        for level in range(self.depth + 1):
+            lo = self.lo_levels[level][nodes]
+            hi = self.hi_levels[level][nodes]
+            t1 = (lo - origin) * inv
+            t2 = (hi - origin) * inv
+            t_enter = np.minimum(t1, t2).max(axis=1)
+            t_exit = np.maximum(t1, t2).min(axis=1)
+            hit = (t_enter <= t_exit) & (t_exit >= 0)
+            nodes = nodes[hit]
+            if level < self.depth:
+                nodes = np.concatenate([2 * nodes, 2 * nodes + 1])
+            if len(nodes) == 0:
+                return np.arange(0)
+        leaf_mask = np.zeros(2**self.depth, dtype=bool)
+        leaf_mask[nodes] = True
+        return self._items_of_leaves(leaf_mask)
+
+
+class TriangleBVH(BVH):
+    """BVH over triangles, for ray picking"""
+
+    def __init__(self, triangles, leaf_size=8):
+        """
+        Args:
+            triangles: (N, 3, 3) array of world-space triangle vertices
+        """
+        self.triangles = np.asarray(triangles, dtype=float)
+        self.lo = reduce_middle(self.triangles, np.minimum)
+        self.hi = reduce_middle(self.triangles, np.maximum)
+        super().__init__(self.lo, self.hi, leaf_size)
+
+    def update(self, triangles, changed=None):
+        """New vertex positions (same triangle count): refit the boxes
+
+        With changed (indices of the triangles that moved) only those boxes
+        and their ancestors are recomputed.
+        """
+        self.triangles = np.asarray(triangles, dtype=float)
+        if changed is None:
+            self.lo = reduce_middle(self.triangles, np.minimum)
+            self.hi = reduce_middle(self.triangles, np.maximum)
+        else:
+            self.lo[changed] = reduce_middle(self.triangles[changed], np.minimum)
+            self.hi[changed] = reduce_middle(self.triangles[changed], np.maximum)
+        self.refit(self.lo, self.hi, changed)
+
+    def pick(self, origin, direction):
+        """Nearest triangle hit by the ray: (index, distance) or (None, inf)"""
+        candidates = self.ray_candidates(origin, direction)
+        if len(candidates) == 0:
+            return None, np.inf
+        tri = self.triangles[candidates]
+        t = ray_triangle_distances(origin, direction, tri[:, 0], tri[:, 1], tri[:, 2])
+        best = int(np.argmin(t))
+        if not np.isfinite(t[best]):
+            return None, np.inf
+        return int(candidates[best]), float(t[best])
+
+
+def benchmark(count, planes, origin, direction, rng):
+    """Timings (ms) of the BVH against brute force for count random triangles"""
+    import time
+
+    def timed(function, repeat=5):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            result = function()
+        return (time.perf_counter() - start) / repeat * 1000, result
+
+    centers = rng.uniform(-1000, 1000, (count, 1, 3))
+    triangles = centers + rng.uniform(-5, 5, (count, 3, 3))
+    moved = triangles.copy()
+    changed = rng.choice(count, count // 100, replace=False)
+    moved[changed] += 3.0
+    lo, hi = moved.min(axis=1), moved.max(axis=1)
+
+    def linear_cull():
+        outside, _ = box_plane_tests(lo, hi, planes)
+        return np.nonzero(~outside)[0]
+
+    def linear_pick():
+        t = ray_triangle_distances(
+            origin, direction, moved[:, 0], moved[:, 1], moved[:, 2]
+        )
+        best = int(np.argmin(t))
+        return (best, float(t[best])) if np.isfinite(t[best]) else (None, np.inf)
+
+    times = {}
+    times["build"], tree = timed(lambda: TriangleBVH(triangles), repeat=1)
+    times["refit"], _ = timed(lambda: tree.update(moved))
+    times["refit 1%"], _ = timed(lambda: tree.update(moved, changed))
+    times["cull"], visible = timed(lambda: tree.cull(planes))
+    times["linear cull"], linear_visible = timed(linear_cull)
+    times["pick"], hit = timed(lambda: tree.pick(origin, direction))
+    times["linear pick"], linear_hit = timed(linear_pick)
+
+    assert set(linear_visible.tolist()) == set(visible.tolist())
+    assert hit == linear_hit
+    return times
+
+
+if __name__ == "__main__":
+    from projection import create_mvp_matrix
+
+    class BenchmarkCamera:
+        position = [-1500.0, 800.0, 1500.0]
+        target = [0.0, 0.0, 0.0]
+        focal_length = 500
+
+    camera = BenchmarkCamera()
+    mvp_matrix = create_mvp_matrix(camera, 800, 600)
+    planes = frustum_planes(mvp_matrix, 800, 600, camera_w_sign(camera, mvp_matrix))
+    origin, direction = screen_ray(400, 300, camera, mvp_matrix)
+    rng = np.random.default_rng(0)
+
+    for count in (10_000, 100_000, 1_000_000):
+        times = benchmark(count, planes, origin, direction, rng)
+        print(  # noqa: T201
+            f"{count:>9} triangles: "
+            + ", ".join(f"{name} {ms:.2f} ms" for name, ms in times.items())
+        )
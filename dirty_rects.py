@@ -0,0 +1,142 @@
+"""
+Dirty-rectangle tracking for incremental redraw.
+
+When the camera is still and only a few objects move, most of the frame is
+identical to the previous one. Instead of clearing and re-rasterizing the
+whole screen we:
+
+1. Track each object's screen-space bounds and a key describing its state
+2. Mark the old and new bounds of every object whose key changed as dirty
+3. Merge the dirty rectangles, then clear and redraw only those regions,
+   keeping the rest of the previous frame and depth buffer
+
+Rectangles are (x0, y0, x1, y1) in pixels, end exclusive.
+"""
+
+import collections
+
+import numpy as np
+
+DEBUG_OUTLINE_COLOR = (255, 255, 0)
+
+
+def rect_area(rect):
+    x0, y0, x1, y1 = rect
+    return max(0, x1 - x0) * max(0, y1 - y0)
+
+
+def rects_intersect(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def rect_union(a, b):
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+def clamp_rect(rect, width, height):
+    x0, y0, x1, y1 = rect
+    return (max(0, x0), max(0, y0), min(width, x1), min(height, y1))
+
+
+def merge_rects(rects, gap=0):
+    """Merge rectangles that overlap (or are closer than gap) until none do"""
+    merged = list(rects)
+    changed = True
+    while changed:
+        changed = False
+        result = []
+        for rect in merged:
+            grown = (rect[0] - gap, rect[1] - gap, rect[2] + gap, rect[3] + gap)
+            for i, other in enumerate(result):
+                if rects_intersect(grown, other):
+                    result[i] = rect_union(rect, other)
+                    changed = True
+                    break
+            else:
+                result.append(rect)
+        merged = result
+    return merged
+
+
+def draw_rect_outlines(pixels, rects, color=DEBUG_OUTLINE_COLOR):
+    """Outline rectangles on a frame (for the debug view)"""
+    height, width = pixels.shape[:2]
+    for rect in rects:
+        x0, y0, x1, y1 = clamp_rect(rect, width, height)
+        if x1 <= x0 or y1 <= y0:
+            continue
+        pixels[y0, x0:x1] = color
+        pixels[y1 - 1, x0:x1] = color
+        pixels[y0:y1, x0] = color
+        pixels[y0:y1, x1 - 1] = color
+
+
+class DirtyRectTracker:
+    """Compute which screen regions must be redrawn this frame"""
+
+    def __init__(self, width, height, merge_gap=8, full_redraw_fraction=0.6):
+        """
+        Args:
+            width, height: Frame size in pixels
+            merge_gap: Rectangles closer than this are merged into one
+            full_redraw_fraction: Above this dirty fraction, redraw everything
+        """
+        self.width = width
+        self.height = height
+        self.merge_gap = merge_gap
+        self.full_redraw_fraction = full_redraw_fraction
+
+        self.previous = None  # name -> (state_key, rect)
+        self.previous_view_key = None
+        self.last_fraction = 1.0
+        self.fractions = collections.deque(maxlen=120)
+
+    def reset(self, width=None, height=None):
+        """Forget the previous frame (next frame is a full redraw)"""
+        self.width = width or self.width
+        self.height = height or self.height
+        self.previous = None
+        self.previous_view_key = None
+
+    def update(self, view_key, objects):
+        """Return the dirty rectangles for this frame
+
+        Args:
+            view_key: Camera/projection state; any change means a full redraw
+            objects: Dict name -> (state_key, rect) for every scene object
+        """
+        full = (0, 0, self.width, self.height)
+        if self.previous is None or view_key != self.previous_view_key:
+            rects = [full]
+        else:
+            rects = []
+            for name in self.previous.keys() | objects.keys():
+                old = self.previous.get(name)
+                new = objects.get(name)
+                if old is not None and new is not None and old[0] == new[0]:
+                    continue
+                for entry in (old, new):
+                    if entry is not None:
+                        rects.append(entry[1])
+
+            rects = [clamp_rect(rect, self.width, self.height) for rect in rects]
+            rects = merge_rects([r for r in rects if rect_area(r) > 0], self.merge_gap)
+            total = sum(rect_area(rect) for rect in rects)
+            if total > self.full_redraw_fraction * self.width * self.height:
+                rects = [full]
+
+        self.previous = dict(objects)
+        self.previous_view_key = view_key
+        self.last_fraction = sum(rect_area(r) for r in rects) / (
+            self.width * self.height
+        )
+        self.fractions.append(self.last_fraction)
+        return rects
+
+    def get_stats(self):
+        return {
+            "redrawn_fraction": self.last_fraction,
+            "avg_redrawn_fraction": (
+                float(np.mean(self.fractions)) if self.fractions else 1.0
+            ),
+        }
@@ -0,0 +1,114 @@
+"""
+Dynamic resolution: keep frame time on budget by changing how many pixels
+we rasterize.
+
+The cost of the CPU pipeline grows with the number of pixels, so we render
+at an internal resolution (window size * scale) and let the SDL texture
+scaler stretch it to the window at present time.
+
+ResolutionController watches the recent frame times:
+- over budget: shrink the scale. Pixel count goes with scale^2, so the new
+  scale is old * sqrt(target / measured)
+- comfortably under budget (below headroom * target): grow by one step
+Scales are snapped to SCALE_QUANTUM so the buffers are not resized on
+every small fluctuation.
+"""
+
+import collections
+import math
+
+import numpy as np
+
+SCALE_QUANTUM = 1 / 16
+
+
+def scaled_size(width, height, scale):
+    """Internal render size for a window size and scale factor"""
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def upscale_nearest(pixels, width, height):
+    """Nearest-neighbour resize of an RGB frame to (height, width)
+
+    Used where a full-size frame is needed on the CPU (recording, streaming);
+    the window itself is scaled by SDL.
+    """
+    src_height, src_width = pixels.shape[:2]
+    if (src_width, src_height) == (width, height):
+        return pixels
+    rows = np.arange(height) * src_height // height
+    cols = np.arange(width) * src_width // width
+    return pixels[rows[:, None], cols[None, :]]
+
+
+class ResolutionController:
+    def __init__(
+        self,
+        target_frame_ms=33.0,
+        min_scale=0.25,
+        max_scale=1.0,
+        window=8,
+        step=SCALE_QUANTUM,
+        headroom=0.7,
+        history_size=600,
+    ):
+        """
+        Args:
+            target_frame_ms: Frame time budget for rendering
+            min_scale, max_scale: Limits for the resolution scale
+            window: Number of frames averaged before deciding
+            step: How much the scale grows when we are under budget
+            headroom: Only grow when frames take less than this * budget
+            history_size: Number of (frame, scale) entries kept as metrics
+        """
+        self.target = target_frame_ms / 1000
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+        self.step = step
+        self.headroom = headroom
+
+        self.scale = max_scale
+        self.frame_times = collections.deque(maxlen=window)
+        self.history = collections.deque(maxlen=history_size)
+        self.frame_index = 0
+        self.changes = 0
+        self.last_average = 0.0
+
+    def _clamp(self, scale):
+        scale = math.floor(scale / SCALE_QUANTUM) * SCALE_QUANTUM
+        return min(self.max_scale, max(self.min_scale, scale))
+
+    def update(self, frame_seconds):
+        """Record one frame time; returns (scale, changed)"""
+        self.frame_index += 1
+        self.frame_times.append(frame_seconds)
+        if len(self.frame_times) < self.frame_times.maxlen:
+            return self.scale, False
+
+        average = sum(self.frame_times) / len(self.frame_times)
+        self.last_average = average
+
+        new_scale = self.scale
+        if average > self.target:
+            new_scale = self._clamp(self.scale * math.sqrt(self.target / average))
+        elif average < self.target * self.headroom:
+            new_scale = self._clamp(self.scale + self.step)
+
+        if new_scale == self.scale:
+            return self.scale, False
+
+        self.scale = new_scale
+        self.changes += 1
+        self.history.append((self.frame_index, new_scale))
+        # Measure the new resolution from scratch
+        self.frame_times.clear()
+        return self.scale, True
+
+    def get_metrics(self):
+        return {
+            "scale": self.scale,
+            "avg_frame_ms": self.last_average * 1000,
+            "target_ms": self.target * 1000,
+            "changes": self.changes,
+            "history": list(self.history),
+        }
@@ -0,0 +1,110 @@
+"""
+Frame pacing: decide when the next frame should start.
+
+A fixed SDL_Delay(16) after every frame adds 16 ms on top of however long
+the frame took (a 10 ms frame runs at ~38 FPS, a 20 ms one at ~28 FPS).
+FrameScheduler instead keeps a deadline per frame and only sleeps for the
+time that is left.
+
+Modes:
+- "fixed": sleep until the next deadline at target_fps
+- "vsync": no sleeping, present() blocks on the display refresh
+  (the renderer must be created with SDL_RENDERER_PRESENTVSYNC)
+- "uncapped": never sleep, for benchmarking
+- "on_demand": like "fixed", but frames whose camera/scene state did not
+  change since the last rendered frame are skipped entirely
+"""
+
+import time
+
+MODES = ("fixed", "vsync", "uncapped", "on_demand")
+
+# time.sleep() can overshoot by a bit; spin for the last part of the wait
+SPIN_THRESHOLD = 0.001
+
+
+class FrameScheduler:
+    def __init__(self, mode="fixed", target_fps=60, max_catchup_frames=2):
+        """
+        Args:
+            mode: One of MODES
+            target_fps: Frame rate the deadlines are spaced for
+            max_catchup_frames: When we fall further behind than this many
+                frames, the schedule is reset instead of rushing to catch up
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown frame pacing mode {mode!r}, expected {MODES}")
+        self.mode = mode
+        self.frame_interval = 1.0 / target_fps
+        self.max_catchup_frames = max_catchup_frames
+
+        self.next_deadline = None
+        self.last_frame_start = None
+        self.last_state_key = None
+
+        self.frames = 0
+        self.missed_deadlines = 0
+        self.skipped_frames = 0
+
+    def should_render(self, state_key=None):
+        """Return False when on_demand mode can skip this frame
+
+        Args:
+            state_key: Any comparable value describing the camera and scene
+        """
+        if self.mode != "on_demand" or state_key is None:
+            return True
+        if state_key == self.last_state_key:
+            self.skipped_frames += 1
+            return False
+        self.last_state_key = state_key
+        return True
+
+    def request_redraw(self):
+        """Force the next on_demand frame to render (e.g. after a resize)"""
+        self.last_state_key = None
+
+    def wait(self):
+        """Block until the next frame should start and update the counters"""
+        now = time.perf_counter()
+        self.frames += 1
+
+        if self.mode == "uncapped":
+            self.last_frame_start = now
+            return
+
+        if self.mode == "vsync":
+            # present() already waited for the refresh; a frame that took
+            # noticeably longer than one interval missed at least one vblank
+            if self.last_frame_start is not None:
+                if now - self.last_frame_start > self.frame_interval * 1.5:
+                    self.missed_deadlines += 1
+            self.last_frame_start = now
+            return
+
+        if self.next_deadline is None:
+            self.next_deadline = now + self.frame_interval
+
+        if now > self.next_deadline:
+            self.missed_deadlines += 1
+            behind = now - self.next_deadline
+            if behind > self.frame_interval * self.max_catchup_frames:
+                # Too far behind: start a fresh schedule from now
+                self.next_deadline = now
+        else:
+            remaining = self.next_deadline - now
+            if remaining > SPIN_THRESHOLD:
+                time.sleep(remaining - SPIN_THRESHOLD)
+            while time.perf_counter() < self.next_deadline:
+                pass
+
+        self.next_deadline += self.frame_interval
+        self.last_frame_start = time.perf_counter()
+
+    def get_stats(self):
+        return {
+            "mode": self.mode,
+            "frames": self.frames,
+            "missed_deadlines": self.missed_deadlines,
+            "skipped_frames": self.skipped_frames,
+        }
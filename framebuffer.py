@@ -0,0 +1,176 @@
+"""
+CPU framebuffer for the software rendering pipeline.
+
+Instead of sending every pixel to SDL with draw_point(), we paint into a
+NumPy array (height x width x RGB) and upload the whole frame once per frame:
+
+- FrameBufferRenderer: a drop-in stand-in for sdl2.ext.Renderer that the
+  rasterizer and the draw_* functions can paint into
+- NullRenderer: accepts the same calls and draws nothing (depth pre-pass)
+- create_frame_texture / present_frame_buffer: copy the array into an SDL
+  streaming texture and show it in the window
+
+Only those two functions need SDL and they import it on first use, so the
+frame buffer (and worker processes painting into it) load without SDL.
+"""
+
+import ctypes
+
+import numpy as np
+
+# Global frame buffer - will be initialized by main.py (like the z-buffer)
+frame_buffer = None
+
+
+def init_frame_buffer(width, height, buffer=None):
+    """Initialize the global frame buffer
+
+    Args:
+        width, height: Size of the frame in pixels
+        buffer: Optional existing (height, width, 3) uint8 array to use as
+            storage (e.g. a view into shared memory)
+    """
+    global frame_buffer
+    if buffer is None:
+        buffer = np.zeros((height, width, 3), dtype=np.uint8)
+    frame_buffer = buffer
+    frame_buffer.fill(0)
+    return frame_buffer
+
+
+def clear_frame_buffer(color=(0, 0, 0)):
+    """Clear the frame buffer with a solid color"""
+    if frame_buffer is not None:
+        frame_buffer[:] = color
+
+
+def _to_rgb(color):
+    """Accept an sdl2.ext.Color or an (r, g, b[, a]) tuple"""
+    if hasattr(color, "r"):
+        return (color.r, color.g, color.b)
+    return (color[0], color[1], color[2])
+
+
+class FrameBufferRenderer:
+    """Minimal renderer that paints into a NumPy RGB array
+
+    Implements the subset of sdl2.ext.Renderer used by the pipeline
+    (color, clear, draw_point, draw_line), so the same drawing code works
+    with a window or with an in-memory frame.
+    """
+
+    def __init__(self, pixels):
+        self.pixels = pixels
+        self.height, self.width = pixels.shape[:2]
+        self._color = (255, 255, 255)
+        # Optional (x0, y0, x1, y1) scissor rectangle, end exclusive
+        self.clip_rect = None
+
+    @property
+    def color(self):
+        return self._color
+
+    @color.setter
+    def color(self, value):
+        self._color = _to_rgb(value)
+
+    def _bounds(self):
+        if self.clip_rect is None:
+            return 0, 0, self.width, self.height
+        x0, y0, x1, y1 = self.clip_rect
+        return max(0, x0), max(0, y0), min(self.width, x1), min(self.height, y1)
+
+    def clear(self):
+        """Fill the (clipped) frame with the current color"""
+        x0, y0, x1, y1 = self._bounds()
+        self.pixels[y0:y1, x0:x1] = self._color
+
+    def draw_point(self, point):
+        """Paint a single pixel, ignoring points outside the frame"""
+        x, y = int(point[0]), int(point[1])
+        x0, y0, x1, y1 = self._bounds()
+        if x0 <= x < x1 and y0 <= y < y1:
+            self.pixels[y, x] = self._color
+
+    def draw_line(self, line):
+        """Paint a line given as (x1, y1, x2, y2)
+
+        Samples one point per pixel along the longest axis (DDA), then
+        drops the samples that fall outside the frame.
+        """
+        xa, ya, xb, yb = line
+        steps = int(max(abs(xb - xa), abs(yb - ya))) + 1
+        # Lines from points far behind the camera can be huge; clamp the work
+        steps = min(steps, 4 * (self.width + self.height))
+        xs = np.rint(np.linspace(xa, xb, steps)).astype(np.int64)
+        ys = np.rint(np.linspace(ya, yb, steps)).astype(np.int64)
+
+        x0, y0, x1, y1 = self._bounds()
+        inside = (xs >= x0) & (xs < x1) & (ys >= y0) & (ys < y1)
+        self.pixels[ys[inside], xs[inside]] = self._color
+
+    def present(self):
+        """Nothing to flip - the pixels are already in memory"""
+
+
+class NullRenderer:
+    """Renderer that discards everything drawn into it
+
+    Target of a depth pre-pass: the rasterizers only write the z-buffer,
+    and lines and points (wireframe, axes) are skipped until the color pass.
+    """
+
+    color = (0, 0, 0)
+    clip_rect = None
+
+    def clear(self):
+        pass
+
+    def draw_point(self, point):
+        pass
+
+    def draw_line(self, line):
+        pass
+
+    def present(self):
+        pass
+
+
+def create_frame_texture(renderer, width, height):
+    """Create an SDL streaming texture that frames are uploaded into
+
+    Frames smaller than the texture are drawn from its top-left corner and
+    stretched to the window, so use linear filtering for the upscale.
+    """
+    import sdl2
+
+    sdl2.SDL_SetHint(sdl2.SDL_HINT_RENDER_SCALE_QUALITY, b"linear")
+    texture = sdl2.SDL_CreateTexture(
+        renderer.sdlrenderer,
+        sdl2.SDL_PIXELFORMAT_RGB24,
+        sdl2.SDL_TEXTUREACCESS_STREAMING,
+        width,
+        height,
+    )
+    if not texture:
+        raise RuntimeError(f"Texture creation failed: {sdl2.SDL_GetError()}")
+    return texture
+
+
+def present_frame_buffer(renderer, texture, pixels):
+    """Upload the frame to the texture and show it in the window
+
+    pixels may be a top-left view of a larger buffer (reduced render
+    resolution): rows are uploaded using the view's stride, no copy needed.
+    """
+    import sdl2
+
+    if pixels.strides[1:] != (3, 1):
+        pixels = np.ascontiguousarray(pixels)
+    height, width = pixels.shape[:2]
+    rect = sdl2.SDL_Rect(0, 0, width, height)
+    sdl2.SDL_UpdateTexture(
+        texture, rect, pixels.ctypes.data_as(ctypes.c_void_p), pixels.strides[0]
+    )
+    sdl2.SDL_RenderCopy(renderer.sdlrenderer, texture, rect, None)
+    renderer.present()
@@ -0,0 +1,333 @@
+"""
+Streaming geometry pipeline: a mesh flows through the stages in chunks.
+
+Drawing a mesh used to project every vertex into one Python list and build a
+color per triangle for the whole mesh before the first triangle was drawn,
+so memory grew with the mesh. Here the triangles go through the stages in
+chunks of at most chunk_size:
+
+1. read: gather the chunk's vertex positions and face colors from the
+   (possibly memory-mapped) mesh arrays
+2. transform: model matrix, then MVP matrix, to clip coordinates
+3. clip: drop triangles with a vertex behind or too close to the camera and
+   triangles entirely off one side of the screen, then divide by w
+4. cull: drop triangles with no screen area (and back faces if enabled)
+5. rasterize: hand every remaining triangle to the draw callback
+6. shade: the part of the rasterize time spent in fragment shaders (see
+   shading.py), reported as its own stage
+
+Each stage is a generator pulling chunks from the previous one, so only a
+chunk or two is alive at any time: peak memory depends on chunk_size, not
+on the mesh. Time spent and triangles received are tracked per stage.
+"""
+
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from shading import shader_stats
+
+STAGES = ("read", "transform", "clip", "cull", "rasterize", "shade")
+
+# Same visibility rule as projection.project_3d_to_2d_via_matrix
+MIN_W = 0.1
+
+# How far a mesh's vertex colors are blended towards the object color
+VERTEX_COLOR_TINT = 0.3
+
+
+@dataclass(slots=True)
+class TriangleChunk:
+    # (n, 3, k) per-vertex coordinates: model space (k=3), clip space (k=4),
+    # then screen x, y and depth (k=3)
+    points: np.ndarray
+    # (n, 3) color of each triangle, or (n, 3, 3) color of each vertex
+    colors: np.ndarray
+
+    def __len__(self):
+        return len(self.points)
+
+    def keep(self, mask):
+        return TriangleChunk(self.points[mask], self.colors[mask])
+
+
+@dataclass(slots=True)
+class StageStats:
+    triangles: int = 0
+    seconds: float = 0.0
+
+    @property
+    def triangles_per_second(self):
+        return self.triangles / self.seconds if self.seconds else 0.0
+
+
+class GeometryPipeline:
+    """Chunked transform -> clip -> cull -> rasterize for large meshes"""
+
+    def __init__(self, chunk_size=4096, backface_culling=False, vertex_colors=False):
+        """
+        Args:
+            chunk_size: Triangles per chunk (bounds the pipeline's memory)
+            backface_culling: Drop triangles facing away from the camera
+                (counter-clockwise seen from outside is front, as in OBJ)
+            vertex_colors: Pass the three vertex colors of each triangle to
+                draw (for Gouraud shading) instead of their average
+        """
+        self.chunk_size = chunk_size
+        self.backface_culling = backface_culling
+        self.vertex_colors = vertex_colors
+        self.stats = {name: StageStats() for name in STAGES}
+
+    def _timed(self, name, chunks, process):
+        """Run process(chunk) on every chunk, timing it as stage name"""
+        stats = self.stats[name]
+        for chunk in chunks:
+            start = time.perf_counter()
+            result = process(chunk)
+            stats.seconds += time.perf_counter() - start
+            stats.triangles += len(chunk)
+            if len(result):
+                yield result
+
+    def read(self, mesh, color, tint):
+        """Chunks of model-space triangles with their flat colors
+
+        A triangle's color is the average of its vertex colors tinted
+        towards color (or just color when the mesh has no vertex colors).
+        With vertex_colors the tinted vertex colors are kept instead.
+        """
+        color = np.asarray(color, dtype=float)
+        for start in range(0, len(mesh.indices), self.chunk_size):
+            begin = time.perf_counter()
+            indices = np.asarray(mesh.indices[start : start + self.chunk_size])
+            points = mesh.vertices[indices].astype(float)
+            if mesh.colors is None:
+                colors = np.broadcast_to(color, (*indices.shape, 3))
+            else:
+                colors = mesh.colors[indices] * (1 - tint) + color * tint
+            if not self.vertex_colors:
+                colors = colors.mean(axis=1)
+            chunk = TriangleChunk(points, colors.astype(np.int64))
+            self.stats["read"].seconds += time.perf_counter() - begin
+            self.stats["read"].triangles += len(chunk)
+            yield chunk
+
+    def transform(self, chunks, matrix):
+        """Apply matrix (MVP @ model) to every vertex: (n, 3, 4) clip space"""
+
+        def process(chunk):
+            points = chunk.points @ matrix[:, :3].T + matrix[:, 3]
+            return TriangleChunk(points, chunk.colors)
+
+        return self._timed("transform", chunks, process)
+
+    def clip(self, chunks, w_sign, width, height):
+        """Keep triangles in front of the camera and touching the screen
+
+        Returns screen-space chunks: truncated x, y and depth = |w| per
+        vertex, like projection.project_points_via_matrix.
+        """
+
+        def process(chunk):
+            w = chunk.points[:, :, 3]
+            chunk = chunk.keep(np.all(w * w_sign > MIN_W, axis=1))
+            w = chunk.points[:, :, 3]
+            xs = np.trunc(chunk.points[:, :, 0] / w)
+            ys = np.trunc(chunk.points[:, :, 1] / w)
+            onscreen = ~(
+                np.all(xs < 0, axis=1)
+                | np.all(xs >= width, axis=1)
+                | np.all(ys < 0, axis=1)
+                | np.all(ys >= height, axis=1)
+            )
+            points = np.stack([xs, ys, np.abs(w)], axis=2)
+            return TriangleChunk(points, chunk.colors).keep(onscreen)
+
+        return self._timed("clip", chunks, process)
+
+    def cull(self, chunks):
+        """Drop degenerate triangles (they cover no pixel) and back faces"""
+
+        def process(chunk):
+            p = chunk.points
+            area = (p[:, 1, 0] - p[:, 0, 0]) * (p[:, 2, 1] - p[:, 0, 1]) - (
+                p[:, 2, 0] - p[:, 0, 0]
+            ) * (p[:, 1, 1] - p[:, 0, 1])
+            # Positive for triangles counter-clockwise as seen by the camera
+            keep = area > 0 if self.backface_culling else area != 0
+            return chunk.keep(keep)
+
+        return self._timed("cull", chunks, process)
+
+    def rasterize(self, chunks, draw, flush=None, draw_chunk=None):
+        """Call draw(p1, p2, p3, z1, z2, z3, color) for every triangle
+
+        color is an (r, g, b) tuple, or a tuple of three of them with
+        vertex_colors. Shader time inside draw is moved to the shade stage.
+
+        Args:
+            flush: Optional function called after each chunk's triangles,
+                for draw callbacks that queue them (batched rasterizers)
+            draw_chunk: Optional function (points, colors) taking a whole
+                chunk instead of draw: (n, 3, 3) screen x, y and depth per
+                vertex, and the colors as passed to draw
+        """
+        stats, shade = self.stats["rasterize"], self.stats["shade"]
+        for chunk in chunks:
+            start = time.perf_counter()
+            shaded_before = (shader_stats["triangles"], shader_stats["seconds"])
+            if draw_chunk is not None:
+                draw_chunk(chunk.points, chunk.colors)
+            else:
+                for triangle, color in zip(
+                    chunk.points.tolist(), chunk.colors.tolist(), strict=True
+                ):
+                    (x1, y1, z1), (x2, y2, z2), (x3, y3, z3) = triangle
+                    p1, p2 = (int(x1), int(y1)), (int(x2), int(y2))
+                    p3 = (int(x3), int(y3))
+                    if self.vertex_colors:
+                        color = tuple(tuple(vertex) for vertex in color)
+                    draw(p1, p2, p3, z1, z2, z3, tuple(color))
+            if flush is not None:
+                flush()
+            shader_seconds = shader_stats["seconds"] - shaded_before[1]
+            shade.seconds += shader_seconds
+            shade.triangles += shader_stats["triangles"] - shaded_before[0]
+            stats.seconds += time.perf_counter() - start - shader_seconds
+            stats.triangles += len(chunk)
+
+    def run(
+        self,
+        mesh,
+        matrix,
+        w_sign,
+        width,
+        height,
+        draw,
+        color,
+        tint=VERTEX_COLOR_TINT,
+        flush=None,
+        draw_chunk=None,
+    ):
+        """Stream mesh through every stage
+
+        Args:
+            mesh: Object with vertices, indices and colors (see mesh_loader)
+            matrix: 4x4 MVP @ model matrix
+            w_sign: Sign of w in front of the camera (bvh.camera_w_sign)
+            width, height: Render size in pixels
+            draw: Callback receiving each visible triangle
+            color, tint: Object color and how much it tints vertex colors
+            flush, draw_chunk: Per-chunk callbacks (see rasterize)
+        """
+        chunks = self.read(mesh, color, tint)
+        chunks = self.transform(chunks, matrix)
+        chunks = self.clip(chunks, w_sign, width, height)
+        chunks = self.cull(chunks)
+        self.rasterize(chunks, draw, flush, draw_chunk)
+
+    def reset_stats(self):
+        self.stats = {name: StageStats() for name in STAGES}
+
+    def get_stats(self):
+        """Triangles received and throughput (triangles/s) of every stage"""
+        return {
+            name: {
+                "triangles": stats.triangles,
+                "triangles_per_s": round(stats.triangles_per_second),
+            }
+            for name, stats in self.stats.items()
+        }
+
+
+if __name__ == "__main__":
+    # A ~1M triangle sphere through the pipeline at several chunk sizes,
+    # each chunk rasterized by the batched raster kernels (argv[2], numba by
+    # default) into an 800x600 frame; tracemalloc gives the peak memory
+    # allocated while streaming.
+    import sys
+    import tracemalloc
+    from types import SimpleNamespace
+
+    import rasterization
+    from framebuffer import FrameBufferRenderer
+    from projection import create_mvp_matrix
+    from raster_kernels import rasterize_triangle_arrays, warm_up
+
+    segments = int(sys.argv[1]) if len(sys.argv) > 1 else 708
+    backend = sys.argv[2] if len(sys.argv) > 2 else "numba"
+    theta, phi = np.meshgrid(
+        np.linspace(0, np.pi, segments + 1), np.linspace(0, 2 * np.pi, segments + 1)
+    )
+    vertices = (
+        np.stack(
+            [np.sin(theta) * np.cos(phi), np.cos(theta), np.sin(theta) * np.sin(phi)],
+            axis=-1,
+        )
+        .reshape(-1, 3)
+        .astype(np.float32)
+        * 100
+    )
+    grid = np.arange((segments + 1) ** 2).reshape(segments + 1, segments + 1)
+    a, b = grid[:-1, :-1].ravel(), grid[:-1, 1:].ravel()
+    c, d = grid[1:, :-1].ravel(), grid[1:, 1:].ravel()
+    indices = np.concatenate([np.stack([a, d, b], 1), np.stack([a, c, d], 1)])
+    colors = ((vertices / 200 + 0.5) * 255).astype(np.uint8)
+    mesh = SimpleNamespace(
+        vertices=vertices, indices=indices.astype(np.int32), colors=colors
+    )
+
+    camera = SimpleNamespace(position=[0, 100, 400], target=[0, 0, 0], focal_length=600)
+    mvp = create_mvp_matrix(camera, 800, 600)
+    print(  # noqa: T201
+        f"{len(mesh.indices)} triangles, {mesh.indices.nbytes / 2**20:.1f} MB "
+        f"indices, {backend} rasterizer"
+    )
+    renderer = FrameBufferRenderer(np.zeros((600, 800, 3), np.uint8))
+    warm_up(backend)
+
+    def rasterize_chunk(points, colors, drawn):
+        coordinates = np.concatenate(
+            [points[:, :, :2].reshape(-1, 6), points[:, :, 2]], axis=1
+        )
+        rasterize_triangle_arrays(
+            renderer, coordinates, colors.astype(np.uint8), backend
+        )
+        drawn.append(len(points))
+
+    def run(pipeline, drawn):
+        renderer.pixels[:] = 0
+        rasterization.init_z_buffer(800, 600)
+        pipeline.run(
+            mesh,
+            mvp,
+            -1.0,
+            800,
+            600,
+            None,
+            (255, 255, 255),
+            draw_chunk=lambda points, colors: rasterize_chunk(points, colors, drawn),
+        )
+
+    for backface_culling in (False, True):
+        for chunk_size in (1024, 16384, 262144, len(mesh.indices)):
+            pipeline = GeometryPipeline(chunk_size, backface_culling)
+            drawn = []
+            # Timed run, then a second run for the memory peak (tracemalloc
+            # slows every allocation down)
+            run(pipeline, drawn)
+            tracemalloc.start()
+            run(GeometryPipeline(chunk_size, backface_culling), [])
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            rates = ", ".join(
+                f"{name} {stats['triangles_per_s'] / 1e6:5.2f}"
+                for name, stats in pipeline.get_stats().items()
+            )
+            print(  # noqa: T201
+                f"backface culling {backface_culling!s:5s} chunk {chunk_size:7d}: "
+                f"peak {peak / 2**20:7.1f} MB, {sum(drawn)} drawn, "
+                f"M triangles/s: {rates}"
+            )
@@ -0,0 +1,358 @@
+"""
+Instanced drawing for the GPU backend: many copies of a mesh, one draw call.
+
+Through GPUScene, N objects cost N uniform writes and N draw calls a frame.
+An InstancedMesh uploads its mesh once and keeps every instance's model
+matrix and color in a second vertex buffer that advances once per instance,
+so all N copies go out in a single vao.render(instances=N):
+
+- The instances live in a NumPy structured array (INSTANCE_DTYPE)
+  mirroring the GPU buffer
+- set_instances takes a bulk update, compares it with the mirror and marks
+  only the rows that really changed
+- sync writes the changed rows as runs at their offsets (runs close
+  together are merged into one write), so a frame where nothing moved
+  uploads nothing
+- The buffer is only reallocated when instances outgrow it (doubling)
+
+Wireframe edges are one more instanced draw after all the triangles. They
+are depth tested, the triangles pushed back a little (EDGE_POLYGON_OFFSET)
+so edges on their faces pass, so copies in front hide the edges of those
+behind. Unlike the CPU renderer's wireframe, drawn over its own cube, this
+also hides each copy's back edges.
+"""
+
+import time
+
+import moderngl
+import numpy as np
+
+from gpu_renderer import FRAGMENT_SHADER, MODES, indexed_primitives
+
+INSTANCED_VERTEX_SHADER = """
+#version 330 core
+
+in vec3 in_position;
+in vec3 in_color;
+in mat4 in_model;
+in vec3 in_tint;
+
+uniform mat4 view_projection;
+uniform float tint_amount;
+
+out vec3 frag_color;
+
+void main() {
+    gl_Position = view_projection * in_model * vec4(in_position, 1.0);
+    frag_color = mix(in_color, in_tint, tint_amount);
+}
+"""
+
+# One instance: model matrix (stored transposed, as OpenGL reads it column
+# by column) and color (0-1)
+INSTANCE_DTYPE = np.dtype([("model", "f4", (4, 4)), ("color", "f4", 3)])
+INSTANCE_FORMAT = "16f 3f/i"
+
+# glPolygonOffset (factor, units) of the triangles when edges are drawn:
+# the faces' depth moves back by about one depth step and their slope
+EDGE_POLYGON_OFFSET = (1.0, 1.0)
+
+# Changed rows at most this many unchanged rows apart are written together:
+# a buffer write call costs about as much as copying a few KB
+MERGE_GAP = 64
+
+
+def dirty_runs(indices, max_gap=MERGE_GAP):
+    """(start, stop) ranges covering sorted unique indices
+
+    Indices with at most max_gap others between them share a range (the
+    rows in between are rewritten unchanged).
+    """
+    if len(indices) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(indices) > max_gap + 1) + 1
+    starts = indices[np.r_[0, breaks]]
+    stops = indices[np.r_[breaks - 1, len(indices) - 1]] + 1
+    return list(zip(starts.tolist(), stops.tolist(), strict=True))
+
+
+class InstancedMesh:
+    """A mesh drawn once per instance of a per-instance matrix/color buffer"""
+
+    def __init__(
+        self,
+        ctx,
+        points=None,
+        colors=None,
+        edges=None,
+        edge_color=(200, 200, 200),
+        tint_amount=0.3,
+        capacity=1024,
+    ):
+        """
+        Args:
+            ctx: ModernGL context (GPUScene.ctx)
+            points, colors: Optional (n, 3, 3) model-space triangles and
+                their (n, 3) colors, 0-255, depth tested
+            edges: Optional (m, 2, 3) model-space lines in edge_color,
+                depth tested against every copy's triangles
+            tint_amount: How far the triangle colors are blended towards
+                each instance's color (like scene_objects.apply_color_tint)
+            capacity: Instances the buffer holds before it grows
+        """
+        self.ctx = ctx
+        self.program = ctx.program(
+            vertex_shader=INSTANCED_VERTEX_SHADER, fragment_shader=FRAGMENT_SHADER
+        )
+        self.instances = np.zeros(capacity, INSTANCE_DTYPE)
+        self.dirty = np.zeros(capacity, dtype=bool)
+        self.count = 0
+        self.instance_buffer = ctx.buffer(
+            reserve=capacity * INSTANCE_DTYPE.itemsize, dynamic=True
+        )
+        # (vbo, ibo, mode, polygon offset, tint amount) of the triangles and
+        # edges; the triangles are offset only when there are edges
+        self.parts = []
+        has_edges = edges is not None and len(edges) > 0
+        if points is not None and len(points):
+            offset = EDGE_POLYGON_OFFSET if has_edges else (0.0, 0.0)
+            self._add_part(points, colors, "triangles", offset, tint_amount)
+        if has_edges:
+            self._add_part(edges, [edge_color] * len(edges), "lines", (0.0, 0.0), 0.0)
+        self.vaos = self._vertex_arrays()
+        self.frames = 0
+        self.draw_calls = 0
+        self.uploaded_bytes = 0
+        self.writes = 0
+        self.upload_seconds = 0.0
+        self.reallocations = 0
+
+    def _add_part(self, points, colors, mode, polygon_offset, tint_amount):
+        vertices, indices = indexed_primitives(points, colors)
+        vbo = self.ctx.buffer(vertices.tobytes())
+        ibo = self.ctx.buffer(indices.tobytes())
+        self.parts.append((vbo, ibo, MODES[mode], polygon_offset, tint_amount))
+
+    def _vertex_arrays(self):
+        """One vertex array per part, reading the current instance buffer"""
+        return [
+            self.ctx.vertex_array(
+                self.program,
+                [
+                    (vbo, "3f 3f", "in_position", "in_color"),
+                    (self.instance_buffer, INSTANCE_FORMAT, "in_model", "in_tint"),
+                ],
+                index_buffer=ibo,
+                index_element_size=4,
+            )
+            for vbo, ibo, *_ in self.parts
+        ]
+
+    def _reserve(self, count):
+        """Grow the mirror and the GPU buffer to hold count instances"""
+        capacity = len(self.instances)
+        if count <= capacity:
+            return
+        capacity = max(count, 2 * capacity)
+        instances = np.zeros(capacity, INSTANCE_DTYPE)
+        instances[: self.count] = self.instances[: self.count]
+        self.instances = instances
+        self.dirty = np.zeros(capacity, dtype=bool)
+        self.dirty[: self.count] = True
+        for vao in self.vaos:
+            vao.release()
+        self.instance_buffer.release()
+        self.instance_buffer = self.ctx.buffer(
+            reserve=capacity * INSTANCE_DTYPE.itemsize, dynamic=True
+        )
+        self.vaos = self._vertex_arrays()
+        self.reallocations += 1
+
+    def add(self, models, colors):
+        """Append instances
+
+        Args:
+            models: (k, 4, 4) model matrices (or one 4x4 matrix)
+            colors: (k, 3) colors, 0-255 (or one color)
+
+        Returns:
+            Index of the first added instance
+        """
+        models = np.asarray(models, dtype=np.float32).reshape(-1, 4, 4)
+        colors = np.broadcast_to(np.asarray(colors, np.float32) / 255, (len(models), 3))
+        first = self.count
+        self._reserve(first + len(models))
+        rows = self.instances[first : first + len(models)]
+        rows["model"] = models.transpose(0, 2, 1)
+        rows["color"] = colors
+        self.dirty[first : first + len(models)] = True
+        self.count += len(models)
+        return first
+
+    def set_instances(self, indices, models=None, colors=None):
+        """Bulk update of existing instances; unchanged rows stay clean
+
+        Args:
+            indices: (k,) instance indices
+            models: Optional (k, 4, 4) new model matrices
+            colors: Optional (k, 3) new colors, 0-255
+        """
+        indices = np.asarray(indices, dtype=np.intp)
+        rows = self.instances[indices]
+        if models is not None:
+            rows["model"] = np.asarray(models, dtype=np.float32).transpose(0, 2, 1)
+        if colors is not None:
+            rows["color"] = np.asarray(colors, dtype=np.float32) / 255
+        changed = rows != self.instances[indices]
+        self.instances[indices[changed]] = rows[changed]
+        self.dirty[indices[changed]] = True
+
+    def sync(self):
+        """Write the changed instances to the GPU buffer"""
+        changed = np.flatnonzero(self.dirty[: self.count])
+        if len(changed) == 0:
+            return
+        start = time.perf_counter()
+        size = INSTANCE_DTYPE.itemsize
+        for first, stop in dirty_runs(changed):
+            data = self.instances[first:stop]
+            self.instance_buffer.write(data.tobytes(), offset=first * size)
+            self.uploaded_bytes += data.nbytes
+            self.writes += 1
+        self.dirty[changed] = False
+        self.upload_seconds += time.perf_counter() - start
+
+    def render(self, view_projection):
+        """Draw every instance (one draw call per part); returns the calls"""
+        self.sync()
+        self.frames += 1
+        if self.count == 0:
+            return 0
+        self.program["view_projection"].write(
+            np.asarray(view_projection, dtype=np.float32).T.tobytes()
+        )
+        self.ctx.enable(moderngl.DEPTH_TEST)
+        for vao, (*_, mode, polygon_offset, tint_amount) in zip(
+            self.vaos, self.parts, strict=True
+        ):
+            self.ctx.polygon_offset = polygon_offset
+            self.program["tint_amount"].value = tint_amount
+            vao.render(mode, instances=self.count)
+        self.ctx.polygon_offset = (0.0, 0.0)
+        self.draw_calls += len(self.vaos)
+        return len(self.vaos)
+
+    def get_stats(self):
+        """Instances and per-frame averages since the last call: draw calls,
+        instance data uploaded and buffer writes"""
+        frames = max(self.frames, 1)
+        stats = {
+            "instances": self.count,
+            "draw_calls": round(self.draw_calls / frames, 1),
+            "upload_kb": round(self.uploaded_bytes / frames / 1024, 1),
+            "writes": round(self.writes / frames, 1),
+            "upload_ms": round(self.upload_seconds / frames * 1000, 3),
+            "reallocations": self.reallocations,
+        }
+        self.frames = self.draw_calls = self.uploaded_bytes = self.writes = 0
+        self.upload_seconds = 0.0
+        return stats
+
+    def release(self):
+        for vao in self.vaos:
+            vao.release()
+        for vbo, ibo, *_ in self.parts:
+            vbo.release()
+            ibo.release()
+        self.instance_buffer.release()
+        self.program.release()
+
+
+if __name__ == "__main__":
+    # 10 to 100k cubes on a grid, seen from above, drawn one object at a time
+    # through GPUScene (one matrix write and draw call each, up to 10k) and
+    # as one InstancedMesh; then the instanced frame with 1% of the cubes
+    # moving. Frame time includes ctx.finish(), so the GPU's work counts.
+    from types import SimpleNamespace
+
+    from gpu_renderer import GPUScene, gl_view_projection
+
+    width, height = 800, 600
+    cube = np.array(
+        [[x, y, z] for x in (-1, 1) for y in (-1, 1) for z in (-1, 1)], dtype=float
+    )
+    faces = [(0, 1, 3), (0, 3, 2), (4, 6, 7), (4, 7, 5), (0, 4, 5), (0, 5, 1)]
+    faces += [(2, 3, 7), (2, 7, 6), (0, 2, 6), (0, 6, 4), (1, 5, 7), (1, 7, 3)]
+    points = cube[np.array(faces)]
+    face_colors = [(255, 100, 100)] * 4 + [(100, 255, 100)] * 4
+    face_colors += [(100, 100, 255)] * 4
+    camera = SimpleNamespace(
+        position=[0, 3000, 1500], target=[0, 0, 0], focal_length=600
+    )
+    view_projection = gl_view_projection(camera, width, height)
+    scene = GPUScene(width, height)
+
+    def grid_models(count):
+        side = int(np.ceil(np.sqrt(count)))
+        i = np.arange(count)
+        models = np.tile(np.diag([4.0, 4.0, 4.0, 1.0]), (count, 1, 1))
+        models[:, 0, 3] = (i % side - side / 2) * 3000 / side
+        models[:, 2, 3] = (i // side - side / 2) * 3000 / side
+        return models
+
+    def frame_ms(render, frames=5):
+        render()
+        scene.ctx.finish()
+        start = time.perf_counter()
+        for _ in range(frames):
+            render()
+            scene.ctx.finish()
+        return (time.perf_counter() - start) / frames * 1000
+
+    rng = np.random.default_rng(0)
+    for count in (10, 100, 1_000, 10_000, 100_000):
+        models = grid_models(count)
+        colors = rng.integers(0, 256, (count, 3))
+        line = f"{count:7d} cubes:"
+
+        if count <= 10_000:
+            scene.get_stats()
+            for i in range(count):
+                scene.upload(f"cube{i}", points, face_colors)
+            per_object = {f"cube{i}": models[i] for i in range(count)}
+            ms = frame_ms(
+                lambda per_object=per_object: scene.render(view_projection, per_object)
+            )
+            calls = scene.get_stats()["draw_calls"]
+            line += f" per object {ms:8.2f} ms ({calls:8.0f} draw calls) |"
+            for i in range(count):
+                scene.remove(f"cube{i}")
+        else:
+            line += " " * 45 + "|"
+
+        mesh = scene.add_instanced(
+            "cubes", InstancedMesh(scene.ctx, points, face_colors, capacity=count)
+        )
+        mesh.add(models, colors)
+        scene.get_stats()
+        ms = frame_ms(lambda: scene.render(view_projection, {}))
+        calls = scene.get_stats()["draw_calls"]
+        mesh.get_stats()
+        line += f" instanced {ms:7.2f} ms ({calls:.0f} draw call) |"
+
+        moving = rng.choice(count, max(count // 100, 1), replace=False)
+        moving.sort()
+
+        def moved_frame(mesh=mesh, models=models, moving=moving):
+            models[moving, 1, 3] += 1.0
+            mesh.set_instances(moving, models[moving])
+            scene.render(view_projection, {})
+
+        ms = frame_ms(moved_frame)
+        stats = mesh.get_stats()
+        line += (
+            f" 1% moving {ms:7.2f} ms, {stats['upload_kb']:7.1f} KB in "
+            f"{stats['writes']:.0f} writes ({stats['upload_ms']:.2f} ms)"
+        )
+        print(line)  # noqa: T201
+        scene.instanced.pop("cubes").release()
@@ -0,0 +1,198 @@
+"""
+Asynchronous frame readback through pixel buffer objects.
+
+GPUScene.read_pixels reads the framebuffer straight into a NumPy array, but
+the read is synchronous: glReadPixels into client memory waits for the GPU
+to finish the frame, then copies it, and the CPU does nothing meanwhile.
+AsyncReadback splits the read in two:
+
+- submit(fbo) queues a copy of the frame into one of a ring of pixel buffer
+  objects (PBOs). The copy stays on the GPU side and returns without
+  waiting for the frame to be drawn
+- fetch(out) copies the oldest queued PBO into a preallocated NumPy array.
+  With keep=1 that is the previous frame's PBO, whose copy ran while the
+  current frame was being drawn, so it no longer waits
+
+The frame shown is one frame late. Whether the copy really overlaps
+depends on the driver. Software GL (llvmpipe) does it in submit, and
+fetch then copies the frame a second time out of the PBO: there the ring
+is slower than read_pixels at every size (about as slow as fbo.read plus
+a copy), and only pays off on drivers that copy asynchronously.
+"""
+
+import time
+from collections import deque
+
+import numpy as np
+
+# PBOs in the ring: a frame can be fetched while the next one is copied
+READBACK_BUFFERS = 2
+
+
+class AsyncReadback:
+    """Double-buffered readback of RGB frames into NumPy arrays"""
+
+    def __init__(self, ctx, width, height, buffers=READBACK_BUFFERS):
+        """
+        Args:
+            ctx: ModernGL context
+            width, height: Frame size in pixels
+            buffers: PBOs in the ring, the most frames queued at once
+        """
+        self.ctx = ctx
+        self.width, self.height = width, height
+        self.pbos = [ctx.buffer(reserve=width * height * 3) for _ in range(buffers)]
+        self.next = 0
+        self.queued = deque()  # PBOs holding frames not fetched yet, oldest first
+        self.submitted = self.fetched = self.dropped = 0
+        self.submit_seconds = self.fetch_seconds = 0.0
+
+    def submit(self, fbo):
+        """Queue a copy of fbo's color into the next PBO
+
+        When all PBOs are queued, the oldest frame is dropped.
+        """
+        start = time.perf_counter()
+        pbo = self.pbos[self.next]
+        self.next = (self.next + 1) % len(self.pbos)
+        if pbo in self.queued:
+            self.queued.remove(pbo)
+            self.dropped += 1
+        fbo.read_into(pbo, components=3, alignment=1)
+        self.queued.append(pbo)
+        self.submitted += 1
+        self.submit_seconds += time.perf_counter() - start
+
+    def fetch(self, out, keep=1):
+        """Copy the oldest queued frame into out, a contiguous (height,
+        width, 3) uint8 array, if more than keep frames are queued
+
+        keep=1 returns the previous frame and leaves the one just submitted
+        in flight; keep=0 waits for the latest frame.
+
+        Returns:
+            True if out was written
+        """
+        if len(self.queued) <= keep:
+            return False
+        start = time.perf_counter()
+        self.queued.popleft().read_into(out)
+        self.fetched += 1
+        self.fetch_seconds += time.perf_counter() - start
+        return True
+
+    def get_stats(self):
+        """Frames submitted, fetched and dropped, and the average time spent
+        in submit and fetch since the last call"""
+        stats = {
+            "submitted": self.submitted,
+            "fetched": self.fetched,
+            "dropped": self.dropped,
+            "submit_ms": round(self.submit_seconds / max(self.submitted, 1) * 1000, 3),
+            "fetch_ms": round(self.fetch_seconds / max(self.fetched, 1) * 1000, 3),
+        }
+        self.submitted = self.fetched = self.dropped = 0
+        self.submit_seconds = self.fetch_seconds = 0.0
+        return stats
+
+    def release(self):
+        for pbo in self.pbos:
+            pbo.release()
+
+
+if __name__ == "__main__":
+    # Readback of one frame at several resolutions: fbo.read into bytes then
+    # a copy (what a new array per frame costs), read_pixels straight into a
+    # preallocated array, and the PBO ring. Then batch rendering of a camera
+    # orbit, checking that every asynchronously read frame is identical to
+    # the synchronous one (reprojection.compare_frames).
+    from types import SimpleNamespace
+
+    from gpu_renderer import GPUScene, gl_view_projection
+    from reprojection import compare_frames
+
+    size, frames = 200, 30
+    scene = GPUScene(320, 240)
+    corners = np.array(
+        [[x, y, z] for x in (-1, 1) for y in (-1, 1) for z in (-1, 1)], dtype=float
+    )
+    quads = [(0, 1, 3, 2), (4, 6, 7, 5), (0, 4, 5, 1), (2, 3, 7, 6), (0, 2, 6, 4)]
+    quads.append((1, 5, 7, 3))
+    triangles = corners[
+        [[q[0], q[1], q[2]] for q in quads] + [[q[0], q[2], q[3]] for q in quads]
+    ]
+    colors = [(200, 60, 60), (60, 200, 60), (60, 60, 200)] * 4
+    scene.upload("cube", triangles * size / 2, colors)
+
+    def camera_at(angle):
+        position = [900 * np.sin(angle), 400, 900 * np.cos(angle)]
+        return SimpleNamespace(position=position, target=[0, 0, 0], focal_length=600)
+
+    def render(angle):
+        view_projection = gl_view_projection(
+            camera_at(angle), scene.width, scene.height
+        )
+        scene.render(view_projection, {"cube": np.eye(4)}, (20, 20, 30))
+
+    def read_copy(out):
+        data = scene.fbo.read(components=3, alignment=1)
+        out[:] = np.frombuffer(data, np.uint8).reshape(out.shape)
+
+    for width, height in ((320, 240), (800, 600), (1920, 1080), (3840, 2160)):
+        scene.resize(width, height)
+        out = np.empty((height, width, 3), np.uint8)
+        readback = AsyncReadback(scene.ctx, width, height)
+
+        def read_async(out, readback=readback):
+            readback.submit(scene.fbo)
+            readback.fetch(out, keep=0)
+
+        timings = []
+        for method in (read_copy, scene.read_pixels, read_async):
+            best = float("inf")
+            for frame in range(5):
+                render(frame / 10)
+                scene.ctx.finish()
+                start = time.perf_counter()
+                method(out)
+                best = min(best, time.perf_counter() - start)
+            timings.append(f"{best * 1000:6.2f}")
+        print(  # noqa: T201
+            f"{width}x{height}: read + copy {timings[0]} ms, read_into {timings[1]} "
+            f"ms, PBO {timings[2]} ms"
+        )
+        readback.release()
+
+    width, height = 800, 600
+    scene.resize(width, height)
+    readback = AsyncReadback(scene.ctx, width, height)
+    angles = np.linspace(0, 2 * np.pi, frames, endpoint=False)
+    reference = np.empty((frames, height, width, 3), np.uint8)
+    start = time.perf_counter()
+    for i, angle in enumerate(angles):
+        render(angle)
+        scene.read_pixels(reference[i])
+    sync_ms = (time.perf_counter() - start) / frames * 1000
+
+    batch = np.empty_like(reference)
+    start = time.perf_counter()
+    for i, angle in enumerate(angles):
+        render(angle)
+        readback.submit(scene.fbo)
+        # Frame i - 1 is read while frame i is drawn
+        if i > 0 and not readback.fetch(batch[i - 1]):
+            raise RuntimeError(f"Frame {i - 1} was not fetched")
+    readback.fetch(batch[-1], keep=0)
+    async_ms = (time.perf_counter() - start) / frames * 1000
+
+    worst = min(
+        compare_frames(frame, expected)["psnr_db"]
+        for frame, expected in zip(batch, reference, strict=True)
+    )
+    identical = np.array_equal(batch, reference)
+    print(  # noqa: T201
+        f"{frames} frames at {width}x{height}: synchronous {sync_ms:.2f} ms, "
+        f"async {async_ms:.2f} ms per frame; identical: {identical} "
+        f"(worst PSNR {worst} dB)"
+    )
+    print(f"Readback: {readback.get_stats()}")  # noqa: T201
@@ -0,0 +1,426 @@
+"""
+GPU backend: the main.py scene drawn by ModernGL from persistent buffers.
+
+The CPU pipeline projects and rasterizes every triangle of every object each
+frame. Here each object's geometry is uploaded once (GPUScene.upload, called
+from main.create_scene_objects) into a vertex buffer (position + color per
+vertex) and an index buffer, and a frame is only:
+
+1. One matrix write per object (its MVP, see gl_view_projection)
+2. One draw call per batch (triangles, wireframe lines or axis end points),
+   plus one per instanced mesh for all its copies (see gpu_instancing)
+   and one per piece of per-frame geometry (see gpu_streaming)
+3. Reading the finished frame back into the CPU frame buffer, so the
+   recorder, the stream server and SDL presentation work unchanged
+
+Everything renders into an offscreen framebuffer of a standalone context,
+at any resolution, so no window or GPU is needed: on a headless machine the
+context comes from EGL (e.g. Mesa llvmpipe). Frames are read straight into
+NumPy arrays (read_pixels), or asynchronously through gpu_readback.
+
+Lines and points are drawn like the CPU renderer draws them: over whatever
+is already there (no depth test or write), in object order.
+"""
+
+import os
+import sys
+import time
+from dataclasses import dataclass
+
+import moderngl
+import numpy as np
+
+from gpu_streaming import StreamingVertexBuffer, vertex_rows
+from projection import create_view_matrix
+
+# Clip planes of the GPU projection. The CPU projection has no far plane, so
+# it is far enough for the whole scene; near 1.0 keeps 24-bit depth precise.
+NEAR_PLANE = 1.0
+FAR_PLANE = 20000.0
+
+VERTEX_SHADER = """
+#version 330 core
+
+in vec3 in_position;
+in vec3 in_color;
+
+uniform mat4 mvp_matrix;
+
+out vec3 frag_color;
+
+void main() {
+    gl_Position = mvp_matrix * vec4(in_position, 1.0);
+    frag_color = in_color;
+}
+"""
+
+FRAGMENT_SHADER = """
+#version 330 core
+
+in vec3 frag_color;
+out vec4 out_color;
+
+void main() {
+    out_color = vec4(frag_color, 1.0);
+}
+"""
+
+# Batch mode name -> ModernGL primitive
+MODES = {
+    "triangles": moderngl.TRIANGLES,
+    "lines": moderngl.LINES,
+    "points": moderngl.POINTS,
+}
+
+
+def create_gl_context():
+    """Standalone OpenGL 3.3 context: the platform default, else EGL (on
+    Linux without a display, or when the default one lacks OpenGL 3.3)"""
+    if sys.platform.startswith("linux") and not os.environ.get("DISPLAY"):
+        return moderngl.create_standalone_context(require=330, backend="egl")
+    try:
+        return moderngl.create_standalone_context(require=330)
+    except (moderngl.Error, ValueError) as error:
+        try:
+            return moderngl.create_standalone_context(require=330, backend="egl")
+        except (moderngl.Error, ValueError) as egl_error:
+            raise egl_error from error
+
+
+def gl_projection_matrix(focal_length, width, height, near=NEAR_PLANE, far=FAR_PLANE):
+    """Perspective matrix mapping create_view_matrix space to OpenGL clip space
+
+    Matches projection.create_mvp_matrix on screen: view space has +z
+    forward and x comes out mirrored like the CPU projection's. y is
+    flipped too, so OpenGL's first row (its bottom) holds the top of the
+    image: frames read back are already in the CPU frame buffer's row order.
+    """
+    return np.array(
+        [
+            [-focal_length / (width / 2), 0, 0, 0],
+            [0, focal_length / (height / 2), 0, 0],
+            [0, 0, (far + near) / (far - near), -2 * far * near / (far - near)],
+            [0, 0, 1, 0],
+        ]
+    )
+
+
+def gl_view_projection(camera, width, height):
+    """World -> OpenGL clip space matrix for a main.Camera"""
+    view = create_view_matrix(camera.position, camera.target)
+    return gl_projection_matrix(camera.focal_length, width, height) @ view
+
+
+def indexed_primitives(points, colors):
+    """Vertex and index arrays for primitives with shared vertices merged
+
+    Args:
+        points: (n, k, 3) positions of n primitives of k vertices
+        colors: (n, 3) color per primitive or (n, k, 3) per vertex, 0-255
+
+    Returns:
+        (vertices, indices): (v, 6) float32 position + color (0-1) rows
+        and (n * k,) uint32 indices into them. Vertices shared by
+        primitives of the same color are stored once.
+    """
+    points = np.asarray(points, dtype=float)
+    colors = np.asarray(colors, dtype=float)
+    if colors.ndim == 2:
+        colors = np.broadcast_to(colors[:, None, :], points.shape)
+    rows = np.concatenate([points, colors / 255], axis=2).reshape(-1, 6)
+    vertices, indices = np.unique(rows.astype(np.float32), axis=0, return_inverse=True)
+    return vertices, indices.reshape(-1).astype(np.uint32)
+
+
+@dataclass(slots=True)
+class GPUBatch:
+    """One draw call: a vertex array over an uploaded vertex/index buffer"""
+
+    vao: moderngl.VertexArray
+    vbo: moderngl.Buffer
+    ibo: moderngl.Buffer
+    mode: int  # ModernGL primitive
+    depth_test: bool
+    point_size: float
+    count: int  # Indices drawn
+
+    def release(self):
+        self.vao.release()
+        self.vbo.release()
+        self.ibo.release()
+
+
+class GPUScene:
+    """Scene objects as persistent GPU buffers, drawn into an offscreen frame"""
+
+    def __init__(self, width, height, ctx=None):
+        """
+        Args:
+            width, height: Frame size in pixels
+            ctx: ModernGL context to use (a standalone one is created if None)
+        """
+        self.ctx = ctx if ctx is not None else create_gl_context()
+        self.width, self.height = width, height
+        self.program = self.ctx.program(
+            vertex_shader=VERTEX_SHADER, fragment_shader=FRAGMENT_SHADER
+        )
+        self.mvp_uniform = self.program["mvp_matrix"]
+        self.fbo = self._create_framebuffer()
+        self.staging = None  # Frame for read_pixels into non-contiguous arrays
+        # name -> list of GPUBatch, drawn in insertion order
+        self.objects = {}
+        # name -> gpu_instancing.InstancedMesh, drawn where render's
+        # model_matrices name it, else after the objects
+        self.instanced = {}
+        # Ring buffer for per-frame geometry (created on first use), and the
+        # name -> [(rows, mode, point size)] queued for the next render
+        self.stream = None
+        self.streamed = {}
+        self.uploaded_bytes = 0
+        self.frames = 0
+        self.draw_calls = 0
+        self.render_seconds = 0.0
+        self.read_seconds = 0.0
+
+    def _create_framebuffer(self):
+        size = (self.width, self.height)
+        return self.ctx.framebuffer(
+            color_attachments=[self.ctx.renderbuffer(size)],
+            depth_attachment=self.ctx.depth_renderbuffer(size),
+        )
+
+    @property
+    def renderer_name(self):
+        return self.ctx.info["GL_RENDERER"]
+
+    def upload(self, name, points, colors, mode="triangles", point_size=1.0):
+        """Add a batch of primitives to object name, uploaded once
+
+        Args:
+            name: Scene object the batch belongs to (shares its model matrix)
+            points: (n, k, 3) model-space positions, k given by mode
+            colors: (n, 3) or (n, k, 3) colors, 0-255
+            mode: "triangles" (depth tested), "lines" or "points" (drawn
+                over the frame like the CPU renderer's lines)
+            point_size: Size in pixels of "points"
+        """
+        if len(points) == 0:
+            return
+        vertices, indices = indexed_primitives(points, colors)
+        self._add_batch(name, vertices, indices, mode, point_size)
+
+    def upload_indexed(self, name, vertices, indices, colors):
+        """Add an already indexed triangle mesh (e.g. a loaded model) as is
+
+        Args:
+            vertices: (v, 3) model-space positions
+            indices: (n, 3) vertex indices of the triangles
+            colors: (v, 3) vertex colors, 0-255
+        """
+        rows = np.concatenate(
+            [np.asarray(vertices, float), np.asarray(colors, float) / 255], axis=1
+        ).astype(np.float32)
+        self._add_batch(name, rows, np.asarray(indices, dtype=np.uint32).reshape(-1))
+
+    def _add_batch(self, name, vertices, indices, mode="triangles", point_size=1.0):
+        """Upload (v, 6) float32 vertex rows and uint32 indices as a batch"""
+        vbo = self.ctx.buffer(vertices.tobytes())
+        ibo = self.ctx.buffer(indices.tobytes())
+        vao = self.ctx.vertex_array(
+            self.program,
+            [(vbo, "3f 3f", "in_position", "in_color")],
+            index_buffer=ibo,
+            index_element_size=4,
+        )
+        batch = GPUBatch(
+            vao, vbo, ibo, MODES[mode], mode == "triangles", point_size, indices.size
+        )
+        self.objects.setdefault(name, []).append(batch)
+        self.uploaded_bytes += vertices.nbytes + indices.nbytes
+
+    def stream_draw(self, name, points, colors, mode="lines", point_size=1.0):
+        """Queue geometry for the next render only (animated meshes, debug
+        lines), streamed through the StreamingVertexBuffer ring
+
+        Drawn with object name's model matrix right after its uploaded
+        batches; when name is not drawn, in world space after everything.
+        Arguments are the same as upload's.
+        """
+        if len(points) == 0:
+            return
+        if self.stream is None:
+            self.stream = StreamingVertexBuffer(self.ctx, self.program)
+        rows = vertex_rows(points, colors)
+        self.streamed.setdefault(name, []).append((rows, mode, point_size))
+
+    def add_instanced(self, name, mesh):
+        """Draw an InstancedMesh (see gpu_instancing) every frame; returns it"""
+        self.instanced[name] = mesh
+        return mesh
+
+    def remove(self, name):
+        """Release the buffers of an object"""
+        for batch in self.objects.pop(name, []):
+            batch.release()
+
+    def render(self, view_projection, model_matrices, clear_color=(0, 0, 0)):
+        """Draw objects into the offscreen frame
+
+        Args:
+            view_projection: World -> clip matrix (gl_view_projection)
+            model_matrices: Dict name -> 4x4 model matrix of the objects to
+                draw, in draw order; objects not in it are skipped. The name
+                of an instanced mesh draws all its instances at that point
+                (their own matrices are used); instanced meshes not named
+                are drawn after the objects
+            clear_color: Background (r, g, b), 0-255
+        """
+        start = time.perf_counter()
+        self.fbo.use()
+        self.fbo.clear(*(channel / 255 for channel in clear_color[:3]), 1.0)
+        if self.stream is not None:
+            self.stream.begin_frame()
+        for name, model in model_matrices.items():
+            if name in self.instanced:
+                self.draw_calls += self.instanced[name].render(view_projection)
+                continue
+            batches = self.objects.get(name, [])
+            streamed = self.streamed.pop(name, [])
+            if not batches and not streamed:
+                continue
+            # OpenGL reads matrices column by column: send the transpose
+            mvp = (view_projection @ model).T.astype(np.float32)
+            self.mvp_uniform.write(mvp.tobytes())
+            for batch in batches:
+                self._set_state(batch.depth_test, batch.point_size)
+                batch.vao.render(batch.mode)
+                self.draw_calls += 1
+            self._render_streamed(streamed)
+        for name, mesh in self.instanced.items():
+            if name not in model_matrices:
+                self.draw_calls += mesh.render(view_projection)
+        if self.streamed:
+            # Streamed geometry of no drawn object (debug lines): world space
+            self.mvp_uniform.write(view_projection.T.astype(np.float32).tobytes())
+            for streamed in self.streamed.values():
+                self._render_streamed(streamed)
+            self.streamed.clear()
+        self.frames += 1
+        self.render_seconds += time.perf_counter() - start
+
+    def _set_state(self, depth_test, point_size):
+        if depth_test:
+            self.ctx.enable(moderngl.DEPTH_TEST)
+        else:
+            self.ctx.disable(moderngl.DEPTH_TEST)
+        self.ctx.point_size = point_size
+
+    def _render_streamed(self, streamed):
+        """Upload queued stream_draw rows into the ring and draw them"""
+        for rows, mode, point_size in streamed:
+            first, count = self.stream.write(rows)
+            self._set_state(mode == "triangles", point_size)
+            self.stream.render(MODES[mode], first, count)
+            self.draw_calls += 1
+
+    def read_pixels(self, out):
+        """Read the frame into out, a (height, width, 3) uint8 array (top row
+        first, like the CPU frame buffer)
+
+        A contiguous out is filled by the driver directly (read_into, no
+        intermediate bytes object); other arrays go through a staging copy.
+        """
+        if out.shape != (self.height, self.width, 3):
+            raise ValueError(
+                f"Expected a {(self.height, self.width, 3)} array for the "
+                f"frame, got {out.shape}"
+            )
+        start = time.perf_counter()
+        if out.flags.c_contiguous and out.dtype == np.uint8:
+            self.fbo.read_into(out, components=3, alignment=1)
+        else:
+            if self.staging is None:
+                self.staging = np.empty((self.height, self.width, 3), np.uint8)
+            self.fbo.read_into(self.staging, components=3, alignment=1)
+            out[:] = self.staging
+        self.read_seconds += time.perf_counter() - start
+
+    def resize(self, width, height):
+        """Render at a new resolution from now on (buffers are kept)"""
+        self.fbo.release()
+        self.width, self.height = width, height
+        self.fbo = self._create_framebuffer()
+        self.staging = None
+
+    def get_stats(self):
+        """Per-frame averages since the last call: draw calls, render
+        submission and readback time"""
+        frames = max(self.frames, 1)
+        stats = {
+            "objects": len(self.objects),
+            "instances": sum(mesh.count for mesh in self.instanced.values()),
+            "uploaded_kb": round(self.uploaded_bytes / 1024, 1),
+            "draw_calls": round(self.draw_calls / frames, 1),
+            "render_ms": round(self.render_seconds / frames * 1000, 2),
+            "read_ms": round(self.read_seconds / frames * 1000, 2),
+        }
+        self.frames = self.draw_calls = 0
+        self.render_seconds = self.read_seconds = 0.0
+        return stats
+
+    def release(self):
+        for name in list(self.objects):
+            self.remove(name)
+        for mesh in self.instanced.values():
+            mesh.release()
+        self.instanced.clear()
+        if self.stream is not None:
+            self.stream.release()
+            self.stream = None
+        self.fbo.release()
+        self.program.release()
+
+
+if __name__ == "__main__":
+    # The default scene (plain ground grid) rendered by the CPU rasterizer
+    # and by this backend on whatever OpenGL the machine has (llvmpipe on a
+    # headless box): frame time, and how many pixels the two frames differ
+    # by (edges: the CPU samples truncated vertices at integer positions)
+    import contextlib
+    import io
+
+    import main as app
+
+    app.GROUND_LOD = False
+    width, height = app.WIDTH, app.HEIGHT
+
+    def best_ms(render, target, scene_objects, repeats=5):
+        render(target, camera, scene_objects)
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            render(target, camera, scene_objects)
+            best = min(best, time.perf_counter() - start)
+        return best * 1000
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        camera, _ = app.setup_camera_and_projection()
+        app.init_z_buffer(width, height)
+        frames = {}
+        for backend in ("cpu", "gpu"):
+            app.gpu_scene = GPUScene(width, height) if backend == "gpu" else None
+            scene_objects = app.create_scene_objects()
+            target = app.FrameBufferRenderer(app.init_frame_buffer(width, height))
+            render = app.render_gpu_frame if backend == "gpu" else app.render_cpu_frame
+            ms = best_ms(render, target, scene_objects)
+            frames[backend] = (ms, target.pixels.copy())
+
+    scene = app.gpu_scene
+    print(f"OpenGL renderer: {scene.renderer_name}")  # noqa: T201
+    print(f"Uploaded once: {scene.uploaded_bytes / 1024:.1f} KB")  # noqa: T201
+    print(f"cpu: {frames['cpu'][0]:8.2f} ms per frame")  # noqa: T201
+    print(  # noqa: T201
+        f"gpu: {frames['gpu'][0]:8.2f} ms per frame ({scene.get_stats()})"
+    )
+    differing = np.count_nonzero(np.any(frames["cpu"][1] != frames["gpu"][1], axis=2))
+    print(f"Pixels differing: {differing} of {width * height}")  # noqa: T201
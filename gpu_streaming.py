@@ -0,0 +1,211 @@
+"""
+Streaming vertex buffer ring for geometry that changes every frame.
+
+GPUScene uploads static geometry once. Geometry rebuilt every frame (the LOD
+ground, an animated mesh, debug lines) would otherwise need a new ctx.buffer
+per frame, and allocating GPU memory in the frame loop stalls the driver.
+StreamingVertexBuffer instead preallocates one dynamic buffer split into a
+ring of per-frame segments:
+
+- begin_frame moves to the next segment. With FRAME_SEGMENTS segments, a
+  frame only overwrites data the GPU finished drawing frames ago
+- write copies vertex rows with buffer.write at the next offset inside the
+  frame's segment, and returns the range to draw (no index buffer)
+- The buffer is only reallocated (segments doubled) when one frame's data
+  does not fit in a segment, so the steady state never allocates
+
+Bytes and time spent uploading per frame are kept for get_stats.
+"""
+
+import time
+
+import numpy as np
+
+# Frames of data the ring holds before a segment is reused
+FRAME_SEGMENTS = 3
+
+# Position (3 floats) + color (3 floats) per vertex, as gpu_renderer's shader
+VERTEX_FORMAT = ("3f 3f", "in_position", "in_color")
+VERTEX_BYTES = 24
+
+
+def vertex_rows(points, colors):
+    """(n * k, 6) float32 position + color (0-1) rows of n primitives
+
+    Args:
+        points: (n, k, 3) positions, k vertices per primitive
+        colors: (n, 3) color per primitive or (n, k, 3) per vertex, 0-255
+    """
+    points = np.asarray(points, dtype=np.float32)
+    colors = np.asarray(colors, dtype=np.float32)
+    rows = np.empty((*points.shape[:2], 6), dtype=np.float32)
+    rows[..., :3] = points
+    rows[..., 3:] = (colors[:, None, :] if colors.ndim == 2 else colors) / 255
+    return rows.reshape(-1, 6)
+
+
+class StreamingVertexBuffer:
+    """Ring of per-frame segments in one preallocated dynamic buffer"""
+
+    def __init__(self, ctx, program, segment_bytes=1 << 18, segments=FRAME_SEGMENTS):
+        """
+        Args:
+            ctx: ModernGL context
+            program: Program with in_position and in_color (gpu_renderer's)
+            segment_bytes: Initial room for one frame's vertices
+            segments: Frames in the ring
+        """
+        self.ctx = ctx
+        self.program = program
+        self.segments = segments
+        self.segment = 0
+        self.offset = 0  # Bytes used in the current segment
+        self._allocate(segment_bytes - segment_bytes % VERTEX_BYTES)
+        self.frames = 0
+        self.uploaded_bytes = 0
+        self.writes = 0
+        self.upload_seconds = 0.0
+        self.reallocations = 0
+
+    def _allocate(self, segment_bytes):
+        self.segment_bytes = segment_bytes
+        self.buffer = self.ctx.buffer(
+            reserve=segment_bytes * self.segments, dynamic=True
+        )
+        self.vao = self.ctx.vertex_array(self.program, [(self.buffer, *VERTEX_FORMAT)])
+
+    def begin_frame(self):
+        """Start writing the next frame's segment of the ring"""
+        self.segment = (self.segment + 1) % self.segments
+        self.offset = 0
+        self.frames += 1
+
+    def write(self, rows):
+        """Upload vertex rows (see vertex_rows) for this frame
+
+        Returns:
+            (first, count): vertex range to pass to render
+        """
+        data = np.ascontiguousarray(rows, dtype=np.float32)
+        if self.offset + data.nbytes > self.segment_bytes:
+            # This frame outgrew its segment. Draws already issued keep the
+            # old buffer alive until the GPU is done with it.
+            self.release()
+            size = self.segment_bytes
+            while self.offset + data.nbytes > size:
+                size *= 2
+            self._allocate(size)
+            self.offset = 0
+            self.reallocations += 1
+        start = time.perf_counter()
+        position = self.segment * self.segment_bytes + self.offset
+        self.buffer.write(data, offset=position)
+        self.upload_seconds += time.perf_counter() - start
+        self.offset += data.nbytes
+        self.uploaded_bytes += data.nbytes
+        self.writes += 1
+        return position // VERTEX_BYTES, len(data)
+
+    def render(self, mode, first, count):
+        """Draw a range returned by write with the program's current uniforms"""
+        self.vao.render(mode, vertices=count, first=first)
+
+    def get_stats(self):
+        """Ring size and per-frame averages since the last call: bytes
+        uploaded, write calls and upload time"""
+        frames = max(self.frames, 1)
+        stats = {
+            "ring_kb": round(self.segment_bytes * self.segments / 1024, 1),
+            "upload_kb": round(self.uploaded_bytes / frames / 1024, 1),
+            "writes": round(self.writes / frames, 1),
+            "upload_ms": round(self.upload_seconds / frames * 1000, 3),
+            "reallocations": self.reallocations,
+        }
+        self.frames = self.uploaded_bytes = self.writes = 0
+        self.upload_seconds = 0.0
+        return stats
+
+    def release(self):
+        self.vao.release()
+        self.buffer.release()
+
+
+if __name__ == "__main__":
+    # An animated 128x128 height field (32k triangles) and a debug line per
+    # vertex, rebuilt every frame: a new buffer and vertex array per frame
+    # (what ctx.buffer in the frame loop means) vs the streaming ring. Submit
+    # time is the CPU side of the frame, before waiting for the GPU.
+    from types import SimpleNamespace
+
+    import moderngl
+
+    from gpu_renderer import GPUScene, gl_view_projection
+
+    width, height, cells, frames = 800, 600, 128, 60
+    scene = GPUScene(width, height)
+    camera = SimpleNamespace(position=[0, 600, 900], target=[0, 0, 0], focal_length=600)
+    view_projection = gl_view_projection(camera, width, height)
+    scene.mvp_uniform.write(view_projection.T.astype(np.float32).tobytes())
+
+    xs, zs = np.meshgrid(
+        np.linspace(-400, 400, cells + 1), np.linspace(-400, 400, cells + 1)
+    )
+    i = np.arange(cells)[:, None] * (cells + 1) + np.arange(cells)[None, :]
+    quads = i.reshape(-1)
+    faces = np.concatenate(
+        [
+            np.stack([quads, quads + 1, quads + cells + 2], axis=1),
+            np.stack([quads, quads + cells + 2, quads + cells + 1], axis=1),
+        ]
+    )
+
+    def animated_geometry(t):
+        """Triangle rows and debug line rows of the height field at time t"""
+        ys = 40 * np.sin(xs / 60 + t) * np.cos(zs / 80 + t)
+        vertices = np.stack([xs, ys, zs], axis=-1).reshape(-1, 3)
+        shade = ((ys.reshape(-1) + 40) * 2.5 + 50)[:, None] * np.ones(3)
+        triangles = vertex_rows(vertices[faces], shade[faces])
+        tips = vertices + [0, 15, 0]
+        lines = vertex_rows(
+            np.stack([vertices, tips], axis=1), [(255, 255, 0)] * len(tips)
+        )
+        return triangles, lines
+
+    def per_frame_buffers(triangles, lines):
+        for rows, mode in ((triangles, moderngl.TRIANGLES), (lines, moderngl.LINES)):
+            buffer = scene.ctx.buffer(rows.tobytes())
+            vao = scene.ctx.vertex_array(scene.program, [(buffer, *VERTEX_FORMAT)])
+            vao.render(mode)
+            vao.release()
+            buffer.release()
+
+    stream = StreamingVertexBuffer(scene.ctx, scene.program)
+
+    def streamed(triangles, lines):
+        stream.begin_frame()
+        for rows, mode in ((triangles, moderngl.TRIANGLES), (lines, moderngl.LINES)):
+            stream.render(mode, *stream.write(rows))
+
+    geometry = [animated_geometry(frame / 10) for frame in range(frames)]
+    megabytes = sum(t.nbytes + lines.nbytes for t, lines in geometry) / frames / 2**20
+    print(f"{megabytes:.2f} MB of vertices per frame, {frames} frames")  # noqa: T201
+    scene.fbo.use()
+    scene.ctx.enable(moderngl.DEPTH_TEST)
+    for name, draw in (
+        ("new buffers per frame", per_frame_buffers),
+        ("streaming ring", streamed),
+    ):
+        draw(*geometry[0])  # Warm up
+        submit = total = 0.0
+        for triangles, lines in geometry:
+            start = time.perf_counter()
+            scene.fbo.clear()
+            draw(triangles, lines)
+            submit += time.perf_counter() - start
+            scene.ctx.finish()
+            total += time.perf_counter() - start
+        print(  # noqa: T201
+            f"{name:22s} {submit / frames * 1000:7.2f} ms to submit, "
+            f"{total / frames * 1000:7.2f} ms per frame"
+        )
+    print(f"Ring: {stream.get_stats()}")  # noqa: T201
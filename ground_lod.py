@@ -0,0 +1,192 @@
+"""
+Level-of-detail tiles for the ground plane.
+
+The ground grid uses the same spacing everywhere, so far away cells turn
+into sub-pixel triangles that cost as much to project and set up as the
+near ones. Here the plane is split into square tiles and every tile picks
+its own subdivision from its distance to the camera:
+
+- level 0: cells of the base spacing
+- level n: cells 2^n times larger (down to one cell per tile)
+
+A tile switches to the next level each time its distance doubles past
+lod_distance.
+
+Where a fine tile touches a coarser one, the fine tile's border vertices
+that the coarse tile does not have would create T-junctions (pixel cracks
+along the border). Those vertices are snapped onto the coarse neighbour's
+vertices, so both sides of a border share exactly the same edges. The
+triangles collapsed by the snapping are dropped.
+"""
+
+import math
+
+
+def lod_level(distance, lod_distance, max_level):
+    """Level for a tile at distance: +1 each time the distance doubles"""
+    level = 0
+    if distance > lod_distance:
+        level = int(math.log2(distance / lod_distance)) + 1
+    return min(level, max_level)
+
+
+def build_tile_triangles(x0, z0, tile_size, step, snaps, color):
+    """Triangles of one square tile of cells step wide, on the y = 0 plane
+
+    Args:
+        x0, z0: Tile corner with the smallest coordinates
+        tile_size: Side of the tile (a multiple of step)
+        step: Cell size
+        snaps: (left, right, near, far) for the -x, +x, -z, +z borders: how
+            many cells of this tile make one cell of the neighbour there
+            (1 when the neighbour is not coarser)
+        color: Triangle color
+    """
+    cells = tile_size // step
+    left, right, near, far = snaps
+
+    def vertex(a, b):
+        # Grid index (a along x, b along z), snapped on coarser borders
+        if a == 0:
+            b = b // left * left
+        elif a == cells:
+            b = b // right * right
+        if b == 0:
+            a = a // near * near
+        elif b == cells:
+            a = a // far * far
+        return (x0 + a * step, 0, z0 + b * step)
+
+    triangles = []
+    for a in range(cells):
+        for b in range(cells):
+            p1 = vertex(a, b)
+            p2 = vertex(a + 1, b)
+            p3 = vertex(a + 1, b + 1)
+            p4 = vertex(a, b + 1)
+            for tri in ((p1, p2, p3), (p1, p3, p4)):
+                if len(set(tri)) == 3:
+                    triangles.append(
+                        {"vertices": [list(p) for p in tri], "color": color}
+                    )
+    return triangles
+
+
+def build_tile_lines(x0, z0, tile_size, step, last_x=False, last_z=False):
+    """Wireframe segments of one tile, without its +x/+z borders (those
+    belong to the next tile) unless last_x/last_z"""
+    x1, z1 = x0 + tile_size, z0 + tile_size
+    lines = [((x, 0, z0), (x, 0, z1)) for x in range(x0, x1, step)]
+    lines += [((x0, 0, z), (x1, 0, z)) for z in range(z0, z1, step)]
+    if last_x:
+        lines.append(((x1, 0, z0), (x1, 0, z1)))
+    if last_z:
+        lines.append(((x0, 0, z1), (x1, 0, z1)))
+    return lines
+
+
+class GroundLOD:
+    """Builds the ground plane triangles for a camera position"""
+
+    def __init__(self, size=400, spacing=50, tile_size=200, lod_distance=300):
+        """
+        Args:
+            size: Half-width of the plane (from -size to +size)
+            spacing: Cell size at the finest level
+            tile_size: Side of a LOD tile, a multiple of spacing dividing 2 * size
+            lod_distance: Tiles closer than this use the finest level
+        """
+        if tile_size % spacing or (2 * size) % tile_size:
+            raise ValueError(
+                "tile_size must be a multiple of spacing and divide 2 * size"
+            )
+        self.size = size
+        self.spacing = spacing
+        self.tile_size = tile_size
+        self.lod_distance = lod_distance
+        self.tiles_per_side = 2 * size // tile_size
+        self.max_level = int(math.log2(tile_size // spacing))
+
+        self._cache_key = None
+        self._cache = None
+        self.level_triangles = {}  # level -> triangle count in the current mesh
+        self.rebuilds = 0
+
+    def cell_size(self, level):
+        return self.spacing * 2**level
+
+    def tile_origin(self, i, j):
+        return -self.size + i * self.tile_size, -self.size + j * self.tile_size
+
+    def select_levels(self, camera_position):
+        """LOD level for every tile, as a tuple of rows indexed [i][j]"""
+        half = self.tile_size / 2
+        levels = []
+        for i in range(self.tiles_per_side):
+            row = []
+            for j in range(self.tiles_per_side):
+                x0, z0 = self.tile_origin(i, j)
+                distance = math.dist(camera_position, (x0 + half, 0, z0 + half))
+                row.append(lod_level(distance, self.lod_distance, self.max_level))
+            levels.append(tuple(row))
+        return tuple(levels)
+
+    def neighbour_level(self, levels, i, j):
+        if 0 <= i < self.tiles_per_side and 0 <= j < self.tiles_per_side:
+            return levels[i][j]
+        return 0  # Plane border: nothing to match
+
+    def tile_triangles(self, levels, i, j, color):
+        """Triangles of one tile at its level, stitched to coarser neighbours"""
+        level = levels[i][j]
+        snaps = tuple(
+            2 ** max(0, self.neighbour_level(levels, ni, nj) - level)
+            for ni, nj in ((i - 1, j), (i + 1, j), (i, j - 1), (i, j + 1))
+        )
+        x0, z0 = self.tile_origin(i, j)
+        return build_tile_triangles(
+            x0, z0, self.tile_size, self.cell_size(level), snaps, color
+        )
+
+    def triangles(self, camera_position, color):
+        """Ground triangles for this camera; rebuilt only when a level changes"""
+        levels = self.select_levels(camera_position)
+        key = (levels, color)
+        if key != self._cache_key:
+            triangles = []
+            counts = {}
+            for i in range(self.tiles_per_side):
+                for j in range(self.tiles_per_side):
+                    tile = self.tile_triangles(levels, i, j, color)
+                    counts[levels[i][j]] = counts.get(levels[i][j], 0) + len(tile)
+                    triangles.extend(tile)
+            self.level_triangles = counts
+            self._cache_key = key
+            self._cache = triangles
+            self.rebuilds += 1
+        return self._cache
+
+    def grid_lines(self, camera_position):
+        """Wireframe segments ((x, 0, z), (x, 0, z)) following each tile's level
+
+        Every tile draws its lines without its +x/+z border, which belongs
+        to the next tile (or is added once at the plane's edge).
+        """
+        levels = self.select_levels(camera_position)
+        last = self.tiles_per_side - 1
+        lines = []
+        for i in range(self.tiles_per_side):
+            for j in range(self.tiles_per_side):
+                x0, z0 = self.tile_origin(i, j)
+                step = self.cell_size(levels[i][j])
+                lines += build_tile_lines(
+                    x0, z0, self.tile_size, step, i == last, j == last
+                )
+        return lines
+
+    def get_stats(self):
+        return {
+            "triangles_per_level": dict(sorted(self.level_triangles.items())),
+            "triangles": sum(self.level_triangles.values()),
+            "rebuilds": self.rebuilds,
+        }
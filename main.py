@@ -2,23 +2,82 @@
 import ctypes
 import logging
 import math
+import threading
 import time
 
 import numpy as np
 import sdl2
 import sdl2.ext
 
+from bvh import BVH, TriangleBVH, camera_w_sign, frustum_planes, screen_ray
+from dirty_rects import DirtyRectTracker, draw_rect_outlines, rects_intersect
+from dynamic_resolution import ResolutionController, scaled_size, upscale_nearest
 from fps import FPSCounter
-from projection import project_3d_to_2d_direct, project_3d_to_2d_via_matrix
+from frame_pacing import FrameScheduler
+from framebuffer import (
+    FrameBufferRenderer,
+    NullRenderer,
+    create_frame_texture,
+    init_frame_buffer,
+    present_frame_buffer,
+)
+from geometry_pipeline import VERTEX_COLOR_TINT, GeometryPipeline
+from gpu_instancing import InstancedMesh
+from gpu_readback import AsyncReadback
+from gpu_renderer import GPUScene, gl_view_projection
+from ground_lod import GroundLOD
+from mesh_loader import load_mesh
+from msaa import MultisampleBuffers
+from overdraw import overdraw_heatmap, overdraw_summary
+from projection import (
+    create_mvp_matrix,
+    project_3d_to_2d_direct,
+    project_3d_to_2d_via_matrix,
+)
+from raster_kernels import (
+    project_points_via_matrix,
+    rasterize_triangle_arrays,
+    rasterize_triangles,
+    warm_up,
+)
 from rasterization import (
+    clear_overdraw,
     clear_z_buffer,
+    init_overdraw,
     init_z_buffer,
     rasterize_triangle,
     rasterize_triangle_with_depth,
+    set_clip_rect,
+    set_depth_pass,
+    set_z_buffer,
 )
-
-# Initialize SDL2
-sdl2.ext.init()
+from recorder import FrameRecorder
+from reprojection import TemporalReprojector, compare_frames
+from scene_graph import SceneGraph, SceneNode, scale_matrix
+from scene_objects import (
+    DARK_GRAY_COLOR,
+    Axes,
+    GroundPlane,
+    MeshModel,
+    VerticalPlane,
+    draw_scene_object,
+    object_palette,
+    scene_type,
+)
+from shading import (
+    checkerboard_shader,
+    depth_fog_shader,
+    flat_shader,
+    get_shader_stats,
+    gouraud_shader,
+    rasterize_triangle_shaded,
+    shader_stats,
+)
+from shared_buffers import RasterWorkerPool, SharedFrameBuffers
+from stream_server import FrameStreamServer
+from terrain_stream import TerrainTileCache
+from threaded_render import FrameExchange, InputState, LatencyStats, RenderThread
+from vector_math import normalize
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(message)s")
@@ -32,7 +91,7 @@ MAGENTA_COLOR = (255, 100, 255)  # Magenta
 CYAN_COLOR = (100, 255, 255)  # Cyan
 
 # Other colors
-DARK_GRAY_COLOR = (60, 60, 60)  # Ground plane
+# DARK_GRAY_COLOR (ground plane) comes from scene_objects
 WHITE_COLOR = (255, 255, 255)  # White cube tint
 LIGHT_RED_COLOR = (255, 200, 200)  # Large cube tint
 LIGHT_GREEN_COLOR = (200, 255, 200)  # Small cube tint
@@ -51,13 +110,20 @@ def setup_display_and_renderer():
     WIDTH, HEIGHT = 800, 600
     X, Y = 3025, 48  # Window position
 
+    # SDL is only initialized here, when a window is actually needed: importing
+    # this module (worker processes, headless rendering) leaves it untouched
+    sdl2.ext.init()
+
     # Create window
     window = sdl2.ext.Window("3D Scene with Ground Plane - SDL2", size=(WIDTH, HEIGHT))
     sdl2.SDL_SetWindowPosition(window.window, X, Y)
     window.show()
 
     # Create renderer (will become OpenGL context later)
-    renderer = sdl2.ext.Renderer(window)
+    flags = sdl2.SDL_RENDERER_ACCELERATED
+    if FRAME_PACING == "vsync":
+        flags |= sdl2.SDL_RENDERER_PRESENTVSYNC
+    renderer = sdl2.ext.Renderer(window, flags=flags)
 
     # Initialize z-buffer for depth testing
     init_z_buffer(WIDTH, HEIGHT)
@@ -66,9 +132,92 @@ def setup_display_and_renderer():
     print("✓ Software renderer created (will become OpenGL context)")
     print("✓ Z-buffer initialized for depth testing")
 
+    if RASTER_BACKEND != "python":
+        # Compile the kernels (or load them from the disk cache) before frame 1
+        backend, seconds = warm_up(RASTER_BACKEND)
+        print(f"✓ Raster kernels ready: {backend} ({seconds * 1000:.0f} ms)")
+
     return window, renderer, WIDTH, HEIGHT
 
 
+def setup_frame_output(renderer, width, height):
+    """
+    RENDER STEP 1b: Allocate the CPU frame buffer and the texture it is shown through
+    With RASTER_WORKERS > 0 the color and depth buffers live in shared memory
+    so worker processes can rasterize into them directly
+    """
+    global raster_pool, multisample, gpu_scene, gpu_readback
+
+    frame_output = {
+        "texture": None,
+        "target": renderer,
+        "shared": None,
+        "recorder": None,
+        "stream": None,
+        "pixels": None,
+        "depth": None,
+        "overdraw": None,
+    }
+    if COUNT_OVERDRAW or SHOW_OVERDRAW:
+        frame_output["overdraw"] = np.zeros((height, width), dtype=np.int32)
+        init_overdraw(width, height, buffer=frame_output["overdraw"])
+        print("✓ Overdraw counter enabled (color writes per pixel)")
+    if not USE_FRAME_BUFFER:
+        return frame_output
+
+    if RASTER_WORKERS > 0:
+        shared = SharedFrameBuffers.create(width, height)
+        pixels = init_frame_buffer(width, height, buffer=shared.color)
+        depth = shared.depth
+        init_z_buffer(width, height, buffer=depth)
+        raster_pool = RasterWorkerPool(shared, RASTER_WORKERS)
+        frame_output["shared"] = shared
+        print(f"✓ Shared-memory frame buffers: {shared.name}")
+        print(f"✓ Raster worker pool started: {RASTER_WORKERS} processes")
+    else:
+        pixels = init_frame_buffer(width, height)
+        depth = np.empty((height, width))
+        init_z_buffer(width, height, buffer=depth)
+
+    # Full-size storage; reduced render resolutions use top-left views of it
+    frame_output["pixels"] = pixels
+    frame_output["depth"] = depth
+    frame_output["texture"] = create_frame_texture(renderer, width, height)
+    frame_output["target"] = FrameBufferRenderer(pixels)
+    print("✓ CPU frame buffer created (uploaded once per frame)")
+    if RENDER_BACKEND == "gpu":
+        gpu_scene = GPUScene(width, height)
+        print(f"✓ GPU backend: {gpu_scene.renderer_name} (offscreen, read back)")
+        if GPU_ASYNC_READBACK:
+            gpu_readback = AsyncReadback(gpu_scene.ctx, width, height)
+            print("✓ Async GPU readback (2 pixel buffers, one frame of latency)")
+    if MSAA_SAMPLES > 1 and raster_pool is None:
+        multisample = MultisampleBuffers(width, height, MSAA_SAMPLES)
+        print(
+            f"✓ {MSAA_SAMPLES}x MSAA sample buffers created "
+            f"({multisample.nbytes / 2**20:.1f} MB)"
+        )
+
+    if RECORD_FORMAT is not None:
+        path = RECORD_PATH
+        if RECORD_FORMAT != "png" and not path.endswith(f".{RECORD_FORMAT}"):
+            path = f"{path}.{RECORD_FORMAT}"
+        frame_output["recorder"] = FrameRecorder(
+            path, width, height, fmt=RECORD_FORMAT, policy=RECORD_POLICY
+        )
+        print(f"✓ Recording {RECORD_FORMAT} frames to {path}")
+
+    if STREAM_FORMAT is not None:
+        host, port = STREAM_ADDRESS
+        stream = FrameStreamServer(
+            host, port, unix_path=STREAM_UNIX_PATH, fmt=STREAM_FORMAT
+        )
+        frame_output["stream"] = stream
+        print(f"✓ Streaming {STREAM_FORMAT} frames on {stream.start()}")
+
+    return frame_output
+
+
 # Create window and renderer - will be moved to main() function
 WIDTH, HEIGHT = 800, 600
 
@@ -218,6 +367,20 @@ def create_ground_plane_triangles(size=400, spacing=50):
     return triangles
 
 
+def benchmark_ground_view(width=800, height=600, size=400, spacing=50):
+    """The default view of the ground, drawn by the rasterizer benchmarks
+    (shading, raster_kernels, scanline, msaa)
+
+    Returns:
+        (camera, MVP matrix, (N, 3, 3) world-space ground triangles)
+    """
+    camera = Camera(position=[400, 200, 800], target=[0, 0, 0], focal_length=600)
+    triangles = np.array(
+        [t["vertices"] for t in create_ground_plane_triangles(size, spacing)], float
+    )
+    return camera, create_mvp_matrix(camera, width, height), triangles
+
+
 def create_vertical_plane_triangles(size=100):
     """Create triangles for a vertical plane
 
@@ -250,45 +413,32 @@ def create_scene_objects():
     print("=== RENDER STEP 2: Creating 3D scene objects ===")
 
     scene_objects = [
-        {
-            "type": "ground_plane",
-            "pos": [0, 0, 0],
-            "size": 400,
-            "spacing": 50,
-            "color": DARK_GRAY_COLOR,
-            "name": "ground",
-        },
-        # {
-        #     "type": "cube",
-        #     "pos": [0, -50, 0],
-        #     "scale": 50,
-        #     "color": WHITE_COLOR,
-        #     "name": "center_cube",
-        # },
-        {
-            "type": "vertical_plane",
-            "pos": [0, 0, 0],
-            "size": 100,
-            "color": RED_COLOR,
-            "name": "front_plane",
-        },
-        {
-            "type": "vertical_plane",
-            "pos": [0, 0, -150],  # Behind the first plane
-            "size": 80,
-            "color": BLUE_COLOR,
-            "name": "back_plane",
-        },
-        {
-            "type": "axes",
-            "pos": [0, 0, 0],
-            "name": "coordinate_axes",
-        },
+        GroundPlane("ground", size=400, spacing=50, color=DARK_GRAY_COLOR),
+        # Cube("center_cube", pos=[0, -50, 0], scale=50, color=WHITE_COLOR),
+        VerticalPlane("front_plane", pos=[0, 0, 0], size=100, color=RED_COLOR),
+        # Behind the first plane
+        VerticalPlane("back_plane", pos=[0, 0, -150], size=80, color=BLUE_COLOR),
+        Axes("coordinate_axes"),
     ]
+    if MESH_PATH is not None:
+        scene_objects.append(
+            MeshModel("model", pos=[0, 0, 150], path=MESH_PATH, scale=MESH_SCALE)
+        )
+
+    # Tint the triangle colors once instead of every frame
+    for obj in scene_objects:
+        object_palette(obj)
+
+    if gpu_scene is not None:
+        # Geometry goes to the GPU once; frames only send matrices
+        for obj in scene_objects:
+            upload_gpu_object(obj)
+        kilobytes = gpu_scene.uploaded_bytes / 1024
+        print(f"✓ Scene uploaded to GPU buffers ({kilobytes:.1f} KB)")
 
     print(f"✓ Created {len(scene_objects)} scene objects")
     for obj in scene_objects:
-        print(f"  - {obj['name']}: {obj['type']}")
+        print(f"  - {obj.name}: {obj.kind}")
 
     return scene_objects
 
@@ -301,21 +451,126 @@ def draw_circle_filled(renderer, x, y, radius):
                 renderer.draw_point((x + dx, y + dy))
 
 
-def apply_color_tint(base_color, tint, intensity=0.3):
-    """Apply a color tint to a base color"""
-    r = int(base_color[0] * (1 - intensity) + tint[0] * intensity)
-    g = int(base_color[1] * (1 - intensity) + tint[1] * intensity)
-    b = int(base_color[2] * (1 - intensity) + tint[2] * intensity)
-    return (min(255, r), min(255, g), min(255, b))
+def ground_lod_for(size, spacing):
+    """GroundLOD instance for a plane size/spacing (kept across frames)"""
+    key = (size, spacing)
+    if key not in ground_lods:
+        tile_size = GROUND_LOD_TILE_SIZE
+        if tile_size % spacing or (2 * size) % tile_size:
+            tile_size = 2 * size  # Plane does not split evenly: one tile
+        ground_lods[key] = GroundLOD(size, spacing, tile_size, GROUND_LOD_DISTANCE)
+    return ground_lods[key]
+
+
+def terrain_cache_for(spacing):
+    """The streaming ground tile cache (created on first use)"""
+    global terrain_cache
+    if terrain_cache is None:
+        terrain_cache = TerrainTileCache(
+            GROUND_LOD_TILE_SIZE,
+            spacing,
+            TERRAIN_VIEW_RADIUS,
+            GROUND_LOD_DISTANCE if GROUND_LOD else float("inf"),
+            TERRAIN_CACHE_TILES,
+            TERRAIN_BACKGROUND,
+        )
+    return terrain_cache
+
+
+def ground_triangles(camera, size, spacing):
+    """World-space ground triangles: streamed tiles, LOD tiles or the plain grid"""
+    if INFINITE_GROUND:
+        return terrain_cache_for(spacing).triangles(camera.position, DARK_GRAY_COLOR)
+    if GROUND_LOD:
+        # Coarser cells for tiles far from the camera
+        lod = ground_lod_for(size, spacing)
+        return lod.triangles(camera.position, DARK_GRAY_COLOR)
+    return create_ground_plane_triangles(size, spacing)
+
+
+def ground_grid_segments(camera, size, spacing):
+    """World-space wireframe lines matching ground_triangles"""
+    if INFINITE_GROUND:
+        # Tiles around the camera from the streaming cache, size is ignored
+        tiles = terrain_cache_for(spacing).visible_tiles(
+            camera.position, DARK_GRAY_COLOR
+        )
+        return [segment for tile in tiles for segment in tile[1]]
+    if GROUND_LOD:
+        # Grid lines follow each tile's cell size
+        return ground_lod_for(size, spacing).grid_lines(camera.position)
+    # Grid lines parallel to the X axis, then parallel to the Z axis
+    ticks = range(-size, size + spacing, spacing)
+    segments = [([-size, 0, z], [size, 0, z]) for z in ticks]
+    segments += [([x, 0, -size], [x, 0, size]) for x in ticks]
+    return segments
+
+
+def clip_polygon_near(points, camera, near=None):
+    """The part of a convex polygon at least near in front of the camera
+
+    Sutherland-Hodgman against the plane at distance near along the view
+    direction.
+
+    Args:
+        points: Polygon vertices in world space, in order
+        camera: Camera whose view direction defines the plane
+        near: Distance of the plane, NEAR_CLIP_DISTANCE by default
+
+    Returns:
+        List of vertices (arrays), empty when the polygon is behind it
+    """
+    if near is None:
+        near = NEAR_CLIP_DISTANCE
+    points = np.asarray(points, dtype=float)
+    position = np.asarray(camera.position, dtype=float)
+    forward = normalize(np.asarray(camera.target, dtype=float) - position)
+    distances = (points - position) @ forward - near
+    clipped = []
+    for i, (a, da) in enumerate(zip(points, distances, strict=True)):
+        b, db = points[(i + 1) % len(points)], distances[(i + 1) % len(points)]
+        if da >= 0:
+            clipped.append(a)
+        if (da >= 0) != (db >= 0):
+            clipped.append(a + da / (da - db) * (b - a))
+    return clipped
 
 
 def draw_ground_plane(renderer, camera, size=400, spacing=50):
     """Draw ground plane with triangles and/or wireframe based on render flags"""
-
     # Draw filled triangles
-    if RENDER_TRIANGLES:
-        triangles = create_ground_plane_triangles(size, spacing)
-        for triangle in triangles:
+    if RENDER_TRIANGLES and GROUND_SHADER == "checkerboard" and not INFINITE_GROUND:
+        # The whole plane as a fan of 2 triangles, the shader paints the
+        # cells. Clipped against the near plane first: with the camera near
+        # or over the plane, corners behind it would project mirrored.
+        corners = [
+            [-size, 0, -size],
+            [size, 0, -size],
+            [size, 0, size],
+            [-size, 0, size],
+        ]
+        polygon = clip_polygon_near(corners, camera)
+        triangles = [
+            [polygon[0], polygon[i], polygon[i + 1]] for i in range(1, len(polygon) - 1)
+        ]
+        shader = checkerboard_shader(spacing, GROUND_CHECKER_COLORS)
+        for vertices in triangles:
+            p1, p2, p3 = (project_3d_to_2d(np.array(v), camera) for v in vertices)
+            if p1 and p2 and p3:
+                render_triangle(
+                    renderer,
+                    p1[:2],
+                    p2[:2],
+                    p3[:2],
+                    DARK_GRAY_COLOR,
+                    p1[2],
+                    p2[2],
+                    p3[2],
+                    shader=shader,
+                    attributes={"position": list(vertices)},
+                )
+    elif RENDER_TRIANGLES:
+        for triangle in ground_triangles(camera, size, spacing):
             # Project triangle vertices to 2D with depth
             p1_result = project_3d_to_2d(triangle["vertices"][0], camera)
             p2_result = project_3d_to_2d(triangle["vertices"][1], camera)
@@ -329,27 +584,13 @@ def draw_ground_plane(renderer, camera, size=400, spacing=50):
                 p3, z3 = (p3_result[0], p3_result[1]), p3_result[2]
 
                 render_triangle(renderer, p1, p2, p3, triangle["color"], z1, z2, z3)
+        flush_pending_triangles(renderer)
 
     # Draw wireframe grid
     if RENDER_WIREFRAME:
-        renderer.color = sdl2.ext.Color(80, 80, 80, 255)  # Dark gray
-
-        # Create grid lines parallel to X axis
-        for z in range(-size, size + spacing, spacing):
-            start_point = np.array([-size, 0, z])
-            end_point = np.array([size, 0, z])
-
-            start_2d = project_3d_to_2d(start_point, camera)
-            end_2d = project_3d_to_2d(end_point, camera)
-
-            if start_2d and end_2d:
-                renderer.draw_line((start_2d[0], start_2d[1], end_2d[0], end_2d[1]))
-
-        # Create grid lines parallel to Z axis
-        for x in range(-size, size + spacing, spacing):
-            start_point = np.array([x, 0, -size])
-            end_point = np.array([x, 0, size])
+        renderer.color = (80, 80, 80, 255)  # Dark gray
 
+        for start_point, end_point in ground_grid_segments(camera, size, spacing):
             start_2d = project_3d_to_2d(start_point, camera)
             end_2d = project_3d_to_2d(end_point, camera)
 
@@ -357,7 +598,7 @@ def draw_ground_plane(renderer, camera, size=400, spacing=50):
                 renderer.draw_line((start_2d[0], start_2d[1], end_2d[0], end_2d[1]))
 
         # Draw center lines slightly brighter
-        renderer.color = sdl2.ext.Color(120, 120, 120, 255)  # Lighter gray
+        renderer.color = (120, 120, 120, 255)  # Lighter gray
 
         # Center line along X axis
         start_2d = project_3d_to_2d(np.array([-size, 0, 0]), camera)
@@ -372,42 +613,60 @@ def draw_ground_plane(renderer, camera, size=400, spacing=50):
             renderer.draw_line((start_2d[0], start_2d[1], end_2d[0], end_2d[1]))
 
 
-def draw_cube(renderer, obj_data, camera):
-    """Draw a single cube at a given position with given scale"""
-    # Create vertices for this cube
-    vertices = create_cube_vertices(obj_data["scale"])
+def scene_node_for(obj):
+    """Scene graph node of a cube, vertical plane or mesh, synced to obj.pos
 
-    # Translate vertices to cube position
-    translated_vertices = vertices + np.array(obj_data["pos"])
+    Nodes are created on first use. Only a changed position marks the node
+    dirty, so static objects keep their cached world vertices.
+    """
+    global scene_graph
+    if scene_graph is None:
+        scene_graph = SceneGraph()
+    node = scene_graph.find(obj.name)
+    if node is None:
+        if obj.kind == "mesh":
+            # Transform only: the pipeline applies it to the mesh chunk by chunk
+            scale = (obj.scale,) * 3
+            node = scene_graph.add(SceneNode(obj.name, scale=scale))
+        else:
+            if obj.kind == "cube":
+                vertices = create_cube_vertices(obj.scale)
+            else:
+                vertices = np.array(vertical_plane_geometry["vertices"]) * obj.size
+            node = scene_graph.add(SceneNode(obj.name, vertices=vertices))
+    node.set_transform(translation=obj.pos)
+    return node
 
-    # Project all vertices to 2D
-    projected_vertices = []
-    for vertex in translated_vertices:
-        point_2d = project_3d_to_2d(vertex, camera)
-        projected_vertices.append(point_2d)
+
+def project_vertices(vertices, camera):
+    """Project an array of world-space vertices (None for hidden ones)"""
+    if USE_MATRIX_PROJECTION:
+        mvp_matrix = cached_mvp_matrix(camera, render_width, render_height)
+        return project_points_via_matrix(vertices, mvp_matrix, RASTER_BACKEND)
+    return [project_3d_to_2d(vertex, camera) for vertex in vertices]
+
+
+@scene_type("cube", [triangle["color"] for triangle in cube_geometry["triangles"]])
+def draw_cube(renderer, obj_data, camera):
+    """Draw a single cube at a given position with given scale"""
+    # World-space vertices from the scene graph, projected all at once
+    node = scene_node_for(obj_data)
+    projected_vertices = project_vertices(node.world_vertices(), camera)
 
     # Draw triangles (filled faces)
     if RENDER_TRIANGLES:
-        for triangle in cube_geometry["triangles"]:
-            # Get the 3D vertices for this triangle
-            v1 = translated_vertices[triangle["vertices"][0]]
-            v2 = translated_vertices[triangle["vertices"][1]]
-            v3 = translated_vertices[triangle["vertices"][2]]
-
-            # Project to 2D
-            p1 = project_3d_to_2d(v1, camera)
-            p2 = project_3d_to_2d(v2, camera)
-            p3 = project_3d_to_2d(v3, camera)
+        palette = object_palette(obj_data)  # Tinted triangle colors
+        for triangle, color in zip(cube_geometry["triangles"], palette, strict=True):
+            p1, p2, p3 = (projected_vertices[index] for index in triangle["vertices"])
 
             # Only render if all vertices are visible
             if p1 and p2 and p3:
-                # Apply object color tint to triangle color
-                tinted_color = apply_color_tint(triangle["color"], obj_data["color"])
-                render_triangle(renderer, p1, p2, p3, tinted_color)
+                render_triangle(renderer, p1, p2, p3, color)
+        flush_pending_triangles(renderer)
 
     # Draw wireframe edges
     if RENDER_WIREFRAME:
-        renderer.color = sdl2.ext.Color(200, 200, 200, 255)  # Light gray for edges
+        renderer.color = (200, 200, 200, 255)  # Light gray for edges
         for edge in cube_geometry["edges"]:
             start_vertex = projected_vertices[edge[0]]
             end_vertex = projected_vertices[edge[1]]
@@ -418,38 +677,144 @@ def draw_cube(renderer, obj_data, camera):
                 )
 
 
+def cull_scene_objects(scene_objects, camera):
+    """Objects whose bounds are not completely outside the view frustum
+
+    The BVH covers every object seen so far; it is refit when objects move
+    and rebuilt when new ones appear. Objects without finite bounds (the
+    endless ground) are always kept.
+    """
+    global object_bvh, object_bvh_names, object_bvh_bounds, culled_objects
+
+    bounded = {}
+    for obj in scene_objects:
+        points = object_bound_points(obj)
+        if points:
+            bounded[obj.name] = np.array(points, dtype=float)
+    names = sorted(bounded.keys() | set(object_bvh_names))
+    if object_bvh is None or names != object_bvh_names:
+        object_bvh_names = names
+        object_bvh_bounds = (
+            np.full((len(names), 3), np.inf),
+            np.full((len(names), 3), -np.inf),
+        )
+        object_bvh = None
+
+    lo, hi = object_bvh_bounds
+    changed = []
+    for i, name in enumerate(object_bvh_names):
+        if name in bounded:
+            points = bounded[name]
+            new_lo, new_hi = points.min(axis=0), points.max(axis=0)
+            if not (np.array_equal(new_lo, lo[i]) and np.array_equal(new_hi, hi[i])):
+                lo[i], hi[i] = new_lo, new_hi
+                changed.append(i)
+    if object_bvh is None:
+        object_bvh = BVH(lo, hi, leaf_size=2)
+    elif changed:
+        object_bvh.refit(lo, hi, changed)
+
+    mvp_matrix = cached_mvp_matrix(camera, render_width, render_height)
+    planes = frustum_planes(
+        mvp_matrix, render_width, render_height, camera_w_sign(camera, mvp_matrix)
+    )
+    visible = {object_bvh_names[i] for i in object_bvh.cull(planes)}
+    kept = [
+        obj for obj in scene_objects if obj.name in visible or obj.name not in bounded
+    ]
+    culled_objects = len(scene_objects) - len(kept)
+    return kept
+
+
+def pick_bvh_for(obj, camera):
+    """(TriangleBVH in model space, world matrix) of an object, None for the axes
+
+    Trees are built once per geometry (mesh file, cube scale, plane size)
+    and the ray is moved into model space instead. The ground's triangles
+    follow the camera with GROUND_LOD or INFINITE_GROUND: its tree is refit
+    when they moved and rebuilt when their count changed.
+    """
+    if obj.kind == "ground_plane":
+        triangles = np.array(
+            [t["vertices"] for t in ground_triangles(camera, obj.size, obj.spacing)],
+            float,
+        )
+        key = (obj.kind, obj.name)
+        tree = pick_bvhs.get(key)
+        if tree is None or len(tree.triangles) != len(triangles):
+            tree = pick_bvhs[key] = TriangleBVH(triangles)
+        elif not np.array_equal(tree.triangles, triangles):
+            tree.update(triangles)
+        return tree, np.eye(4)
+    if obj.kind in ("cube", "vertical_plane"):
+        node = scene_node_for(obj)
+        key = (obj.kind, obj.scale if obj.kind == "cube" else obj.size)
+        if key not in pick_bvhs:
+            geometry = cube_geometry if obj.kind == "cube" else vertical_plane_geometry
+            indices = [triangle["vertices"] for triangle in geometry["triangles"]]
+            pick_bvhs[key] = TriangleBVH(node.vertices[np.array(indices)])
+        return pick_bvhs[key], node.world_matrix
+    if obj.kind == "mesh":
+        key = (obj.kind, obj.path)
+        if key not in pick_bvhs:
+            mesh = mesh_for(obj)[0]
+            pick_bvhs[key] = TriangleBVH(mesh.vertices[mesh.indices])
+        return pick_bvhs[key], scene_node_for(obj).world_matrix
+    return None
+
+
+def pick_scene_object(scene_objects, camera, x, y):
+    """Nearest object under window pixel (x, y): (name, world point) or None
+
+    Holds scene_lock: with THREADED_RENDERING the render thread uses the
+    same scene graph, meshes and ground LOD state.
+    """
+    mvp_matrix = create_mvp_matrix(camera, WIDTH, HEIGHT)
+    origin, direction = screen_ray(x, y, camera, mvp_matrix)
+    picked, nearest = None, np.inf
+    with scene_lock:
+        for obj in scene_objects:
+            found = pick_bvh_for(obj, camera)
+            if found is None:
+                continue
+            tree, world_matrix = found
+            # The ray parameter is the same in model space: the direction is
+            # transformed without normalizing it
+            inverse = np.linalg.inv(world_matrix)
+            local_origin = inverse[:3, :3] @ origin + inverse[:3, 3]
+            index, distance = tree.pick(local_origin, inverse[:3, :3] @ direction)
+            if index is not None and distance < nearest:
+                picked, nearest = obj.name, distance
+    if picked is None:
+        return None
+    return picked, origin + nearest * direction
+
+
 def render_scene(renderer, camera, scene_objects):
     """Render all objects in the scene based on their type"""
+    if FRUSTUM_CULLING:
+        scene_objects = cull_scene_objects(scene_objects, camera)
     for obj in scene_objects:
-        if obj["type"] == "ground_plane":
-            draw_ground_plane(renderer, camera, obj["size"], obj["spacing"])
-        elif obj["type"] == "axes":
-            draw_axes(renderer, camera)
-        elif obj["type"] == "cube":
-            draw_cube(renderer, obj, camera)
-        elif obj["type"] == "vertical_plane":
-            draw_vertical_plane(renderer, obj, camera)
+        # Draw function registered for the object's kind (@scene_type)
+        draw_scene_object(renderer, obj, camera)
+        flush_pending_triangles(renderer)
 
 
+@scene_type(
+    "vertical_plane",
+    [triangle["color"] for triangle in vertical_plane_geometry["triangles"]],
+)
 def draw_vertical_plane(renderer, obj_data, camera):
     """Draw a vertical plane"""
     if RENDER_TRIANGLES:
-        triangles = create_vertical_plane_triangles(obj_data["size"])
-        for triangle in triangles:
-            # Translate vertices to plane position
-            translated_vertices = []
-            for vertex in triangle["vertices"]:
-                translated_vertex = [
-                    vertex[0] + obj_data["pos"][0],
-                    vertex[1] + obj_data["pos"][1],
-                    vertex[2] + obj_data["pos"][2],
-                ]
-                translated_vertices.append(translated_vertex)
-
-            # Project triangle vertices to 2D with depth
-            p1_result = project_3d_to_2d(translated_vertices[0], camera)
-            p2_result = project_3d_to_2d(translated_vertices[1], camera)
-            p3_result = project_3d_to_2d(translated_vertices[2], camera)
+        node = scene_node_for(obj_data)
+        projected = project_vertices(node.world_vertices(), camera)
+        palette = object_palette(obj_data)  # Tinted triangle colors
+        triangles = vertical_plane_geometry["triangles"]
+        for triangle, color in zip(triangles, palette, strict=True):
+            p1_result, p2_result, p3_result = (
+                projected[index] for index in triangle["vertices"]
+            )
 
             # Only render if all vertices are visible
             if p1_result and p2_result and p3_result:
@@ -458,9 +823,102 @@ def draw_vertical_plane(renderer, obj_data, camera):
                 p2, z2 = (p2_result[0], p2_result[1]), p2_result[2]
                 p3, z3 = (p3_result[0], p3_result[1]), p3_result[2]
 
-                # Apply object color tint to triangle color
-                tinted_color = apply_color_tint(triangle["color"], obj_data["color"])
-                render_triangle(renderer, p1, p2, p3, tinted_color, z1, z2, z3)
+                render_triangle(renderer, p1, p2, p3, color, z1, z2, z3)
+
+
+@scene_type("ground_plane")
+def draw_ground_plane_object(renderer, obj_data, camera):
+    draw_ground_plane(renderer, camera, obj_data.size, obj_data.spacing)
+
+
+@scene_type("axes")
+def draw_axes_object(renderer, obj_data, camera):
+    draw_axes(renderer, camera)
+
+
+def mesh_for(obj):
+    """(Mesh, (2, 3) bounds) of a MeshModel's file, loaded on first use"""
+    if obj.path not in meshes:
+        start = time.perf_counter()
+        mesh = load_mesh(obj.path)
+        bounds = np.array(mesh.bounds, dtype=float)
+        meshes[obj.path] = (mesh, bounds)
+        logging.info(
+            "Mesh %s: %d vertices, %d triangles (%s, %.1f ms)",
+            obj.path,
+            len(mesh.vertices),
+            len(mesh.indices),
+            "memory-mapped cache" if mesh.source == "cache" else "parsed",
+            (time.perf_counter() - start) * 1000,
+        )
+    return meshes[obj.path]
+
+
+def mesh_pipeline():
+    """The streaming GeometryPipeline models are drawn through"""
+    global geometry_pipeline
+    if geometry_pipeline is None:
+        geometry_pipeline = GeometryPipeline(
+            MESH_CHUNK_SIZE, BACKFACE_CULLING, vertex_colors=MESH_SHADING == "gouraud"
+        )
+    return geometry_pipeline
+
+
+@scene_type("mesh")
+def draw_mesh(renderer, obj_data, camera):
+    """Draw a loaded OBJ/PLY model with one flat color per triangle
+
+    The mesh streams through the geometry pipeline in MESH_CHUNK_SIZE
+    triangle chunks (always with the matrix projection). Batched raster
+    backends get each chunk's arrays directly, and triangles queued for the
+    raster workers are flushed after every chunk, so nothing of the mesh
+    outlives its chunk.
+    """
+    if not RENDER_TRIANGLES:
+        return
+    mvp_matrix = cached_mvp_matrix(camera, render_width, render_height)
+    model_matrix = scene_node_for(obj_data).world_matrix
+
+    def draw(p1, p2, p3, z1, z2, z3, color):
+        render_triangle(renderer, p1, p2, p3, color, z1, z2, z3)
+
+    def draw_gouraud(p1, p2, p3, z1, z2, z3, colors):
+        average = tuple(sum(channel) // 3 for channel in zip(*colors, strict=True))
+        attributes = {"color": colors}
+        render_triangle(renderer, p1, p2, p3, average, z1, z2, z3, gouraud, attributes)
+
+    def draw_chunk(points, colors):
+        coordinates = np.concatenate(
+            [points[:, :, :2].reshape(-1, 6), points[:, :, 2]], axis=1
+        )
+        rasterize_triangle_arrays(
+            renderer, coordinates, colors.astype(np.uint8), RASTER_BACKEND
+        )
+
+    gouraud = gouraud_shader() if MESH_SHADING == "gouraud" else None
+    # Same conditions as render_triangle's queueing for the raster kernels
+    batched = (
+        USE_Z_BUFFER
+        and gouraud is None
+        and not DEPTH_FOG
+        and not multisample_active
+        and raster_pool is None
+        and RASTER_BACKEND != "python"
+    )
+
+    # Triangles queued by earlier objects go first, as in the draw order
+    flush_pending_triangles(renderer)
+    mesh_pipeline().run(
+        mesh_for(obj_data)[0],
+        mvp_matrix @ model_matrix,
+        camera_w_sign(camera, mvp_matrix),
+        render_width,
+        render_height,
+        draw if gouraud is None else draw_gouraud,
+        obj_data.color,
+        flush=lambda: flush_pending_triangles(renderer),
+        draw_chunk=draw_chunk if batched else None,
+    )
 
 
 def draw_axes(renderer, camera):
@@ -483,25 +941,140 @@ def draw_axes(renderer, camera):
         # X axis
         if x_axis_2d:
             color = axes_geometry["colors"]["x"]
-            renderer.color = sdl2.ext.Color(color[0], color[1], color[2], 255)
+            renderer.color = (color[0], color[1], color[2], 255)
             renderer.draw_line((origin_2d[0], origin_2d[1], x_axis_2d[0], x_axis_2d[1]))
             draw_circle_filled(renderer, x_axis_2d[0], x_axis_2d[1], 3)
 
         # Y axis
         if y_axis_2d:
             color = axes_geometry["colors"]["y"]
-            renderer.color = sdl2.ext.Color(color[0], color[1], color[2], 255)
+            renderer.color = (color[0], color[1], color[2], 255)
             renderer.draw_line((origin_2d[0], origin_2d[1], y_axis_2d[0], y_axis_2d[1]))
             draw_circle_filled(renderer, y_axis_2d[0], y_axis_2d[1], 3)
 
         # Z axis
         if z_axis_2d:
             color = axes_geometry["colors"]["z"]
-            renderer.color = sdl2.ext.Color(color[0], color[1], color[2], 255)
+            renderer.color = (color[0], color[1], color[2], 255)
             renderer.draw_line((origin_2d[0], origin_2d[1], z_axis_2d[0], z_axis_2d[1]))
             draw_circle_filled(renderer, z_axis_2d[0], z_axis_2d[1], 3)
 
 
+def upload_gpu_object(obj):
+    """Upload an object's model-space geometry into gpu_scene
+
+    The same triangles, colors and wireframe as its draw function, placed
+    by gpu_model_matrix every frame. A ground with LOD tiles or streamed
+    terrain changes with the camera: see stream_gpu_ground instead.
+    """
+    name = obj.name
+    if obj.kind == "ground_plane" and (GROUND_LOD or INFINITE_GROUND):
+        return
+    if obj.kind == "ground_plane":
+        size, spacing = obj.size, obj.spacing
+        if RENDER_TRIANGLES:
+            triangles = create_ground_plane_triangles(size, spacing)
+            gpu_scene.upload(
+                name,
+                [triangle["vertices"] for triangle in triangles],
+                [triangle["color"] for triangle in triangles],
+            )
+        if RENDER_WIREFRAME:
+            ticks = range(-size, size + spacing, spacing)
+            segments = [([-size, 0, z], [size, 0, z]) for z in ticks]
+            segments += [([x, 0, -size], [x, 0, size]) for x in ticks]
+            gpu_scene.upload(name, segments, [(80, 80, 80)] * len(segments), "lines")
+            center = [([-size, 0, 0], [size, 0, 0]), ([0, 0, -size], [0, 0, size])]
+            gpu_scene.upload(name, center, [(120, 120, 120)] * 2, "lines")
+    elif obj.kind == "cube" and GPU_INSTANCING:
+        gpu_cube_slots[name] = gpu_cube_instances().add(
+            cube_instance_matrix(obj), obj.color
+        )
+    elif obj.kind in ("cube", "vertical_plane"):
+        if obj.kind == "cube":
+            geometry, vertices = cube_geometry, create_cube_vertices(obj.scale)
+        else:
+            geometry = vertical_plane_geometry
+            vertices = np.array(geometry["vertices"]) * obj.size
+        if RENDER_TRIANGLES:
+            indices = [triangle["vertices"] for triangle in geometry["triangles"]]
+            gpu_scene.upload(name, vertices[np.array(indices)], object_palette(obj))
+        if RENDER_WIREFRAME and obj.kind == "cube":
+            edges = vertices[np.array(cube_geometry["edges"])]
+            gpu_scene.upload(name, edges, [(200, 200, 200)] * len(edges), "lines")
+    elif obj.kind == "mesh":
+        if RENDER_TRIANGLES:
+            # Vertex colors tinted like the geometry pipeline's, blended
+            # across each triangle
+            mesh = mesh_for(obj)[0]
+            color = np.asarray(obj.color, dtype=float)
+            colors = np.broadcast_to(color, mesh.vertices.shape)
+            if mesh.colors is not None:
+                colors = mesh.colors * (1 - VERTEX_COLOR_TINT)
+                colors += color * VERTEX_COLOR_TINT
+            gpu_scene.upload_indexed(name, mesh.vertices, mesh.indices, colors)
+    elif obj.kind == "axes":
+        length = axes_geometry["length"]
+        ends = np.eye(3) * length
+        colors = [axes_geometry["colors"][axis] for axis in "xyz"]
+        gpu_scene.upload(name, [(np.zeros(3), end) for end in ends], colors, "lines")
+        # The end dots, as 7 pixel points (circles of radius 3 on the CPU)
+        gpu_scene.upload(name, ends[:, None, :], colors, "points", point_size=7.0)
+
+
+def stream_gpu_ground(obj, camera):
+    """Queue this frame's ground (LOD tiles or streamed terrain) on gpu_scene
+
+    Same triangles and lines as draw_ground_plane, uploaded through the
+    scene's streaming vertex ring.
+    """
+    size, spacing = obj.size, obj.spacing
+    if RENDER_TRIANGLES:
+        triangles = ground_triangles(camera, size, spacing)
+        gpu_scene.stream_draw(
+            obj.name,
+            [triangle["vertices"] for triangle in triangles],
+            [triangle["color"] for triangle in triangles],
+            "triangles",
+        )
+    if RENDER_WIREFRAME:
+        segments = ground_grid_segments(camera, size, spacing)
+        gpu_scene.stream_draw(obj.name, segments, [(80, 80, 80)] * len(segments))
+        center = [([-size, 0, 0], [size, 0, 0]), ([0, 0, -size], [0, 0, size])]
+        gpu_scene.stream_draw(obj.name, center, [(120, 120, 120)] * 2)
+
+
+def gpu_cube_instances():
+    """InstancedMesh drawing every cube with GPU_INSTANCING (created on first use)"""
+    global gpu_cubes
+    if gpu_cubes is None:
+        vertices = create_cube_vertices(1)
+        triangles = cube_geometry["triangles"]
+        points = None
+        if RENDER_TRIANGLES:
+            points = vertices[
+                np.array([triangle["vertices"] for triangle in triangles])
+            ]
+        edges = vertices[np.array(cube_geometry["edges"])] if RENDER_WIREFRAME else None
+        colors = [triangle["color"] for triangle in triangles]
+        gpu_cubes = gpu_scene.add_instanced(
+            "cubes", InstancedMesh(gpu_scene.ctx, points, colors, edges)
+        )
+    return gpu_cubes
+
+
+def cube_instance_matrix(obj):
+    """Model matrix of a cube instance: the unit cube scaled, then placed"""
+    return scene_node_for(obj).world_matrix @ scale_matrix((obj.scale,) * 3)
+
+
+def gpu_model_matrix(obj):
+    """Model matrix placing an object's uploaded geometry in the world"""
+    if obj.kind in ("cube", "vertical_plane", "mesh"):
+        return scene_node_for(obj).world_matrix
+    return np.eye(4)
+
+
 # Rendering options
 RENDER_WIREFRAME = True  # Set to False to disable wireframe edges
 RENDER_TRIANGLES = True  # Set to False to disable filled triangles
@@ -510,8 +1083,177 @@ USE_Z_BUFFER = True  # True for z-buffered rendering, False for simple overlay
 # Projection method selection
 USE_MATRIX_PROJECTION = True  # True for matrix method, False for direct method
 
+# Frame pacing: "fixed" (sleep until the next deadline), "vsync", "uncapped"
+# (benchmarking) or "on_demand" (skip frames when camera and scene are unchanged)
+FRAME_PACING = "fixed"
+TARGET_FPS = 60
+# Window events after which the frame on screen must be redrawn
+REDRAW_WINDOW_EVENTS = (
+    sdl2.SDL_WINDOWEVENT_EXPOSED,
+    sdl2.SDL_WINDOWEVENT_SHOWN,
+    sdl2.SDL_WINDOWEVENT_RESTORED,
+    sdl2.SDL_WINDOWEVENT_SIZE_CHANGED,
+)
+
+# Frame output
+USE_FRAME_BUFFER = True  # True to paint into a CPU frame buffer uploaded once per frame
+RASTER_WORKERS = 0  # >0 rasterizes triangles in worker processes via shared memory
+
+# Recording (needs USE_FRAME_BUFFER)
+RECORD_FORMAT = None  # None to disable, or "png", "rgb", "y4m"
+RECORD_PATH = "recording"  # Directory for "png", file for "rgb"/"y4m"
+RECORD_POLICY = "drop"  # "drop" frames or "block" the loop when writers fall behind
+
+# Remote viewing (needs USE_FRAME_BUFFER)
+STREAM_FORMAT = None  # None to disable, "mjpeg" (browser) or "raw"
+STREAM_ADDRESS = ("127.0.0.1", 8765)  # Localhost only
+STREAM_UNIX_PATH = None  # Set to a path to serve on a UNIX socket instead
+
+# Rasterize on a render thread while the main thread handles events and presents
+# (needs USE_FRAME_BUFFER)
+THREADED_RENDERING = False
+FRAME_SLOTS = 3  # 2 = double buffering, 3 = triple buffering
+
+# Dynamic resolution: render fewer pixels when frames go over budget and let
+# SDL upscale to the window (single-threaded loop without RASTER_WORKERS)
+DYNAMIC_RESOLUTION = False
+TARGET_FRAME_MS = 33.0
+MIN_RENDER_SCALE = 0.25
+
+# Dirty rectangles: when the camera is still, clear and redraw only the screen
+# regions of objects that changed (single-threaded loop without RASTER_WORKERS)
+DIRTY_RECTS = False
+DEBUG_DIRTY_RECTS = False  # Outline the redrawn rectangles on screen
+ANIMATE_SCENE = False  # Slide the back plane to have something that moves
+
+# Ground plane level of detail: tiles far from the camera use coarser cells
+GROUND_LOD = True
+GROUND_LOD_TILE_SIZE = 200  # World units per LOD tile
+GROUND_LOD_DISTANCE = 400  # Tiles closer than this use the full grid spacing
+
+# Skip objects whose bounds are outside the view (BVH over object bounds)
+FRUSTUM_CULLING = True
+
+# Endless ground streamed as tiles around the camera instead of the fixed
+# square (uses GROUND_LOD_TILE_SIZE and, with GROUND_LOD, the LOD levels)
+INFINITE_GROUND = False
+TERRAIN_VIEW_RADIUS = 2  # Tiles drawn in each direction from the camera's tile
+TERRAIN_CACHE_TILES = 64  # LRU cache size in tile meshes
+TERRAIN_BACKGROUND = True  # Build the next ring of tiles on a worker thread
+
+# Temporal reprojection: warp the previous frame to the new camera using its
+# depth buffer and only rasterize the holes; full render every N frames
+# (single-threaded loop without RASTER_WORKERS, needs the matrix projection)
+REPROJECTION = False
+REPROJECTION_REFRESH = 8
+REPROJECTION_CHECK = False  # Also render each frame in full and log the error
+
+# Model file (.obj or .ply) added to the scene; the first load converts it to
+# a .npy cache that later runs memory-map instead of parsing (see mesh_loader)
+MESH_PATH = None
+MESH_SCALE = 1.0
+MESH_CHUNK_SIZE = 4096  # Triangles per chunk in the streaming geometry pipeline
+BACKFACE_CULLING = False  # Skip mesh triangles facing away (needs consistent winding)
+
+# Vectorized fragment shading (see shading.py, z-buffered triangles only)
+GROUND_SHADER = None  # "checkerboard": the plane as 2 shaded triangles (not streamed)
+GROUND_CHECKER_COLORS = (DARK_GRAY_COLOR, (85, 85, 85))
+# Shaded geometry is clipped this far in front of the camera (see
+# clip_polygon_near)
+NEAR_CLIP_DISTANCE = 1.0
+MESH_SHADING = "flat"  # "flat" or "gouraud" (blends the model's vertex colors)
+DEPTH_FOG = False  # Fade every z-buffered triangle to black with depth
+FOG_RANGE = (800.0, 2000.0)  # Depths where the fog starts and where it is opaque
+
+# Flat z-buffered triangles and vertex projection: "python" (per-pixel loop),
+# "numpy" (vectorized), "numba" (compiled, parallel over row tiles, cached
+# on disk; falls back to "numpy" when Numba is not installed) or "scanline"
+# (fixed-point spans, top-left fill rule: shared edges are drawn once)
+RASTER_BACKEND = "python"
+
+# Rendering backend, chosen at startup: "cpu" (the software rasterizer) or
+# "gpu" (ModernGL draws the same scene from buffers uploaded once, into an
+# offscreen frame read back into the frame buffer; see gpu_renderer.py). The
+# GPU draws without shaders (GROUND_SHADER, DEPTH_FOG) and streams the LOD or
+# terrain ground every frame; it needs USE_FRAME_BUFFER, and the other frame
+# options below are CPU only.
+RENDER_BACKEND = "cpu"
+# With the GPU backend, draw all cubes as instances of one mesh: one draw
+# call for every cube, and only moved cubes are uploaded each frame. Their
+# wireframe is depth tested (see gpu_instancing), so unlike the per-object
+# wireframe, edges hidden by any cube, including their own, are not drawn
+GPU_INSTANCING = True
+# With the GPU backend, read frames back through a pair of pixel buffer
+# objects: the previous frame is fetched while the current one is copied, so
+# the read need not wait for the GPU, but frames are shown one frame late
+# (slower than the direct read on software GL, see gpu_readback.py)
+GPU_ASYNC_READBACK = False
+
+# Depth pre-pass: draw the scene once writing only the z-buffer, then again
+# coloring only the fragments left visible, so each pixel is shaded once
+# (pays off with expensive shaders and high overdraw; coverage is tested twice)
+DEPTH_PREPASS = False
+# Multisample anti-aliasing (render_cpu_frame, and render_dirty_regions for
+# DIRTY_RECTS and reprojection holes): 2, 4 or 8 samples of coverage and
+# depth per pixel, shading once per pixel, averaged into the frame once per
+# redraw. 1 disables it. Not with RASTER_WORKERS.
+MSAA_SAMPLES = 1
+
+# Count color writes per pixel (not those made by RASTER_WORKERS processes);
+# SHOW_OVERDRAW displays the count as a heatmap instead of the frame
+COUNT_OVERDRAW = False
+SHOW_OVERDRAW = False
+
+# Internal render resolution (equals the window size unless scaled)
+render_width, render_height = WIDTH, HEIGHT
+
+# GPUScene holding the scene's buffers (RENDER_BACKEND = "gpu"), its
+# AsyncReadback (GPU_ASYNC_READBACK), and the instanced cube mesh with each
+# cube's instance index (GPU_INSTANCING)
+gpu_scene = None
+gpu_readback = None
+gpu_cubes = None
+gpu_cube_slots = {}
+
+# MultisampleBuffers (MSAA_SAMPLES > 1), and whether triangles currently go
+# to them (see render_cpu_frame and render_dirty_regions)
+multisample = None
+multisample_active = False
+
+# Worker pool or raster kernels, and the triangles queued for them (see
+# flush_pending_triangles)
+raster_pool = None
+pending_triangles = []
+
+# GroundLOD per (size, spacing) of ground plane objects
+ground_lods = {}
+
+# Transforms of the cubes, vertical planes and models (see scene_node_for)
+scene_graph = None
+
+# Object-bounds BVH for frustum culling (see cull_scene_objects)
+object_bvh = None
+object_bvh_names = []
+object_bvh_bounds = None
+culled_objects = 0
+
+# Model-space triangle BVHs for picking (see pick_bvh_for), and the lock
+# picking holds while it reads scene state the render thread also uses
+pick_bvhs = {}
+scene_lock = threading.Lock()
+
+# path -> (Mesh, bounds) of loaded models, and the pipeline drawing them
+meshes = {}
+geometry_pipeline = None
+
+# TerrainTileCache used when INFINITE_GROUND is set
+terrain_cache = None
+
+# (camera/size key, matrix) of the last MVP matrix built by cached_mvp_matrix
+mvp_cache = None
+
 # Colors
-BLACK = sdl2.ext.Color(0, 0, 0, 255)
+BLACK = (0, 0, 0, 255)
 
 
 def setup_camera_and_projection():
@@ -541,17 +1283,47 @@ def setup_camera_and_projection():
     return camera, orbit_params
 
 
+def cached_mvp_matrix(camera, width, height):
+    """MVP matrix for camera, rebuilt only when the camera or size changed"""
+    global mvp_cache
+    key = (tuple(camera.position), tuple(camera.target), camera.focal_length)
+    key += (width, height)
+    if mvp_cache is None or mvp_cache[0] != key:
+        mvp_cache = (key, create_mvp_matrix(camera, width, height))
+    return mvp_cache[1]
+
+
 # Projection method selection based on configuration
-def project_3d_to_2d(point, camera, width=WIDTH, height=HEIGHT):
+def project_3d_to_2d(point, camera, width=None, height=None):
+    # Default to the current internal render resolution
+    width = render_width if width is None else width
+    height = render_height if height is None else height
     if USE_MATRIX_PROJECTION:
-        return project_3d_to_2d_via_matrix(point, camera, width, height)
+        return project_3d_to_2d_via_matrix(
+            point, camera, width, height, cached_mvp_matrix(camera, width, height)
+        )
     else:
         return project_3d_to_2d_direct(point, camera, width, height)
 
 
 # Triangle rendering wrapper - handles z-buffer toggle
-def render_triangle(renderer, p1, p2, p3, color, z1=None, z2=None, z3=None):
-    """Unified triangle rendering that automatically chooses z-buffered or regular rendering"""
+def render_triangle(
+    renderer,
+    p1,
+    p2,
+    p3,
+    color,
+    z1=None,
+    z2=None,
+    z3=None,
+    shader=None,
+    attributes=None,
+):
+    """Unified triangle rendering that automatically chooses z-buffered or regular rendering
+
+    With a shader (see shading.py) z-buffered triangles are colored per
+    fragment; without the z-buffer they fall back to the flat color.
+    """
     if USE_Z_BUFFER and z1 is not None and z2 is not None and z3 is not None:
         # Extract 2D coordinates if we have 3D points
         if len(p1) == 3:
@@ -559,6 +1331,24 @@ def render_triangle(renderer, p1, p2, p3, color, z1=None, z2=None, z3=None):
             z1, z2, z3 = p1[2], p2[2], p3[2]
         else:
             p1_2d, p2_2d, p3_2d = p1, p2, p3
+        if DEPTH_FOG:
+            shader = depth_fog_shader(shader or flat_shader(color), BLACK, *FOG_RANGE)
+        if multisample_active:
+            multisample.rasterize_triangle(
+                p1_2d, p2_2d, p3_2d, z1, z2, z3, color, shader, attributes
+            )
+            return
+        if shader is not None:
+            # Shaded in this process, after anything queued for the workers
+            flush_pending_triangles(renderer)
+            rasterize_triangle_shaded(
+                renderer, p1_2d, p2_2d, p3_2d, z1, z2, z3, shader, attributes or {}
+            )
+            return
+        if raster_pool is not None or RASTER_BACKEND != "python":
+            # Queue for the worker processes or a batched kernel call
+            pending_triangles.append((p1_2d, p2_2d, p3_2d, z1, z2, z3, color))
+            return
         rasterize_triangle_with_depth(renderer, p1_2d, p2_2d, p3_2d, z1, z2, z3, color)
     else:
         # Regular rasterization (no depth testing)
@@ -569,22 +1359,332 @@ def render_triangle(renderer, p1, p2, p3, color, z1=None, z2=None, z3=None):
         rasterize_triangle(renderer, p1_2d, p2_2d, p3_2d, color)
 
 
-def run_main_loop(window, renderer, camera, orbit_params, scene_objects):
+def flush_pending_triangles(renderer):
+    """Rasterize queued triangles in the worker processes or the raster kernels
+
+    Called before anything that draws without depth (wireframe, axes) so the
+    result matches the single-process draw order.
+    """
+    if not pending_triangles:
+        return
+    if raster_pool is not None:
+        raster_pool.rasterize(pending_triangles)
+    else:
+        rasterize_triangles(renderer, pending_triangles, RASTER_BACKEND)
+    pending_triangles.clear()
+
+
+def set_render_scale(frame_output, scale):
+    """Switch the internal render resolution to window size * scale
+
+    The frame and depth buffers become top-left views of the full-size
+    storage, so resizing never allocates. Returns the new drawing target.
+    """
+    global render_width, render_height
+
+    full_height, full_width = frame_output["pixels"].shape[:2]
+    render_width, render_height = scaled_size(full_width, full_height, scale)
+
+    pixels = frame_output["pixels"][:render_height, :render_width]
+    init_z_buffer(
+        render_width,
+        render_height,
+        buffer=frame_output["depth"][:render_height, :render_width],
+    )
+    if frame_output["overdraw"] is not None:
+        init_overdraw(
+            render_width,
+            render_height,
+            buffer=frame_output["overdraw"][:render_height, :render_width],
+        )
+    frame_output["target"] = FrameBufferRenderer(pixels)
+    return frame_output["target"]
+
+
+def render_cpu_frame(target, camera, scene_objects):
+    """Clear the target (and z-buffer) and draw the whole scene into it"""
+    global multisample_active
+
+    if USE_Z_BUFFER:
+        clear_z_buffer()
+    clear_overdraw()
+    if multisample is not None:
+        # Triangles go to the samples (see render_triangle), lines and
+        # points to every sample of their pixels; then one resolve
+        multisample.clear(BLACK)
+        multisample_active = True
+        try:
+            render_scene_passes(multisample.renderer, camera, scene_objects)
+        finally:
+            multisample_active = False
+        multisample.resolve(target.pixels, resolve_depth=REPROJECTION)
+        return
+
+    target.color = BLACK
+    target.clear()
+
+    # Render all scene objects (CPU rasterization - will become GPU draw calls)
+    render_scene_passes(target, camera, scene_objects)
+
+
+def render_scene_passes(target, camera, scene_objects):
+    """render_scene, preceded by a depth-only pass when DEPTH_PREPASS is set
+
+    The pre-pass draws into a NullRenderer, so lines and points wait for the
+    color pass; that pass then colors a pixel only where the triangle's
+    depth equals the stored one (see rasterization.set_depth_pass).
+    """
+    if not (DEPTH_PREPASS and USE_Z_BUFFER):
+        render_scene(target, camera, scene_objects)
+        return
+    try:
+        set_depth_pass("prepass")
+        render_scene(NullRenderer(), camera, scene_objects)
+        set_depth_pass("equal")
+        render_scene(target, camera, scene_objects)
+    finally:
+        set_depth_pass("less")
+
+
+def render_gpu_frame(target, camera, scene_objects):
+    """Draw the scene with gpu_scene and read the frame into the target"""
+    if gpu_cubes is not None:
+        # Bulk update of the cube instances, only moved cubes are uploaded
+        # (all cubes are drawn: the GPU clips instances outside the view)
+        cubes = [obj for obj in scene_objects if obj.name in gpu_cube_slots]
+        gpu_cubes.set_instances(
+            [gpu_cube_slots[obj.name] for obj in cubes],
+            np.array([cube_instance_matrix(obj) for obj in cubes]).reshape(-1, 4, 4),
+            np.array([obj.color for obj in cubes]).reshape(-1, 3),
+        )
+    if FRUSTUM_CULLING:
+        scene_objects = cull_scene_objects(scene_objects, camera)
+    for obj in scene_objects:
+        if obj.kind == "ground_plane" and (GROUND_LOD or INFINITE_GROUND):
+            stream_gpu_ground(obj, camera)
+    models = {}
+    for obj in scene_objects:
+        if obj.name in gpu_cube_slots:
+            # Every cube instance is drawn in one call, at the first cube's
+            # place in the draw order (over the ground, under the axes)
+            models.setdefault("cubes", np.eye(4))
+        else:
+            models[obj.name] = gpu_model_matrix(obj)
+    view_projection = gl_view_projection(camera, render_width, render_height)
+    gpu_scene.render(view_projection, models, BLACK)
+    if gpu_readback is not None:
+        # Show the previous frame, read while this one was drawn
+        gpu_readback.submit(gpu_scene.fbo)
+        gpu_readback.fetch(target.pixels)
+    else:
+        gpu_scene.read_pixels(target.pixels)
+
+
+def animate_scene(scene_objects, current_time):
+    """Move the back plane left and right (exercises partial redraws)"""
+    for obj in scene_objects:
+        if obj.name == "back_plane":
+            obj.pos[0] = round(150 * math.sin(current_time))
+
+
+def object_bound_points(obj):
+    """World-space points whose projection encloses everything the object draws"""
+    x, y, z = obj.pos
+    if obj.kind == "ground_plane":
+        if INFINITE_GROUND:
+            return []  # Reaches the horizon: treat as covering the screen
+        s = obj.size
+        return [[-s, 0, -s], [s, 0, -s], [s, 0, s], [-s, 0, s]]
+    if obj.kind == "vertical_plane":
+        s = obj.size
+        return [[x - s, y, z], [x + s, y, z], [x + s, y + s, z], [x - s, y + s, z]]
+    if obj.kind == "cube":
+        s = obj.scale
+        return [
+            [x + dx, y + dy, z + dz]
+            for dx in (-s, s)
+            for dy in (-s, s)
+            for dz in (-s, s)
+        ]
+    if obj.kind == "mesh":
+        lo, hi = mesh_for(obj)[1] * obj.scale + np.array(obj.pos, dtype=float)
+        return [
+            [x, y, z]
+            for x in (lo[0], hi[0])
+            for y in (lo[1], hi[1])
+            for z in (lo[2], hi[2])
+        ]
+    if obj.kind == "axes":
+        length = axes_geometry["length"]
+        return [[0, 0, 0], [length, 0, 0], [0, length, 0], [0, 0, length]]
+    return []
+
+
+def object_screen_bounds(obj, camera, pad=4):
+    """Screen rectangle (x0, y0, x1, y1) covering the object, padded for
+    line rounding and the axis end dots. Whole screen if a point is clipped."""
+    projected = [project_3d_to_2d(point, camera) for point in object_bound_points(obj)]
+    if not projected or any(p is None for p in projected):
+        return (0, 0, render_width, render_height)
+    xs = [p[0] for p in projected]
+    ys = [p[1] for p in projected]
+    return (min(xs) - pad, min(ys) - pad, max(xs) + pad + 1, max(ys) + pad + 1)
+
+
+def render_dirty_regions(target, camera, scene_objects, rects, bounds):
+    """Clear and redraw only the given rectangles
+
+    Only objects whose bounds touch a rectangle are drawn into it, with the
+    rasterizer and the frame buffer clipped to that rectangle. With MSAA the
+    rectangle's samples are redrawn and resolved, as render_cpu_frame does
+    for the whole frame.
+    """
+    global multisample_active
+
+    renderer = target if multisample is None else multisample.renderer
+    for rect in rects:
+        x0, y0, x1, y1 = rect
+        clear_z_buffer(rect)
+        clear_overdraw(rect)
+        if multisample is None:
+            target.pixels[y0:y1, x0:x1] = 0
+        else:
+            multisample.clear(BLACK, rect)
+
+        set_clip_rect(rect)
+        renderer.clip_rect = rect
+        visible = [
+            obj for obj in scene_objects if rects_intersect(bounds[obj.name], rect)
+        ]
+        multisample_active = multisample is not None
+        try:
+            render_scene_passes(renderer, camera, visible)
+        finally:
+            multisample_active = False
+        if multisample is not None:
+            multisample.resolve(target.pixels, resolve_depth=REPROJECTION, rect=rect)
+
+    set_clip_rect(None)
+    renderer.clip_rect = None
+
+
+def render_reprojected_frame(target, camera, scene_objects, reprojector, depth):
+    """Draw a frame by reprojecting the previous one, or in full when due
+
+    Args:
+        target: Frame buffer renderer to draw into
+        camera: Camera for this frame
+        scene_objects: Objects to render
+        reprojector: TemporalReprojector holding the previous frame
+        depth: The z-buffer array the rasterizer writes (render size)
+    """
+    start = time.perf_counter()
+    mvp_matrix = cached_mvp_matrix(camera, render_width, render_height)
+    full = reprojector.needs_full_frame(render_width, render_height)
+
+    if full:
+        render_cpu_frame(target, camera, scene_objects)
+    else:
+        color, warped_depth, holes = reprojector.warp(mvp_matrix)
+        target.pixels[:] = color
+        depth[:] = warped_depth
+        clear_overdraw()  # Only the holes are rasterized
+        if holes:
+            bounds = {
+                obj.name: object_screen_bounds(obj, camera) for obj in scene_objects
+            }
+            render_dirty_regions(target, camera, scene_objects, holes, bounds)
+
+    reprojector.store(
+        target.pixels, depth, camera, mvp_matrix, time.perf_counter() - start, full
+    )
+
+    if REPROJECTION_CHECK and not full:
+        # Reference render into scratch buffers, the z-buffer is put back after
+        reference = FrameBufferRenderer(np.empty_like(target.pixels))
+        set_z_buffer(np.empty_like(depth))
+        render_cpu_frame(reference, camera, scene_objects)
+        set_z_buffer(depth)
+        reprojector.quality = compare_frames(target.pixels, reference.pixels)
+
+
+def scene_state_key(camera, scene_objects):
+    """Hashable snapshot of everything that changes the rendered image"""
+    return (
+        tuple(camera.position),
+        tuple(camera.target),
+        camera.focal_length,
+        tuple(tuple(obj.pos) for obj in scene_objects),
+    )
+
+
+def run_main_loop(
+    window, renderer, camera, orbit_params, scene_objects, frame_output=None
+):
     """
     RENDER STEP 4: Main rendering loop
     This handles input, animation, and frame rendering - will work with both CPU and GPU rendering
     """
     print("=== RENDER STEP 4: Starting main rendering loop ===")
-    print("Controls: Close window to exit")
+    print("Controls: SPACE = pause/resume orbit, close window to exit")
     print("Camera will orbit around the scene")
 
     running = True
     event = sdl2.SDL_Event()
-    start_time = time.time()
+    last_time = time.time()
+    orbit_angle = 0.0
+    orbit_paused = False
     fps_counter = FPSCounter()
-
-    # Colors
-    BLACK = sdl2.ext.Color(0, 0, 0, 255)
+    scheduler = FrameScheduler(FRAME_PACING, TARGET_FPS)
+    resolution = None
+    dirty_tracker = None
+    reprojector = None
+
+    # Where the scene is painted: the SDL renderer or the CPU frame buffer
+    target = frame_output["target"] if frame_output else renderer
+    texture = frame_output["texture"] if frame_output else None
+    recorder = frame_output["recorder"] if frame_output else None
+    stream = frame_output["stream"] if frame_output else None
+
+    # The frame options below work on the CPU rasterizer's buffers
+    cpu_frames = texture is not None and gpu_scene is None
+
+    # Threaded mode: the render thread draws frame N+1 while we present frame N
+    render_thread = None
+    if THREADED_RENDERING and cpu_frames:
+        height, width = target.pixels.shape[:2]
+        exchange = FrameExchange(width, height, FRAME_SLOTS)
+        input_state = InputState(camera)
+        latency_stats = LatencyStats()
+
+        def render_frame(pixels, frame_camera):
+            # Picking on the main thread waits for the frame (see scene_lock)
+            with scene_lock:
+                if raster_pool is not None:
+                    # Workers only write into the shared buffer; copy it out
+                    render_cpu_frame(target, frame_camera, scene_objects)
+                    np.copyto(pixels, target.pixels)
+                else:
+                    render_cpu_frame(
+                        FrameBufferRenderer(pixels), frame_camera, scene_objects
+                    )
+
+        render_thread = RenderThread(exchange, input_state, render_frame)
+        render_thread.start()
+        print(f"✓ Render thread started ({FRAME_SLOTS} frame slots)")
+    elif DYNAMIC_RESOLUTION and cpu_frames and raster_pool is None:
+        resolution = ResolutionController(TARGET_FRAME_MS, MIN_RENDER_SCALE)
+        print(f"✓ Dynamic resolution enabled (budget {TARGET_FRAME_MS:.0f} ms)")
+    if DIRTY_RECTS and render_thread is None and cpu_frames:
+        if raster_pool is None:
+            dirty_tracker = DirtyRectTracker(render_width, render_height)
+            print("✓ Dirty-rectangle redraw enabled")
+    if REPROJECTION and render_thread is None and cpu_frames:
+        if dirty_tracker is None and raster_pool is None and USE_MATRIX_PROJECTION:
+            reprojector = TemporalReprojector(REPROJECTION_REFRESH)
+            print(
+                f"✓ Temporal reprojection enabled (refresh every {REPROJECTION_REFRESH})"
+            )
 
     # X axis (Red): Left ← → Right (negative X is left, positive X is right)
     # Y axis (Green): Down ← → Up (negative Y is down, positive Y is up)
@@ -595,37 +1695,210 @@ def run_main_loop(window, renderer, camera, orbit_params, scene_objects):
         while sdl2.SDL_PollEvent(ctypes.byref(event)) != 0:
             if event.type == sdl2.SDL_QUIT:
                 running = False
-
-        # Update FPS counter
-        if fps_counter.update():
-            logging.info("3D Scene - FPS: %.1f", fps_counter.get_fps())
-
-        # Calculate current time and animate camera
-        current_time = time.time() - start_time
-        orbit_angle = current_time * orbit_params["speed"]
+            elif event.type == sdl2.SDL_WINDOWEVENT:
+                if event.window.event in REDRAW_WINDOW_EVENTS:
+                    # The window contents were lost: on_demand must redraw
+                    scheduler.request_redraw()
+            elif event.type == sdl2.SDL_KEYDOWN:
+                if event.key.keysym.sym == sdl2.SDLK_SPACE:
+                    orbit_paused = not orbit_paused
+            elif event.type == sdl2.SDL_MOUSEBUTTONDOWN:
+                start = time.perf_counter()
+                picked = pick_scene_object(
+                    scene_objects, camera, event.button.x, event.button.y
+                )
+                pick_ms = (time.perf_counter() - start) * 1000
+                if picked is None:
+                    logging.info("Picked nothing (%.2f ms)", pick_ms)
+                else:
+                    name, point = picked
+                    logging.info(
+                        "Picked %s at %s (%.2f ms)", name, np.round(point, 1), pick_ms
+                    )
+
+        # Calculate elapsed time and animate camera
+        current_time = time.time()
+        if not orbit_paused:
+            orbit_angle += (current_time - last_time) * orbit_params["speed"]
+        last_time = current_time
         camera.update_orbit(orbit_angle, orbit_params["radius"], orbit_params["height"])
+        if ANIMATE_SCENE:
+            animate_scene(scene_objects, current_time)
+
+        if render_thread is not None:
+            if render_thread.error is not None:
+                raise render_thread.error
+            # Publish the new camera and present whatever frame is ready
+            input_state.update(camera)
+            slot = exchange.take_ready()
+            if slot is not None:
+                if recorder is not None:
+                    recorder.submit(slot.pixels)
+                if stream is not None:
+                    stream.publish(slot.pixels)
+                present_frame_buffer(renderer, texture, slot.pixels)
+                latency_stats.add(time.perf_counter() - slot.input_time)
+
+                if fps_counter.update():
+                    logging.info(
+                        "3D Scene - FPS: %.1f (render %.1f ms, input-to-present %s)",
+                        fps_counter.get_fps(),
+                        slot.render_time * 1000,
+                        latency_stats.summary(),
+                    )
+            scheduler.wait()
+            continue
+
+        if not scheduler.should_render(scene_state_key(camera, scene_objects)):
+            # Nothing changed: keep the last frame on screen, just pace the loop
+            scheduler.wait()
+            continue
+
+        frame_start = time.perf_counter()
+        render_camera = camera
+        if resolution is not None and resolution.scale != 1.0:
+            # Focal length is in pixels, scale it so the field of view is kept
+            render_camera = Camera(
+                camera.position, camera.target, camera.focal_length * resolution.scale
+            )
+
+        if dirty_tracker is not None:
+            bounds = {
+                obj.name: object_screen_bounds(obj, render_camera)
+                for obj in scene_objects
+            }
+            objects = {obj.name: (repr(obj), bounds[obj.name]) for obj in scene_objects}
+            view_key = (
+                tuple(render_camera.position),
+                tuple(render_camera.target),
+                render_camera.focal_length,
+                render_width,
+                render_height,
+            )
+            dirty = dirty_tracker.update(view_key, objects)
+            render_dirty_regions(target, render_camera, scene_objects, dirty, bounds)
+        elif reprojector is not None:
+            depth = frame_output["depth"][:render_height, :render_width]
+            render_reprojected_frame(
+                target, render_camera, scene_objects, reprojector, depth
+            )
+        elif gpu_scene is not None:
+            render_gpu_frame(target, render_camera, scene_objects)
+        else:
+            render_cpu_frame(target, render_camera, scene_objects)
 
-        # Clear screen and z-buffer (if using z-buffer)
-        if USE_Z_BUFFER:
-            clear_z_buffer()
-        renderer.color = BLACK
-        renderer.clear()
-
-        # Render all scene objects (CPU rasterization - will become GPU draw calls)
-        render_scene(renderer, camera, scene_objects)
+        # Hand the finished frame to the writer threads (copy only, no encoding)
+        if recorder is not None or stream is not None:
+            full_frame = upscale_nearest(target.pixels, WIDTH, HEIGHT)
+            if recorder is not None:
+                recorder.submit(full_frame)
+            if stream is not None:
+                stream.publish(full_frame)
 
         # Present the frame
-        renderer.present()
-
-        # Control frame rate (roughly 60 FPS)
-        sdl2.SDL_Delay(16)
-
+        if SHOW_OVERDRAW and cpu_frames:
+            counts = frame_output["overdraw"][:render_height, :render_width]
+            present_frame_buffer(renderer, texture, overdraw_heatmap(counts))
+        elif dirty_tracker is not None and DEBUG_DIRTY_RECTS:
+            # Outline on a copy: the frame buffer is reused by the next frame
+            shown = target.pixels.copy()
+            draw_rect_outlines(shown, dirty)
+            present_frame_buffer(renderer, texture, shown)
+        elif texture is not None:
+            present_frame_buffer(renderer, texture, target.pixels)
+        else:
+            renderer.present()
+
+        if resolution is not None:
+            scale, changed = resolution.update(time.perf_counter() - frame_start)
+            if changed:
+                target = set_render_scale(frame_output, scale)
+                if dirty_tracker is not None:
+                    dirty_tracker.reset(render_width, render_height)
+                if reprojector is not None:
+                    reprojector.reset()
+
+        # Update FPS counter (rendered frames only, not skipped on_demand ones)
+        if fps_counter.update():
+            logging.info("3D Scene - FPS: %.1f", fps_counter.get_fps())
+            logging.info("Frame pacing: %s", scheduler.get_stats())
+            if resolution is not None:
+                metrics = resolution.get_metrics()
+                logging.info(
+                    "Render scale: %.3f (%dx%d, %.1f ms avg, %d changes)",
+                    metrics["scale"],
+                    render_width,
+                    render_height,
+                    metrics["avg_frame_ms"],
+                    metrics["changes"],
+                )
+            if dirty_tracker is not None:
+                logging.info("Dirty rects: %s", dirty_tracker.get_stats())
+            if reprojector is not None:
+                logging.info("Reprojection: %s", reprojector.get_stats())
+            for lod in ground_lods.values():
+                logging.info("Ground LOD: %s", lod.get_stats())
+            if terrain_cache is not None:
+                logging.info("Terrain tiles: %s", terrain_cache.get_stats())
+            if scene_graph is not None:
+                logging.info("Scene graph: %s", scene_graph.get_stats())
+            if FRUSTUM_CULLING:
+                logging.info("Frustum culling: %d objects culled", culled_objects)
+            if geometry_pipeline is not None:
+                logging.info("Geometry pipeline: %s", geometry_pipeline.get_stats())
+            if gpu_scene is not None:
+                logging.info("GPU: %s", gpu_scene.get_stats())
+                if gpu_scene.stream is not None:
+                    logging.info("GPU stream: %s", gpu_scene.stream.get_stats())
+            if gpu_readback is not None:
+                logging.info("GPU readback: %s", gpu_readback.get_stats())
+            if shader_stats["triangles"]:
+                logging.info("Shading: %s", get_shader_stats())
+            if frame_output and frame_output["overdraw"] is not None:
+                counts = frame_output["overdraw"][:render_height, :render_width]
+                logging.info("Overdraw: %s", overdraw_summary(counts))
+            if recorder is not None:
+                logging.info("Recording: %s", recorder.get_stats())
+            if stream is not None:
+                for client in stream.get_client_stats():
+                    logging.info("Stream client: %s", client)
+
+        # Sleep only for what is left of this frame's time budget
+        scheduler.wait()
+
+    logging.info("Frame pacing: %s", scheduler.get_stats())
+    if render_thread is not None:
+        render_thread.stop()
+        print(
+            f"✓ Render thread stopped: {exchange.frames_published} frames rendered, "
+            f"{exchange.frames_discarded} replaced before present"
+        )
     print("✓ Main loop finished")
 
 
-def cleanup():
+def cleanup(frame_output=None):
     """Clean up SDL2 resources"""
     print("=== Cleaning up resources ===")
+    if frame_output and frame_output["recorder"] is not None:
+        frame_output["recorder"].close()
+        print("✓ Recording flushed")
+    if frame_output and frame_output["stream"] is not None:
+        frame_output["stream"].stop()
+        print("✓ Frame stream server stopped")
+    if terrain_cache is not None:
+        terrain_cache.close()
+        print("✓ Terrain tile cache stopped")
+    if raster_pool is not None:
+        raster_pool.close()
+        print("✓ Raster worker pool stopped")
+    if gpu_scene is not None:
+        if gpu_readback is not None:
+            gpu_readback.release()
+        gpu_scene.release()
+        print("✓ GPU buffers released")
+    if frame_output and frame_output["shared"] is not None:
+        frame_output["shared"].close()
+        print("✓ Shared-memory frame buffers released")
     sdl2.ext.quit()
     print("✓ SDL2 resources cleaned up")
 
@@ -644,9 +1917,11 @@ def main():
     print("This demonstrates the 4 essential steps for 3D rendering")
     print("(Structure designed to easily transition to OpenGL/GPU rendering)\n")
 
+    frame_output = None
     try:
         # Step 1: Create display surface and rendering context
         window, renderer, width, height = setup_display_and_renderer()
+        frame_output = setup_frame_output(renderer, width, height)
 
         # Step 2: Create 3D scene with objects to render
         scene_objects = create_scene_objects()
@@ -655,13 +1930,15 @@ def main():
         camera, orbit_params = setup_camera_and_projection()
 
         # Step 4: Run the main rendering loop
-        run_main_loop(window, renderer, camera, orbit_params, scene_objects)
+        run_main_loop(
+            window, renderer, camera, orbit_params, scene_objects, frame_output
+        )
 
     except Exception as e:
         print(f"Error: {e}")
     finally:
         # Always clean up resources
-        cleanup()
+        cleanup(frame_output)
 
 
 if __name__ == "__main__":
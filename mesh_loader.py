@@ -0,0 +1,473 @@
+"""
+OBJ / PLY mesh loading with a binary cache.
+
+Parsing a text mesh of millions of triangles takes seconds, every run. The
+first load of a file converts it to three arrays saved as .npy files:
+
+- vertices: (N, 3) float32 positions
+- indices: (M, 3) int32 vertex indices, one row per triangle (polygons are
+  split into triangle fans)
+- colors: (N, 3) uint8 per-vertex colors, only when the file has them
+
+plus a small JSON file recording the source's size and modification time.
+Later loads open the arrays with np.load(mmap_mode="r"): nothing is parsed
+or even read until the pages are touched. A source whose size or mtime no
+longer matches (or a cache written by another CACHE_VERSION) is parsed
+again and the cache rewritten.
+
+Caches live in a .mesh_cache directory next to the source by default.
+"""
+
+import contextlib
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass
+
+import numpy as np
+
+CACHE_VERSION = 1
+CACHE_DIR_NAME = ".mesh_cache"
+
+PLY_TYPES = {
+    "char": "i1",
+    "int8": "i1",
+    "uchar": "u1",
+    "uint8": "u1",
+    "short": "i2",
+    "int16": "i2",
+    "ushort": "u2",
+    "uint16": "u2",
+    "int": "i4",
+    "int32": "i4",
+    "uint": "u4",
+    "uint32": "u4",
+    "float": "f4",
+    "float32": "f4",
+    "double": "f8",
+    "float64": "f8",
+}
+
+
+@dataclass(slots=True)
+class Mesh:
+    vertices: np.ndarray
+    indices: np.ndarray
+    colors: np.ndarray | None = None
+    # Where the arrays came from: "parsed" or "cache" (memory-mapped)
+    source: str = "parsed"
+
+    @property
+    def bounds(self):
+        """(min corner, max corner) of the vertices"""
+        return self.vertices.min(axis=0), self.vertices.max(axis=0)
+
+
+def fan_triangles(polygon):
+    """Split a polygon (list of vertex indices) into a triangle fan"""
+    return [
+        (polygon[0], polygon[k], polygon[k + 1]) for k in range(1, len(polygon) - 1)
+    ]
+
+
+def color_array(values):
+    """Per-vertex colors as uint8, from 0..1 floats or 0..255 values"""
+    values = np.asarray(values, dtype=np.float64)
+    if values.size and values.max() <= 1.0:
+        values = values * 255
+    return np.clip(np.rint(values), 0, 255).astype(np.uint8)
+
+
+def parse_obj(path):
+    """Read the vertices, faces and optional vertex colors ("v x y z r g b")"""
+    positions = []
+    faces = []  # (face line, number of vertices defined before it)
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if line.startswith("v "):
+                positions.append(line[2:])
+            elif line.startswith("f "):
+                faces.append((line[2:], len(positions)))
+
+    # All vertex lines usually have the same number of values: parse them
+    # in one go, per line only when they differ
+    width = len(positions[0].split()) if positions else 3
+    values = np.array(" ".join(positions).split(), dtype=np.float64)
+    if values.size == len(positions) * width:
+        rows = values.reshape(len(positions), width)
+    else:
+        rows = [line.split() for line in positions]
+        width = 6 if all(len(row) >= 6 for row in rows) else 3
+        rows = np.array([row[:width] for row in rows], dtype=np.float64)
+    vertices = rows[:, :3].astype(np.float32)
+    colors = color_array(rows[:, 3:6]) if width >= 6 else None
+
+    # Faces are "f 1 2 3", "f 1/1 2/2 3/3" or "f 1//1 ...". When they are
+    # all triangles with absolute (positive) indices, convert them at once
+    corners = re.sub(r"/\S*", "", " ".join(line for line, _ in faces)).split()
+    if len(corners) == 3 * len(faces):
+        indices = np.array(corners, dtype=np.int64).reshape(-1, 3) - 1
+        if indices.size == 0 or indices.min() >= 0:
+            return Mesh(vertices, indices.astype(np.int32), colors)
+
+    triangles = []
+    for line, defined in faces:
+        # Negative indices are relative to the vertices defined so far
+        polygon = []
+        for token in line.split():
+            index = int(token.split("/", 1)[0])
+            polygon.append(defined + index if index < 0 else index - 1)
+        triangles += fan_triangles(polygon)
+    indices = np.array(triangles, dtype=np.int32).reshape(-1, 3)
+    return Mesh(vertices, indices, colors)
+
+
+def read_ply_header(f):
+    """Format and elements of a PLY header
+
+    Returns:
+        (format, [(element name, count, [(property, type or
+        ("list", count type, item type))])])
+    """
+    if f.readline().strip() != b"ply":
+        raise ValueError("Not a PLY file")
+    fmt = None
+    elements = []
+    while True:
+        line = f.readline()
+        if not line:
+            raise ValueError("PLY header has no end_header")
+        words = line.decode("ascii", errors="replace").split()
+        if not words or words[0] in ("comment", "obj_info"):
+            continue
+        if words[0] == "end_header":
+            return fmt, elements
+        if words[0] == "format":
+            fmt = words[1]
+        elif words[0] == "element":
+            elements.append((words[1], int(words[2]), []))
+        elif words[0] == "property":
+            if words[1] == "list":
+                prop = (words[4], ("list", PLY_TYPES[words[2]], PLY_TYPES[words[3]]))
+            else:
+                prop = (words[2], PLY_TYPES[words[1]])
+            elements[-1][2].append(prop)
+
+
+def ply_vertex_arrays(table):
+    """Positions and optional colors from the vertex element's columns"""
+    vertices = np.stack([table["x"], table["y"], table["z"]], axis=1)
+    colors = None
+    if all(name in table for name in ("red", "green", "blue")):
+        rgb = np.stack([table["red"], table["green"], table["blue"]], axis=1)
+        colors = rgb.astype(np.uint8) if rgb.dtype == np.uint8 else color_array(rgb)
+    return vertices.astype(np.float32), colors
+
+
+def read_binary_faces(f, count, properties, byte_order):
+    """Triangles of a binary face element
+
+    When every face is a triangle (the common case) the whole element is
+    one fixed-size record array; otherwise faces are read one by one.
+    """
+    list_props = [prop for prop in properties if isinstance(prop[1], tuple)]
+    if len(properties) == 1 and len(list_props) == 1:
+        _, (_, count_type, item_type) = list_props[0]
+        record = np.dtype(
+            [("n", byte_order + count_type), ("i", byte_order + item_type, 3)]
+        )
+        start = f.tell()
+        data = np.frombuffer(f.read(count * record.itemsize), dtype=record)
+        if len(data) == count and np.all(data["n"] == 3):
+            return data["i"].astype(np.int32)
+        f.seek(start)
+
+    triangles = []
+    for _ in range(count):
+        polygon = None
+        for name, prop_type in properties:
+            if isinstance(prop_type, tuple):
+                _, count_type, item_type = prop_type
+                count_dtype = np.dtype(byte_order + count_type)
+                n = int(np.frombuffer(f.read(count_dtype.itemsize), count_dtype)[0])
+                item_dtype = np.dtype(byte_order + item_type)
+                items = np.frombuffer(f.read(n * item_dtype.itemsize), item_dtype)
+                if name in ("vertex_indices", "vertex_index"):
+                    polygon = items.tolist()
+            else:
+                f.read(np.dtype(prop_type).itemsize)
+        if polygon:
+            triangles += fan_triangles(polygon)
+    return np.array(triangles, dtype=np.int32).reshape(-1, 3)
+
+
+def parse_ply(path):
+    """Read an ASCII or binary PLY file (vertex and face elements)"""
+    with open(path, "rb") as f:
+        fmt, elements = read_ply_header(f)
+        if fmt not in ("ascii", "binary_little_endian", "binary_big_endian"):
+            raise ValueError(f"Unknown PLY format {fmt!r}")
+        byte_order = "<" if fmt == "binary_little_endian" else ">"
+
+        vertices = colors = None
+        indices = np.empty((0, 3), dtype=np.int32)
+        ascii_lines = f.read().decode("ascii").splitlines() if fmt == "ascii" else None
+        line_number = 0
+        for name, count, properties in elements:
+            scalar = all(not isinstance(prop[1], tuple) for prop in properties)
+            if ascii_lines is not None:
+                lines = ascii_lines[line_number : line_number + count]
+                line_number += count
+                if scalar:
+                    values = np.array(" ".join(lines).split(), dtype=np.float64)
+                    values = values.reshape(count, len(properties))
+                    table = {
+                        prop: values[:, k] for k, (prop, _) in enumerate(properties)
+                    }
+                elif name == "face":
+                    # Assumes the index list is the face's first property
+                    triangles = []
+                    for line in lines:
+                        numbers = line.split()
+                        n = int(numbers[0])
+                        triangles += fan_triangles([int(v) for v in numbers[1 : n + 1]])
+                    indices = np.array(triangles, dtype=np.int32).reshape(-1, 3)
+                    continue
+                else:
+                    continue
+            elif scalar:
+                record = np.dtype(
+                    [(prop, byte_order + prop_type) for prop, prop_type in properties]
+                )
+                data = np.frombuffer(f.read(count * record.itemsize), dtype=record)
+                table = {prop: data[prop] for prop, _ in properties}
+            elif name == "face":
+                indices = read_binary_faces(f, count, properties, byte_order)
+                continue
+            else:
+                raise ValueError(f"Cannot skip binary PLY list element {name!r}")
+
+            if name == "vertex":
+                vertices, colors = ply_vertex_arrays(table)
+
+    if vertices is None:
+        raise ValueError(f"{path} has no vertex element")
+    return Mesh(vertices, indices, colors)
+
+
+def parse_mesh(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".obj":
+        return parse_obj(path)
+    if extension == ".ply":
+        return parse_ply(path)
+    raise ValueError(f"Unsupported mesh format {extension!r}, expected .obj or .ply")
+
+
+def cache_paths(path, cache_dir=None):
+    """Paths of the metadata file and of each cached array for a source mesh"""
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR_NAME)
+    base = os.path.join(cache_dir, os.path.basename(path))
+    arrays = {name: f"{base}.{name}.npy" for name in ("vertices", "indices", "colors")}
+    return f"{base}.json", arrays
+
+
+def source_signature(path):
+    stat = os.stat(path)
+    return {
+        "version": CACHE_VERSION,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+def write_cache(path, mesh, cache_dir=None):
+    """Save the mesh arrays, then the metadata that makes them valid
+
+    Every file is written under a temporary name and renamed into place, and
+    the metadata goes last: an interrupted write leaves no cache that looks
+    valid.
+    """
+    meta_path, array_paths = cache_paths(path, cache_dir)
+    os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+    signature = source_signature(path)
+    for name, array_path in array_paths.items():
+        array = getattr(mesh, name)
+        if array is None:
+            continue
+        with open(array_path + ".tmp", "wb") as f:
+            np.save(f, np.ascontiguousarray(array))
+        os.replace(array_path + ".tmp", array_path)
+
+    meta = dict(
+        signature,
+        vertices=len(mesh.vertices),
+        triangles=len(mesh.indices),
+        colors=mesh.colors is not None,
+    )
+    with open(meta_path + ".tmp", "w") as f:
+        json.dump(meta, f)
+    os.replace(meta_path + ".tmp", meta_path)
+
+
+def read_cache(path, cache_dir=None):
+    """The cached mesh, memory-mapped, or None when missing or stale"""
+    meta_path, array_paths = cache_paths(path, cache_dir)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        signature = source_signature(path)
+        if any(meta.get(key) != value for key, value in signature.items()):
+            return None
+        arrays = {
+            name: np.load(array_path, mmap_mode="r")
+            for name, array_path in array_paths.items()
+            if name != "colors" or meta["colors"]
+        }
+    except (OSError, ValueError, KeyError):
+        return None
+    return Mesh(
+        arrays["vertices"], arrays["indices"], arrays.get("colors"), source="cache"
+    )
+
+
+def load_mesh(path, cache=True, cache_dir=None):
+    """Load an OBJ or PLY mesh, through the binary cache unless cache=False
+
+    Args:
+        path: .obj or .ply file
+        cache: Use (and create) the .npy cache
+        cache_dir: Where to keep the cache (default: .mesh_cache next to path)
+
+    Returns:
+        Mesh; its arrays are read-only memory maps when it came from the cache
+    """
+    if cache:
+        mesh = read_cache(path, cache_dir)
+        if mesh is not None:
+            return mesh
+    mesh = parse_mesh(path)
+    if cache:
+        try:
+            write_cache(path, mesh, cache_dir)
+        except OSError:
+            # A read-only or full disk only costs the next load a parse
+            logging.warning(
+                "Could not write the mesh cache for %s", path, exc_info=True
+            )
+            meta_path, array_paths = cache_paths(path, cache_dir)
+            for cache_path in [meta_path, *array_paths.values()]:
+                with contextlib.suppress(OSError):
+                    os.remove(cache_path + ".tmp")
+    return mesh
+
+
+def resident_memory_mb():
+    """(current, peak) resident memory of this process in MB
+
+    Read from /proc (Linux): unlike ru_maxrss, the peak there starts over
+    at exec instead of carrying the parent's.
+    """
+    memory = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(("VmRSS:", "VmHWM:")):
+                key, value = line.split(":")
+                memory[key] = int(value.split()[0]) / 1024
+    return memory["VmRSS"], memory["VmHWM"]
+
+
+if __name__ == "__main__":
+    # Cold parse vs cached load of a ~1M triangle sphere, as OBJ and as binary
+    # PLY. Each load runs in a fresh process so memory numbers are its own.
+    import subprocess
+    import sys
+    import tempfile
+    import time
+
+    if sys.argv[1:2] == ["--load"]:
+        before, _ = resident_memory_mb()
+        start = time.perf_counter()
+        mesh = load_mesh(sys.argv[2])
+        loaded = time.perf_counter() - start
+        after, peak = resident_memory_mb()
+        start = time.perf_counter()
+        checksum = float(mesh.vertices.sum()) + float(mesh.indices[:, 0].sum())
+        touched = time.perf_counter() - start
+        result = {
+            "source": mesh.source,
+            "load_s": loaded,
+            "rss_mb": after - before,
+            "peak_mb": peak - before,
+            "touch_s": touched,
+            "checksum": checksum,
+        }
+        print(json.dumps(result))  # noqa: T201
+        sys.exit()
+
+    segments = int(sys.argv[1]) if len(sys.argv) > 1 else 708
+    theta, phi = np.meshgrid(
+        np.linspace(0, np.pi, segments + 1), np.linspace(0, 2 * np.pi, segments + 1)
+    )
+    vertices = (
+        np.stack(
+            [np.sin(theta) * np.cos(phi), np.cos(theta), np.sin(theta) * np.sin(phi)],
+            axis=-1,
+        )
+        .reshape(-1, 3)
+        .astype(np.float32)
+        * 100
+    )
+    colors = ((vertices / 200 + 0.5) * 255).astype(np.uint8)
+    grid = np.arange((segments + 1) ** 2).reshape(segments + 1, segments + 1)
+    a, b = grid[:-1, :-1].ravel(), grid[:-1, 1:].ravel()
+    c, d = grid[1:, :-1].ravel(), grid[1:, 1:].ravel()
+    indices = np.concatenate([np.stack([a, b, d], 1), np.stack([a, d, c], 1)])
+    indices = indices.astype(np.int32)
+
+    with tempfile.TemporaryDirectory() as directory:
+        obj_path = os.path.join(directory, "sphere.obj")
+        with open(obj_path, "w") as f:
+            rows = np.hstack([vertices, colors / 255])
+            np.savetxt(f, rows, fmt="v %.6f %.6f %.6f %.4f %.4f %.4f")
+            np.savetxt(f, indices + 1, fmt="f %d %d %d")
+
+        ply_path = os.path.join(directory, "sphere.ply")
+        with open(ply_path, "wb") as f:
+            header = (
+                "ply\nformat binary_little_endian 1.0\n"
+                f"element vertex {len(vertices)}\n"
+                "property float x\nproperty float y\nproperty float z\n"
+                "property uchar red\nproperty uchar green\nproperty uchar blue\n"
+                f"element face {len(indices)}\n"
+                "property list uchar int vertex_indices\nend_header\n"
+            )
+            f.write(header.encode("ascii"))
+            vertex_record = np.dtype([("p", "<f4", 3), ("c", "u1", 3)])
+            vertex_data = np.empty(len(vertices), dtype=vertex_record)
+            vertex_data["p"], vertex_data["c"] = vertices, colors
+            f.write(vertex_data.tobytes())
+            face_data = np.empty(len(indices), dtype=[("n", "u1"), ("i", "<i4", 3)])
+            face_data["n"], face_data["i"] = 3, indices
+            f.write(face_data.tobytes())
+
+        print(f"{len(vertices)} vertices, {len(indices)} triangles")  # noqa: T201
+        for path in (obj_path, ply_path):
+            size = os.path.getsize(path) / 2**20
+            for label in ("cold parse + write cache", "cached (mmap)"):
+                result = json.loads(
+                    subprocess.run(
+                        [sys.executable, os.path.abspath(__file__), "--load", path],
+                        capture_output=True,
+                        text=True,
+                        check=True,
+                    ).stdout
+                )
+                print(  # noqa: T201
+                    f"{os.path.basename(path):10s} {size:5.1f} MB  {label:25s} "
+                    f"load {result['load_s'] * 1000:8.1f} ms, "
+                    f"RSS +{result['rss_mb']:6.1f} MB (peak +{result['peak_mb']:6.1f}), "
+                    f"first full read {result['touch_s'] * 1000:6.1f} ms"
+                )
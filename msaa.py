@@ -0,0 +1,266 @@
+"""
+Multisample anti-aliasing: coverage and depth per sample, shading per pixel.
+
+Rendering at 4x the resolution (supersampling) anti-aliases by shading and
+depth testing 4x the pixels. Multisampling keeps several samples per pixel
+(SAMPLE_PATTERNS) but only does per-sample work where it matters:
+
+- Coverage: the edge functions are evaluated at every sample of the
+  triangle's bounding box at once, giving an (h, w, samples) coverage mask
+- Depth: interpolated and tested per sample against a per-sample depth
+  buffer, so intersecting and overlapping surfaces are resolved per sample
+- Shading: once per pixel with at least one sample passing, at the
+  centroid of its covered samples; the color is stored in every sample
+  that passed
+
+MultisampleBuffers.resolve() averages the samples into the frame buffer once
+per frame. Lines and points (wireframe, axes) drawn through the buffers'
+renderer fill all samples of their pixels, so they stay aliased.
+"""
+
+import time
+
+import numpy as np
+
+import rasterization
+from framebuffer import FrameBufferRenderer
+from shading import Fragments, shader_stats
+
+# Sample offsets from the pixel position, in pixels (the standard 2x, 4x
+# and 8x patterns of Direct3D, given there in 1/16 pixel)
+SAMPLE_PATTERNS = {
+    count: np.array(offsets, dtype=float) / 16
+    for count, offsets in {
+        1: [(0, 0)],
+        2: [(4, 4), (-4, -4)],
+        4: [(-2, -6), (6, -2), (-6, 2), (2, 6)],
+        8: [(1, -3), (-1, 3), (5, 1), (-3, -5), (-5, 5), (-7, -1), (3, 7), (7, -7)],
+    }.items()
+}
+
+
+class MultisampleBuffers:
+    """Per-sample color and depth, plus a renderer drawing into them"""
+
+    def __init__(self, width, height, samples=4):
+        """
+        Args:
+            width, height: Frame size in pixels
+            samples: Samples per pixel, a key of SAMPLE_PATTERNS
+        """
+        if samples not in SAMPLE_PATTERNS:
+            raise ValueError(
+                f"Unsupported sample count {samples}, expected one of "
+                f"{sorted(SAMPLE_PATTERNS)}"
+            )
+        self.samples = samples
+        self.offsets = SAMPLE_PATTERNS[samples]
+        self.color = np.zeros((height, width, samples, 3), dtype=np.uint8)
+        self.depth = np.full((height, width, samples), np.inf)
+        # Lines, points and clear() broadcast over the samples of a pixel
+        self.renderer = FrameBufferRenderer(self.color)
+
+    @property
+    def nbytes(self):
+        return self.color.nbytes + self.depth.nbytes
+
+    def clear(self, color=(0, 0, 0), rect=None):
+        """Clear every sample, or only those of rect (x0, y0, x1, y1)"""
+        x0, y0, x1, y1 = rect or (0, 0, self.depth.shape[1], self.depth.shape[0])
+        self.color[y0:y1, x0:x1] = color[:3]
+        self.depth[y0:y1, x0:x1] = np.inf
+
+    def rasterize_triangle(
+        self, p1, p2, p3, z1, z2, z3, color, shader=None, attributes=None
+    ):
+        """Rasterize a triangle into the samples
+
+        Follows rasterization.depth_pass, clip_rect and the overdraw
+        counter (one write per shaded pixel).
+
+        Args:
+            p1, p2, p3: 2D points as tuples (x, y)
+            z1, z2, z3: Depth values for each vertex
+            color: RGB color tuple (r, g, b), used without a shader
+            shader: Optional function Fragments -> (n, 3) colors (see
+                shading.py), called once for all shaded pixels
+            attributes: Dict of per-vertex attributes for the shader
+        """
+        x1, y1 = p1
+        x2, y2 = p2
+        x3, y3 = p3
+        denom = (y2 - y3) * (x1 - x3) + (x3 - x2) * (y1 - y3)
+        if abs(denom) < 1e-10:
+            return
+        # Samples reach up to half a pixel past the pixel position: widen
+        # the bounding box by one pixel on every side
+        min_x, max_x, min_y, max_y = rasterization.triangle_bounds(
+            (min(x1, x2, x3) - 1, min(y1, y2, y3) - 1),
+            (max(x1, x2, x3) + 1, max(y1, y2, y3) + 1),
+            p1,
+        )
+        if min_x > max_x or min_y > max_y:
+            return
+
+        # Barycentrics at the pixel positions, then at every sample: they
+        # are linear, so each sample adds a constant to the pixel's values
+        ys, xs = np.mgrid[min_y : max_y + 1, min_x : max_x + 1]
+        pixel_a = ((y2 - y3) * (xs - x3) + (x3 - x2) * (ys - y3)) / denom
+        pixel_b = ((y3 - y1) * (xs - x3) + (x1 - x3) * (ys - y3)) / denom
+        offset_x, offset_y = self.offsets[:, 0], self.offsets[:, 1]
+        a = pixel_a[..., None] + ((y2 - y3) * offset_x + (x3 - x2) * offset_y) / denom
+        b = pixel_b[..., None] + ((y3 - y1) * offset_x + (x1 - x3) * offset_y) / denom
+        c = 1 - a - b
+        depth = a * z1 + b * z2 + c * z3
+
+        stored = self.depth[min_y : max_y + 1, min_x : max_x + 1]
+        covered = (a >= 0) & (b >= 0) & (c >= 0)
+        if rasterization.depth_pass == "equal":
+            passed = covered & (depth == stored)
+            np.copyto(stored, np.nextafter(depth, -np.inf), where=passed)
+        else:
+            passed = covered & (depth < stored)
+            np.copyto(stored, depth, where=passed)
+            if rasterization.depth_pass == "prepass":
+                return
+
+        shaded = passed.any(axis=2)
+        if not shaded.any():
+            return
+        block = self.color[min_y : max_y + 1, min_x : max_x + 1]
+        if shader is None:
+            colors = np.asarray(color[:3], dtype=np.uint8)
+        else:
+            # One shader invocation per pixel, at the centroid of its covered
+            # samples: the pixel position when all are covered, and still
+            # inside the triangle when only some are
+            cover = covered[shaded]
+            count = cover.sum(axis=1)
+            centroid_a = (a[shaded] * cover).sum(axis=1) / count
+            centroid_b = (b[shaded] * cover).sum(axis=1) / count
+            weights = np.stack(
+                [centroid_a, centroid_b, 1 - centroid_a - centroid_b], axis=1
+            )
+            fragments = Fragments(
+                xs[shaded],
+                ys[shaded],
+                weights,
+                weights @ np.array([z1, z2, z3], dtype=float),
+                (z1, z2, z3),
+                attributes or {},
+            )
+            start = time.perf_counter()
+            shaded_colors = np.clip(np.asarray(shader(fragments)), 0, 255)
+            shader_stats["seconds"] += time.perf_counter() - start
+            shader_stats["triangles"] += 1
+            shader_stats["fragments"] += len(fragments)
+            colors = np.zeros((*shaded.shape, 3), dtype=np.uint8)
+            colors[shaded] = shaded_colors
+            colors = colors[:, :, None, :]
+        # Each pixel's color goes to its samples that passed
+        np.copyto(block, colors, where=passed[..., None])
+
+        if rasterization.overdraw is not None:
+            rasterization.overdraw[min_y : max_y + 1, min_x : max_x + 1] += shaded
+
+    def resolve(self, pixels, resolve_depth=False, rect=None):
+        """Average the samples into pixels, a (height, width, 3) frame
+
+        With resolve_depth the nearest sample's depth of every pixel is also
+        written into rasterization.z_buffer, for code reading it afterwards.
+        With rect (x0, y0, x1, y1) only the pixels inside it are resolved.
+        """
+        height, width = pixels.shape[:2]
+        x0, y0, x1, y1 = rect or (0, 0, width, height)
+        region = np.s_[y0:y1, x0:x1]
+        total = self.color[region].sum(axis=2, dtype=np.uint16)
+        pixels[region] = (total + self.samples // 2) // self.samples
+        if resolve_depth:
+            np.min(self.depth[region], axis=2, out=rasterization.z_buffer[region])
+
+
+if __name__ == "__main__":
+    # The ground of the default view as 512 shaded triangles:
+    # multisampling vs supersampling (an ordered grid rendered at a higher
+    # resolution, then averaged down) at 2x, 4x and 8x. Error is the mean
+    # absolute difference from a 16x supersampled reference.
+    from main import benchmark_ground_view
+    from shading import (
+        checkerboard_shader,
+        depth_fog_shader,
+        rasterize_triangle_shaded,
+    )
+
+    width, height, size, spacing = 800, 600, 400, 50
+    camera, mvp, ground = benchmark_ground_view(width, height, size, spacing)
+    # One checker cell per grid square: colors only change at triangle edges,
+    # which is the aliasing multisampling removes
+    shader = depth_fog_shader(
+        checkerboard_shader(spacing, [(60, 60, 60), (200, 200, 200)]), far=2500.0
+    )
+
+    def ground_triangles(matrix):
+        # Sub-pixel vertex positions: project_points_via_matrix truncates to
+        # whole pixels, which would move the edges differently at every
+        # resolution and show up as error unrelated to the sampling
+        h = ground.reshape(-1, 3) @ matrix[:, :3].T + matrix[:, 3]
+        p = np.column_stack([h[:, 0] / h[:, 3], h[:, 1] / h[:, 3], np.abs(h[:, 3])])
+        for i, corners in enumerate(ground):
+            yield p[3 * i], p[3 * i + 1], p[3 * i + 2], {"position": corners}
+
+    def supersample(factor_x, factor_y):
+        """Render at (width * fx, height * fy), average down; returns (frame, bytes)"""
+        # Scaled, then shifted so each pixel's subpixels are centered on its
+        # position, like the SAMPLE_PATTERNS offsets
+        scale = np.diag([factor_x, factor_y, 1, 1]).astype(float)
+        scale[:2, 3] = (factor_x - 1) / 2, (factor_y - 1) / 2
+        matrix = scale @ mvp
+        big = FrameBufferRenderer(
+            np.zeros((height * factor_y, width * factor_x, 3), np.uint8)
+        )
+        rasterization.init_z_buffer(width * factor_x, height * factor_y)
+        for p1, p2, p3, attributes in ground_triangles(matrix):
+            rasterize_triangle_shaded(
+                big, p1[:2], p2[:2], p3[:2], p1[2], p2[2], p3[2], shader, attributes
+            )
+        frame = big.pixels.reshape(height, factor_y, width, factor_x, 3).mean(
+            axis=(1, 3)
+        )
+        return (
+            frame.round().astype(np.uint8),
+            big.pixels.nbytes + rasterization.z_buffer.nbytes,
+        )
+
+    def multisample(samples):
+        buffers = MultisampleBuffers(width, height, samples)
+        rasterization.init_z_buffer(width, height)
+        for p1, p2, p3, attributes in ground_triangles(mvp):
+            buffers.rasterize_triangle(
+                p1[:2], p2[:2], p3[:2], p1[2], p2[2], p3[2], None, shader, attributes
+            )
+        frame = np.zeros((height, width, 3), dtype=np.uint8)
+        buffers.resolve(frame)
+        return frame, buffers.nbytes
+
+    def timed(render):
+        best = float("inf")
+        for _ in range(2):
+            shader_stats.update(fragments=0)
+            start = time.perf_counter()
+            frame, nbytes = render()
+            best = min(best, time.perf_counter() - start)
+        return frame, nbytes, best * 1000, shader_stats["fragments"]
+
+    reference = supersample(4, 4)[0].astype(float)
+    grids = {1: (1, 1), 2: (2, 1), 4: (2, 2), 8: (4, 2)}
+    for samples, (factor_x, factor_y) in grids.items():
+        for name, render in (
+            ("MSAA", lambda samples=samples: multisample(samples)),
+            ("SSAA", lambda fx=factor_x, fy=factor_y: supersample(fx, fy)),
+        ):
+            frame, nbytes, ms, shaded = timed(render)
+            error = np.abs(frame - reference).mean()
+            print(  # noqa: T201
+                f"{samples}x {name}: {ms:7.1f} ms, {nbytes / 2**20:6.1f} MB, "
+                f"{shaded:8d} fragments shaded, error {error:5.2f}"
+            )
@@ -0,0 +1,120 @@
+"""
+Overdraw instrumentation: how many times each pixel gets colored per frame.
+
+With the z-buffer, every triangle that is nearer than what is already stored
+writes its color, so a pixel can be painted several times before the final
+triangle covers it, and every one of those writes paid for shading. The
+z-buffered rasterizers count color writes into rasterization.overdraw when
+it is enabled (init_overdraw); this module turns that counter into:
+
+- overdraw_summary: average and maximum writes per pixel
+- overdraw_heatmap: an RGB image, black (never written) through blue, green
+  and yellow to red (max_count writes or more)
+
+A depth pre-pass (rasterization.set_depth_pass) brings every covered pixel
+down to one write.
+"""
+
+import numpy as np
+
+# Heatmap color stops for 0, 1, 2, ... writes; counts in between are blended
+HEATMAP_COLORS = np.array(
+    [(0, 0, 0), (0, 0, 160), (0, 160, 80), (230, 230, 0), (255, 0, 0)], dtype=float
+)
+
+
+def overdraw_summary(counts):
+    """Writes per pixel of an overdraw counter
+
+    Returns:
+        Dict with the average over all pixels and over covered pixels (at
+        least one write), the maximum, and the fraction of pixels covered
+    """
+    covered = counts > 0
+    num_covered = int(np.count_nonzero(covered))
+    total = int(counts.sum())
+    return {
+        "avg_writes": round(total / counts.size, 2) if counts.size else 0.0,
+        "avg_covered_writes": round(total / num_covered, 2) if num_covered else 0.0,
+        "max_writes": int(counts.max()) if counts.size else 0,
+        "covered": round(num_covered / counts.size, 3) if counts.size else 0.0,
+    }
+
+
+def overdraw_heatmap(counts, max_count=8):
+    """RGB (height, width, 3) uint8 image of an overdraw counter
+
+    One write maps to the first color after black and max_count writes to
+    the last; the stops in between are spread evenly.
+    """
+    stops = len(HEATMAP_COLORS) - 1
+    # 0 -> first stop, 1 -> second, max_count -> last
+    position = np.where(
+        counts > 0,
+        1 + (np.minimum(counts, max_count) - 1) * (stops - 1) / max(max_count - 1, 1),
+        0.0,
+    )
+    low = np.floor(position).astype(int)
+    high = np.minimum(low + 1, stops)
+    amount = (position - low)[..., None]
+    colors = HEATMAP_COLORS[low] * (1 - amount) + HEATMAP_COLORS[high] * amount
+    return colors.astype(np.uint8)
+
+
+if __name__ == "__main__":
+    # The default scene (and the shaded ground with fog, where shading costs
+    # the most) rendered in one pass and with a depth pre-pass: frame time,
+    # overdraw, and whether the two frames match
+    import contextlib
+    import io
+    import sys
+    import time
+
+    import main as app
+    import rasterization
+
+    def render(options, repeats=3):
+        for name, value in options.items():
+            setattr(app, name, value)
+        with contextlib.redirect_stdout(io.StringIO()):
+            pixels = app.init_frame_buffer(app.WIDTH, app.HEIGHT)
+            app.init_z_buffer(app.WIDTH, app.HEIGHT)
+            rasterization.init_overdraw(app.WIDTH, app.HEIGHT)
+            target = app.FrameBufferRenderer(pixels)
+            scene_objects = app.create_scene_objects()
+            camera, _ = app.setup_camera_and_projection()
+            app.render_cpu_frame(target, camera, scene_objects)
+            best = float("inf")
+            for _ in range(repeats):
+                start = time.perf_counter()
+                app.render_cpu_frame(target, camera, scene_objects)
+                best = min(best, time.perf_counter() - start)
+        return best * 1000, target.pixels.copy(), rasterization.overdraw.copy()
+
+    scenes = {
+        "default scene": {"GROUND_SHADER": None, "DEPTH_FOG": False},
+        "checkerboard ground + fog": {
+            "GROUND_SHADER": "checkerboard",
+            "DEPTH_FOG": True,
+        },
+    }
+    for scene, options in scenes.items():
+        single_ms, single, single_counts = render({**options, "DEPTH_PREPASS": False})
+        prepass_ms, prepass, prepass_counts = render({**options, "DEPTH_PREPASS": True})
+        differing = int(np.count_nonzero(np.any(single != prepass, axis=2)))
+        print(f"{scene}:")  # noqa: T201
+        for name, ms, counts in (
+            ("single pass", single_ms, single_counts),
+            ("depth pre-pass", prepass_ms, prepass_counts),
+        ):
+            print(  # noqa: T201
+                f"  {name:15s} {ms:8.1f} ms  {overdraw_summary(counts)}"
+            )
+        print(f"  pixels differing between the two: {differing}")  # noqa: T201
+
+    if len(sys.argv) > 1:
+        from recorder import encode_png
+
+        with open(sys.argv[1], "wb") as f:
+            f.write(encode_png(overdraw_heatmap(single_counts)))
+        print(f"Heatmap of the single pass written to {sys.argv[1]}")  # noqa: T201
@@ -67,8 +67,8 @@ def create_viewport_matrix(width, height):
     return viewport_matrix
 
 
-def project_3d_to_2d_via_matrix(point, camera, width, height):
-    """Project 3D point to 2D using matrix transformations"""
+def create_mvp_matrix(camera, width, height):
+    """Combined world -> screen matrix (viewport @ projection @ view)"""
     # Create the transformation matrices
     view_matrix = create_view_matrix(camera.position, camera.target)
     projection_matrix = create_projection_matrix(camera.focal_length, width, height)
@@ -76,7 +76,17 @@ def project_3d_to_2d_via_matrix(point, camera, width, height):
 
     # Combine all matrices into a single transformation
     # Matrix multiplication is applied right to left
-    mvp_matrix = viewport_matrix @ projection_matrix @ view_matrix
+    return viewport_matrix @ projection_matrix @ view_matrix
+
+
+def project_3d_to_2d_via_matrix(point, camera, width, height, mvp_matrix=None):
+    """Project 3D point to 2D using matrix transformations
+
+    mvp_matrix can be passed in when the caller already built it for this
+    camera, saving the per-point matrix construction.
+    """
+    if mvp_matrix is None:
+        mvp_matrix = create_mvp_matrix(camera, width, height)
 
     # Convert point to homogeneous coordinates
     point_homogeneous = np.array([point[0], point[1], point[2], 1.0])
@@ -92,7 +102,9 @@ def project_3d_to_2d_via_matrix(point, camera, width, height):
         # Check if point is visible (in front of camera)
         # Note: W coordinate can be negative due to coordinate system differences
         if abs(transformed_point[3]) > 0.1:  # Use absolute value
-            depth_z = abs(transformed_point[3])  # Convert to positive depth for compatibility
+            depth_z = abs(
+                transformed_point[3]
+            )  # Convert to positive depth for compatibility
             return (int(screen_x), int(screen_y), depth_z)
 
     return None
@@ -118,3 +130,71 @@ def project_3d_to_2d_direct(point, camera, width, height):
         y_2d = (camera.focal_length * y_cam) / z_cam
         return (int(x_2d + width / 2), int(y_2d + height / 2), z_cam)
     return None
+
+
+def pixel_rays(xs, ys, mvp_matrix):
+    """Ray directions through screen pixels, scaled so that w grows by 1
+    along them (see unproject_pixels)
+
+    Returns:
+        (N, 3) array of world-space directions
+    """
+    m = np.asarray(mvp_matrix, dtype=float)
+    xs = np.asarray(xs, dtype=float)[:, None]
+    ys = np.asarray(ys, dtype=float)[:, None]
+
+    n1 = m[0, :3] - xs * m[3, :3]
+    n2 = m[1, :3] - ys * m[3, :3]
+    rays = np.cross(n1, n2)
+    rays /= (rays @ m[3, :3])[:, None]
+    return rays
+
+
+def unproject_pixels(xs, ys, depths, camera, mvp_matrix):
+    """Recover world positions from screen pixels and their depth (the inverse
+    of project_3d_to_2d_via_matrix)
+
+    Every pixel (sx, sy) defines a ray from the camera: the points where
+    (row0 - sx * row3) . P = 0 and (row1 - sy * row3) . P = 0. Along that
+    ray the w coordinate (row3 . P) grows linearly, and |w| is the depth we
+    stored, so P = camera + w * ray with the ray scaled to give w = 1.
+
+    Args:
+        xs, ys: Arrays of screen coordinates
+        depths: Array of depths as returned by the projection (positive)
+        camera: Camera the pixels were rendered with
+        mvp_matrix: Matrix from create_mvp_matrix() for that camera
+
+    Returns:
+        (N, 3) array of world-space points
+    """
+    m = np.asarray(mvp_matrix, dtype=float)
+    rays = pixel_rays(xs, ys, m)
+
+    # w is negative in front of the camera with these matrices; find the sign
+    forward = normalize(np.array(camera.target) - np.array(camera.position))
+    w_sign = np.sign(m[3, :3] @ forward)
+    w = w_sign * np.asarray(depths, dtype=float)
+
+    return np.array(camera.position, dtype=float) + w[:, None] * rays
+
+
+def project_points_via_matrix(points, mvp_matrix):
+    """Project an (N, 3) array of points at once (bulk version of
+    project_3d_to_2d_via_matrix, same truncation and visibility rule)
+
+    Returns:
+        List with an (x, y, depth) tuple per point, None where not visible
+    """
+    points = np.asarray(points, dtype=float)
+    transformed = points @ mvp_matrix[:, :3].T + mvp_matrix[:, 3]
+    w = transformed[:, 3]
+    visible = np.abs(w) > 0.1
+    safe_w = np.where(visible, w, 1.0)
+    xs = (transformed[:, 0] / safe_w).astype(np.int64)
+    ys = (transformed[:, 1] / safe_w).astype(np.int64)
+    depths = np.abs(w)
+    return [
+        (int(x), int(y), depth) if ok else None
+        for x, y, depth, ok in zip(xs, ys, depths, visible, strict=True)
+    ]
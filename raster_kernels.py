@@ -0,0 +1,400 @@
+"""
+Compiled rasterization and projection kernels, selected at runtime.
+
+rasterize_triangle_with_depth runs its edge functions, barycentrics and
+depth test pixel by pixel in the interpreter. This module runs the same
+math over batches of triangles with one of two backends:
+
+- "numba": the loops are compiled with Numba (pip install numba). Rows are
+  split into tiles that run in parallel, each tile drawing every triangle
+  in order, so no two threads touch the same pixel and the result matches
+  the per-pixel loop. Kernels are compiled with cache=True: the machine
+  code is stored in __pycache__ and later runs load it instead of
+  compiling
+- "numpy": the vectorized fallback used when Numba is not installed, one
+  bounding box of pixels per triangle
+
+"scanline" selects scanline.rasterize_triangle_scanline instead: different
+math (fixed-point edges, top-left fill rule), so edge pixels can differ.
+
+All of them follow rasterization.depth_pass, clip_rect and the overdraw counter.
+Triangles are (p1, p2, p3, z1, z2, z3, color) tuples, as queued for the
+raster worker processes, or arrays of them (rasterize_triangle_arrays).
+"""
+
+import importlib.util
+import logging
+import time
+
+import numpy as np
+
+import rasterization
+from scanline import rasterize_triangle_scanline
+
+# Optional: without Numba the "numba" backend falls back to the NumPy kernels.
+# Importing it takes ~0.4 s, so that only happens when the backend is used.
+HAVE_NUMBA = importlib.util.find_spec("numba") is not None
+
+BACKENDS = ("python", "numpy", "numba", "scanline")
+
+# Rows per parallel tile of the Numba rasterizer
+TILE_ROWS = 16
+
+# depth_pass name -> mode number understood by the kernels
+_DEPTH_MODES = {"less": 0, "prepass": 1, "equal": 2}
+
+_warned_fallback = False
+
+
+def resolve_backend(name):
+    """The backend that will actually run for name ("numba" falls back to
+    "numpy" when Numba is not installed)"""
+    global _warned_fallback
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown raster backend {name!r}, expected one of {BACKENDS}")
+    if name == "numba" and not HAVE_NUMBA:
+        if not _warned_fallback:
+            logging.warning("Numba is not installed, using the NumPy raster kernels")
+            _warned_fallback = True
+        return "numpy"
+    return name
+
+
+def _raster_rows(
+    z_buffer, pixels, overdraw, triangles, colors, limits, row0, row1, mode, flags
+):
+    """Draw every triangle into rows [row0, row1), in order
+
+    Same coverage rule, barycentrics and depth interpolation as
+    rasterization.rasterize_triangle_with_depth. flags bit 0: write colors,
+    bit 1: count overdraw.
+    """
+    limit_x0, limit_y0, limit_x1, limit_y1 = limits
+    for i in range(triangles.shape[0]):
+        x1, y1, x2, y2, x3, y3, z1, z2, z3 = triangles[i]
+        denom = (y2 - y3) * (x1 - x3) + (x3 - x2) * (y1 - y3)
+        if abs(denom) < 1e-10:
+            continue
+        min_x = max(limit_x0, int(min(x1, x2, x3)))
+        max_x = min(limit_x1, int(max(x1, x2, x3)))
+        min_y = max(limit_y0, row0, int(min(y1, y2, y3)))
+        max_y = min(limit_y1, row1 - 1, int(max(y1, y2, y3)))
+        for y in range(min_y, max_y + 1):
+            for x in range(min_x, max_x + 1):
+                a = ((y2 - y3) * (x - x3) + (x3 - x2) * (y - y3)) / denom
+                b = ((y3 - y1) * (x - x3) + (x1 - x3) * (y - y3)) / denom
+                c = 1 - a - b
+                if a < 0 or b < 0 or c < 0:
+                    continue
+                depth = a * z1 + b * z2 + c * z3
+                if mode == 2:
+                    if depth != z_buffer[y, x]:
+                        continue
+                    z_buffer[y, x] = np.nextafter(depth, -np.inf)
+                elif depth < z_buffer[y, x]:
+                    z_buffer[y, x] = depth
+                    if mode == 1:
+                        continue
+                else:
+                    continue
+                if flags & 1:
+                    pixels[y, x, 0] = colors[i, 0]
+                    pixels[y, x, 1] = colors[i, 1]
+                    pixels[y, x, 2] = colors[i, 2]
+                if flags & 2:
+                    overdraw[y, x] += 1
+
+
+def _raster_tiles(
+    z_buffer, pixels, overdraw, triangles, colors, limits, tile_rows, mode, flags
+):
+    """_raster_rows over the limit rows, one tile of tile_rows per iteration"""
+    first, last = limits[1], limits[3]
+    num_tiles = (last - first + tile_rows) // tile_rows
+    for tile in _prange(num_tiles):
+        row0 = first + tile * tile_rows
+        _raster_rows_kernel(
+            z_buffer,
+            pixels,
+            overdraw,
+            triangles,
+            colors,
+            limits,
+            row0,
+            min(row0 + tile_rows, last + 1),
+            mode,
+            flags,
+        )
+
+
+def _project_points(points, mvp):
+    """Screen x, y (truncated), depth and visibility of (n, 3) points"""
+    n = points.shape[0]
+    xs = np.zeros(n, dtype=np.int64)
+    ys = np.zeros(n, dtype=np.int64)
+    depths = np.zeros(n)
+    visible = np.zeros(n, dtype=np.bool_)
+    for i in _prange(n):
+        px, py, pz = points[i, 0], points[i, 1], points[i, 2]
+        tx = mvp[0, 0] * px + mvp[0, 1] * py + mvp[0, 2] * pz + mvp[0, 3]
+        ty = mvp[1, 0] * px + mvp[1, 1] * py + mvp[1, 2] * pz + mvp[1, 3]
+        w = mvp[3, 0] * px + mvp[3, 1] * py + mvp[3, 2] * pz + mvp[3, 3]
+        depths[i] = abs(w)
+        if abs(w) > 0.1:
+            visible[i] = True
+            xs[i] = int(tx / w)
+            ys[i] = int(ty / w)
+    return xs, ys, depths, visible
+
+
+# Plain Python until _compile() swaps in the Numba versions
+_prange = range
+_raster_rows_kernel = _raster_rows
+_raster_tiles_kernel = None
+_project_points_kernel = None
+
+
+def _compile():
+    """JIT-wrap the kernels on first use (machine code comes from the disk
+    cache when the source has not changed)"""
+    global _prange, _raster_rows_kernel, _raster_tiles_kernel, _project_points_kernel
+    if _raster_tiles_kernel is not None:
+        return
+    import numba
+
+    # The tile loop resolves _prange and _raster_rows_kernel when compiled
+    _prange = numba.prange
+    _raster_rows_kernel = numba.njit(cache=True, nogil=True)(_raster_rows)
+    _raster_tiles_kernel = numba.njit(cache=True, parallel=True)(_raster_tiles)
+    _project_points_kernel = numba.njit(cache=True, parallel=True)(_project_points)
+
+
+def _limits(pixels):
+    """Inclusive (x0, y0, x1, y1) pixel limits, as in triangle_bounds"""
+    height, width = rasterization.z_buffer.shape
+    if pixels is not None:
+        height, width = min(height, pixels.shape[0]), min(width, pixels.shape[1])
+    x0, y0, x1, y1 = 0, 0, width - 1, height - 1
+    clip_rect = rasterization.clip_rect
+    if clip_rect is not None:
+        x0, y0 = max(x0, clip_rect[0]), max(y0, clip_rect[1])
+        x1, y1 = min(x1, clip_rect[2] - 1), min(y1, clip_rect[3] - 1)
+    return x0, y0, x1, y1
+
+
+def _rasterize_numpy(pixels, triangles, colors, limits, mode):
+    """One vectorized bounding box per triangle"""
+    z_buffer = rasterization.z_buffer
+    overdraw = rasterization.overdraw
+    limit_x0, limit_y0, limit_x1, limit_y1 = limits
+    for (x1, y1, x2, y2, x3, y3, z1, z2, z3), color in zip(
+        triangles, colors, strict=True
+    ):
+        denom = (y2 - y3) * (x1 - x3) + (x3 - x2) * (y1 - y3)
+        min_x = max(limit_x0, int(min(x1, x2, x3)))
+        max_x = min(limit_x1, int(max(x1, x2, x3)))
+        min_y = max(limit_y0, int(min(y1, y2, y3)))
+        max_y = min(limit_y1, int(max(y1, y2, y3)))
+        if min_x > max_x or min_y > max_y or abs(denom) < 1e-10:
+            continue
+
+        ys, xs = np.mgrid[min_y : max_y + 1, min_x : max_x + 1]
+        a = ((y2 - y3) * (xs - x3) + (x3 - x2) * (ys - y3)) / denom
+        b = ((y3 - y1) * (xs - x3) + (x1 - x3) * (ys - y3)) / denom
+        c = 1 - a - b
+        depth = a * z1 + b * z2 + c * z3
+        stored = z_buffer[min_y : max_y + 1, min_x : max_x + 1]
+        inside = (a >= 0) & (b >= 0) & (c >= 0)
+        if mode == 2:
+            inside &= depth == stored
+            stored[inside] = np.nextafter(depth[inside], -np.inf)
+        else:
+            inside &= depth < stored
+            stored[inside] = depth[inside]
+            if mode == 1:
+                continue
+        if pixels is not None:
+            pixels[min_y : max_y + 1, min_x : max_x + 1][inside] = color
+        if overdraw is not None:
+            overdraw[min_y : max_y + 1, min_x : max_x + 1][inside] += 1
+
+
+def rasterize_triangles(renderer, triangles, backend="numba"):
+    """Rasterize a batch of triangles with z-buffering
+
+    Args:
+        renderer: FrameBufferRenderer, or a renderer without pixels (only
+            valid in a depth pre-pass; otherwise the per-pixel loop is used)
+        triangles: List of (p1, p2, p3, z1, z2, z3, color) in screen space
+        backend: One of BACKENDS
+    """
+    if not triangles:
+        return
+    backend = resolve_backend(backend)
+    mode = _DEPTH_MODES[rasterization.depth_pass]
+    pixels = getattr(renderer, "pixels", None)
+    if backend == "scanline":
+        for triangle in triangles:
+            rasterize_triangle_scanline(renderer, *triangle)
+        return
+    if backend == "python" or (pixels is None and mode != 1):
+        for p1, p2, p3, z1, z2, z3, color in triangles:
+            rasterization.rasterize_triangle_with_depth(
+                renderer, p1, p2, p3, z1, z2, z3, color
+            )
+        return
+
+    coordinates = np.array(
+        [
+            (p1[0], p1[1], p2[0], p2[1], p3[0], p3[1], z1, z2, z3)
+            for p1, p2, p3, z1, z2, z3, _ in triangles
+        ],
+        dtype=float,
+    )
+    colors = np.array([color[:3] for *_, color in triangles], dtype=np.uint8)
+    rasterize_triangle_arrays(renderer, coordinates, colors, backend)
+
+
+def rasterize_triangle_arrays(renderer, coordinates, colors, backend="numba"):
+    """rasterize_triangles for triangles already in arrays (x and y are
+    truncated to whole pixels on the per-triangle paths)
+
+    Args:
+        renderer: As for rasterize_triangles
+        coordinates: (n, 9) x1, y1, x2, y2, x3, y3, z1, z2, z3 per triangle
+        colors: (n, 3) uint8 color per triangle
+        backend: One of BACKENDS
+    """
+    if len(coordinates) == 0:
+        return
+    backend = resolve_backend(backend)
+    mode = _DEPTH_MODES[rasterization.depth_pass]
+    pixels = getattr(renderer, "pixels", None)
+    if backend in ("python", "scanline") or (pixels is None and mode != 1):
+        rasterize = (
+            rasterize_triangle_scanline
+            if backend == "scanline"
+            else rasterization.rasterize_triangle_with_depth
+        )
+        for (x1, y1, x2, y2, x3, y3, z1, z2, z3), color in zip(
+            coordinates.tolist(), colors.tolist(), strict=True
+        ):
+            p1, p2, p3 = (int(x1), int(y1)), (int(x2), int(y2)), (int(x3), int(y3))
+            rasterize(renderer, p1, p2, p3, z1, z2, z3, tuple(color))
+        return
+
+    limits = _limits(pixels)
+    if mode == 1:
+        pixels = None
+    if backend == "numpy":
+        _rasterize_numpy(pixels, coordinates, colors, limits, mode)
+        return
+
+    _compile()
+    overdraw = rasterization.overdraw
+    flags = (pixels is not None) | (overdraw is not None) << 1
+    _raster_tiles_kernel(
+        rasterization.z_buffer,
+        pixels if pixels is not None else np.zeros((1, 1, 3), dtype=np.uint8),
+        overdraw if overdraw is not None else np.zeros((1, 1), dtype=np.int32),
+        coordinates,
+        colors,
+        np.array(limits, dtype=np.int64),
+        TILE_ROWS,
+        mode,
+        flags,
+    )
+
+
+def project_points_via_matrix(points, mvp_matrix, backend="numba"):
+    """projection.project_points_via_matrix through the selected backend
+
+    Returns:
+        List with an (x, y, depth) tuple per point, None where not visible
+    """
+    if resolve_backend(backend) != "numba":
+        from projection import project_points_via_matrix as project
+
+        return project(points, mvp_matrix)
+    _compile()
+    xs, ys, depths, visible = _project_points_kernel(
+        np.ascontiguousarray(points, dtype=float),
+        np.ascontiguousarray(mvp_matrix, dtype=float),
+    )
+    return [
+        (x, y, depth) if ok else None
+        for x, y, depth, ok in zip(
+            xs.tolist(), ys.tolist(), depths.tolist(), visible.tolist(), strict=True
+        )
+    ]
+
+
+def warm_up(backend="numba"):
+    """Compile (or load from the on-disk cache) the kernels for backend
+
+    Returns:
+        (backend that will run, seconds spent)
+    """
+    from framebuffer import FrameBufferRenderer
+
+    backend = resolve_backend(backend)
+    start = time.perf_counter()
+    if backend == "numba":
+        previous = rasterization.z_buffer
+        try:
+            rasterization.set_z_buffer(np.full((4, 4), np.inf))
+            pixels = np.zeros((4, 4, 3), dtype=np.uint8)
+            triangle = ((0, 0), (3, 0), (0, 3), 1.0, 1.0, 1.0, (255, 255, 255))
+            rasterize_triangles(FrameBufferRenderer(pixels), [triangle], backend)
+        finally:
+            rasterization.set_z_buffer(previous)
+        project_points_via_matrix(np.zeros((1, 3)), np.eye(4), backend)
+    return backend, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    # The 800x800 ground of the default view as 512 flat triangles, drawn by
+    # each backend, then 100k points projected. The first line shows what
+    # the Numba kernels cost at startup: a compile on the first run, a load
+    # from __pycache__ afterwards.
+    from framebuffer import FrameBufferRenderer, init_frame_buffer
+    from main import benchmark_ground_view
+    from projection import project_points_via_matrix as project_numpy
+
+    backend, seconds = warm_up("numba")
+    print(f"warm up ({backend}): {seconds * 1000:.0f} ms")  # noqa: T201
+
+    width, height = 800, 600
+    camera, mvp, ground = benchmark_ground_view(width, height)
+    target = FrameBufferRenderer(init_frame_buffer(width, height))
+
+    p = project_numpy(ground.reshape(-1, 3), mvp)
+    triangles = [
+        (p[i][:2], p[i + 1][:2], p[i + 2][:2], p[i][2], p[i + 1][2], p[i + 2][2])
+        + ((60,) * 3,)
+        for i in range(0, len(p), 3)
+    ]
+
+    frames = {}
+    for name in BACKENDS:
+        best = float("inf")
+        for _ in range(1 if name == "python" else 5):
+            rasterization.init_z_buffer(width, height)
+            start = time.perf_counter()
+            rasterize_triangles(target, triangles, name)
+            best = min(best, time.perf_counter() - start)
+        frames[name] = target.pixels.copy()
+        same = np.array_equal(frames[name], frames["python"])
+        print(  # noqa: T201
+            f"{len(triangles)} triangles, {name:6s}: {best * 1000:8.2f} ms "
+            f"(same pixels as python: {same})"
+        )
+
+    points = np.random.default_rng(0).uniform(-400, 400, (100_000, 3))
+    for name in ("numpy", "numba"):
+        best = float("inf")
+        for _ in range(5):
+            start = time.perf_counter()
+            project_points_via_matrix(points, mvp, name)
+            best = min(best, time.perf_counter() - start)
+        print(f"100k points projected, {name:6s}: {best * 1000:8.2f} ms")  # noqa: T201
@@ -5,26 +5,129 @@ This module contains all the functions related to:
 - Triangle rasterization with and without z-buffering
 - Point-in-triangle testing
 - Barycentric coordinate calculations
+- Depth pre-pass modes and overdraw counting for the z-buffered rasterizers
 """
 
 import numpy as np
-import sdl2.ext
 
 # Global z-buffer - will be initialized by main.py
 z_buffer = None
 
+# Optional (x0, y0, x1, y1) rectangle (end exclusive) limiting rasterization
+clip_rect = None
 
-def init_z_buffer(width, height):
-    """Initialize the global z-buffer"""
+# How z-buffered triangles use the depth buffer (see set_depth_pass)
+DEPTH_PASSES = ("less", "prepass", "equal")
+depth_pass = "less"
+
+# Optional (height, width) count of color writes per pixel (see init_overdraw)
+overdraw = None
+
+
+def init_z_buffer(width, height, buffer=None):
+    """Initialize the global z-buffer
+
+    Args:
+        width, height: Size of the depth buffer in pixels
+        buffer: Optional existing (height, width) float array to use as
+            storage (e.g. a view into shared memory)
+    """
     global z_buffer
-    z_buffer = np.full((height, width), float('inf'))
+    if buffer is None:
+        buffer = np.empty((height, width))
+    set_z_buffer(buffer)
+    z_buffer.fill(float('inf'))
+
 
+def set_z_buffer(buffer):
+    """Point the global z-buffer at an existing array without clearing it
 
-def clear_z_buffer():
-    """Clear the z-buffer by filling with infinity"""
+    Used by worker processes that attach to a depth buffer someone else owns.
+    """
+    global z_buffer
+    z_buffer = buffer
+
+
+def clear_z_buffer(rect=None):
+    """Clear the z-buffer (or just rect (x0, y0, x1, y1)) by filling with infinity"""
     global z_buffer
     if z_buffer is not None:
-        z_buffer.fill(float('inf'))
+        if rect is None:
+            z_buffer.fill(float('inf'))
+        else:
+            x0, y0, x1, y1 = rect
+            z_buffer[y0:y1, x0:x1] = float('inf')
+
+
+def set_clip_rect(rect):
+    """Only rasterize pixels inside rect (x0, y0, x1, y1); None for the full buffer"""
+    global clip_rect
+    clip_rect = rect
+
+
+def set_depth_pass(mode):
+    """Choose how the z-buffered rasterizers test and write depth
+
+    - "less": regular z-buffering, nearer fragments write depth and color
+    - "prepass": depth only, nearer fragments write depth and nothing else
+    - "equal": after a pre-pass, only the fragment whose depth equals the
+      stored one writes color, so every pixel is colored once
+    """
+    global depth_pass
+    if mode not in DEPTH_PASSES:
+        raise ValueError(f"Unknown depth pass {mode!r}, expected one of {DEPTH_PASSES}")
+    depth_pass = mode
+
+
+def init_overdraw(width, height, buffer=None):
+    """Start counting color writes per pixel (cleared to zero)
+
+    Args:
+        width, height: Size of the counter in pixels
+        buffer: Optional existing (height, width) integer array to use as
+            storage (e.g. a top-left view of a larger one)
+    """
+    global overdraw
+    if buffer is None:
+        buffer = np.zeros((height, width), dtype=np.int32)
+    overdraw = buffer
+    overdraw.fill(0)
+
+
+def set_overdraw(buffer):
+    """Point the overdraw counter at an existing array, or None to stop counting"""
+    global overdraw
+    overdraw = buffer
+
+
+def clear_overdraw(rect=None):
+    """Reset the overdraw counter (or just rect (x0, y0, x1, y1)) to zero"""
+    if overdraw is not None:
+        if rect is None:
+            overdraw.fill(0)
+        else:
+            x0, y0, x1, y1 = rect
+            overdraw[y0:y1, x0:x1] = 0
+
+
+def triangle_bounds(p1, p2, p3):
+    """Pixel bounding box of a triangle, clipped to the z-buffer and clip rect
+
+    Returns (min_x, max_x, min_y, max_y), inclusive. Empty when min > max.
+    """
+    limit_x0, limit_y0 = 0, 0
+    limit_x1, limit_y1 = z_buffer.shape[1] - 1, z_buffer.shape[0] - 1
+    if clip_rect is not None:
+        limit_x0 = max(limit_x0, clip_rect[0])
+        limit_y0 = max(limit_y0, clip_rect[1])
+        limit_x1 = min(limit_x1, clip_rect[2] - 1)
+        limit_y1 = min(limit_y1, clip_rect[3] - 1)
+
+    min_x = max(limit_x0, int(min(p1[0], p2[0], p3[0])))
+    max_x = min(limit_x1, int(max(p1[0], p2[0], p3[0])))
+    min_y = max(limit_y0, int(min(p1[1], p2[1], p3[1])))
+    max_y = min(limit_y1, int(max(p1[1], p2[1], p3[1])))
+    return min_x, max_x, min_y, max_y
 
 
 def rasterize_triangle(renderer, p1, p2, p3, color):
@@ -36,24 +139,25 @@ def rasterize_triangle(renderer, p1, p2, p3, color):
         color: RGB color tuple (r, g, b)
     """
     # Set the color
-    renderer.color = sdl2.ext.Color(color[0], color[1], color[2], 255)
+    renderer.color = (color[0], color[1], color[2], 255)
 
     # Find bounding box of the triangle
-    min_x = max(0, int(min(p1[0], p2[0], p3[0])))
-    max_x = min(z_buffer.shape[1] - 1, int(max(p1[0], p2[0], p3[0])))
-    min_y = max(0, int(min(p1[1], p2[1], p3[1])))
-    max_y = min(z_buffer.shape[0] - 1, int(max(p1[1], p2[1], p3[1])))
+    min_x, max_x, min_y, max_y = triangle_bounds(p1, p2, p3)
 
     # For each pixel in the bounding box, check if it's inside the triangle
     for y in range(min_y, max_y + 1):
         for x in range(min_x, max_x + 1):
             if point_in_triangle(x, y, p1, p2, p3):
                 renderer.draw_point((x, y))
+                if overdraw is not None:
+                    overdraw[y, x] += 1
 
 
 def rasterize_triangle_with_depth(renderer, p1, p2, p3, z1, z2, z3, color):
     """Rasterize a triangle with z-buffering
 
+    Follows the current depth_pass and counts color writes in overdraw.
+
     Args:
         renderer: SDL2 renderer
         p1, p2, p3: 2D points as tuples (x, y)
@@ -61,13 +165,10 @@ def rasterize_triangle_with_depth(renderer, p1, p2, p3, z1, z2, z3, color):
         color: RGB color tuple (r, g, b)
     """
     # Set the color
-    renderer.color = sdl2.ext.Color(color[0], color[1], color[2], 255)
+    renderer.color = (color[0], color[1], color[2], 255)
 
     # Find bounding box of the triangle
-    min_x = max(0, int(min(p1[0], p2[0], p3[0])))
-    max_x = min(z_buffer.shape[1] - 1, int(max(p1[0], p2[0], p3[0])))
-    min_y = max(0, int(min(p1[1], p2[1], p3[1])))
-    max_y = min(z_buffer.shape[0] - 1, int(max(p1[1], p2[1], p3[1])))
+    min_x, max_x, min_y, max_y = triangle_bounds(p1, p2, p3)
 
     # For each pixel in the bounding box
     for y in range(min_y, max_y + 1):
@@ -78,9 +179,22 @@ def rasterize_triangle_with_depth(renderer, p1, p2, p3, z1, z2, z3, color):
                 pixel_depth = a * z1 + b * z2 + c * z3
 
                 # Depth test
-                if pixel_depth < z_buffer[y][x]:  # Note: y first for numpy arrays
+                if depth_pass == "equal":
+                    if pixel_depth != z_buffer[y][x]:
+                        continue
+                    # Nudge the stored depth one step nearer so a fragment at
+                    # exactly the same depth later (a shared edge) fails: the
+                    # first triangle drawn wins, as with "less"
+                    z_buffer[y][x] = np.nextafter(pixel_depth, -np.inf)
+                elif pixel_depth < z_buffer[y][x]:  # Note: y first for numpy arrays
                     z_buffer[y][x] = pixel_depth
-                    renderer.draw_point((x, y))
+                    if depth_pass == "prepass":
+                        continue
+                else:
+                    continue
+                renderer.draw_point((x, y))
+                if overdraw is not None:
+                    overdraw[y, x] += 1
 
 
 def point_in_triangle(px, py, p1, p2, p3):
@@ -0,0 +1,242 @@
+"""
+Background frame recording for the CPU pipeline.
+
+Encoding a frame takes longer than rendering budget allows, so the render
+loop only copies the finished frame into a recycled buffer and hands it to a
+bounded queue. Writer threads do the encoding and the disk I/O:
+
+- "png": one PNG file per frame (frame_000000.png, ...)
+- "rgb": raw RGB24 frames appended to a single file
+- "y4m": YUV4MPEG2 stream (4:2:0), readable by ffmpeg/mpv
+
+Buffers come from a fixed pool, so recording does not allocate per frame.
+When every buffer is busy the policy decides what happens:
+- "drop": the frame is skipped and counted as dropped (render never stalls)
+- "block": the render loop waits for a writer to free a buffer
+"""
+
+import logging
+import os
+import queue
+import struct
+import threading
+import zlib
+
+import numpy as np
+
+FORMATS = ("png", "rgb", "y4m")
+POLICIES = ("drop", "block")
+
+
+def encode_png(pixels, compress_level=1):
+    """Encode an RGB (height, width, 3) uint8 array as PNG bytes
+
+    Uses only zlib: every row gets filter type 0 (none) and the image data
+    is deflated in one go. Level 1 trades file size for speed.
+    """
+    height, width = pixels.shape[:2]
+    rows = np.empty((height, width * 3 + 1), dtype=np.uint8)
+    rows[:, 0] = 0  # Filter type per row
+    rows[:, 1:] = pixels.reshape(height, width * 3)
+
+    def chunk(tag, data):
+        body = tag + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)  # 8-bit RGB
+    return b"".join(
+        [
+            b"\x89PNG\r\n\x1a\n",
+            chunk(b"IHDR", header),
+            chunk(b"IDAT", zlib.compress(rows.tobytes(), compress_level)),
+            chunk(b"IEND", b""),
+        ]
+    )
+
+
+def rgb_to_yuv420(pixels):
+    """Convert an RGB frame to planar Y, U, V bytes (BT.601 full range)"""
+    rgb = pixels.astype(np.float32)
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    y = 0.299 * r + 0.587 * g + 0.114 * b
+    u = -0.168736 * r - 0.331264 * g + 0.5 * b + 128
+    v = 0.5 * r - 0.418688 * g - 0.081312 * b + 128
+
+    def subsample(plane):
+        # Average each 2x2 block for 4:2:0 chroma
+        h, w = plane.shape
+        return plane.reshape(h // 2, 2, w // 2, 2).mean(axis=(1, 3))
+
+    planes = [y, subsample(u), subsample(v)]
+    return b"".join(np.clip(p, 0, 255).astype(np.uint8).tobytes() for p in planes)
+
+
+class FrameRecorder:
+    """Bounded, multi-threaded frame writer with a recycled buffer pool"""
+
+    def __init__(
+        self,
+        output,
+        width,
+        height,
+        fmt="png",
+        fps=60,
+        pool_size=8,
+        num_writers=2,
+        policy="drop",
+    ):
+        """
+        Args:
+            output: Directory for "png", file path for "rgb" and "y4m"
+            width, height: Frame size in pixels
+            fmt: One of FORMATS
+            fps: Frame rate written into the Y4M header
+            pool_size: Number of preallocated frame buffers (max frames in flight)
+            num_writers: Number of encoder/writer threads
+            policy: "drop" or "block" when no buffer is free
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown recording format {fmt!r}, expected {FORMATS}")
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown backpressure policy {policy!r}")
+        if fmt == "y4m" and (width % 2 or height % 2):
+            raise ValueError("Y4M 4:2:0 needs an even frame width and height")
+
+        self.output = output
+        self.width = width
+        self.height = height
+        self.fmt = fmt
+        self.policy = policy
+
+        # Counters (updated under the lock)
+        self.queued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+        self._free_buffers = queue.Queue()
+        for _ in range(pool_size):
+            self._free_buffers.put(np.empty((height, width, 3), dtype=np.uint8))
+        self._work = queue.Queue(maxsize=pool_size)
+        self._next_sequence = 0
+
+        # Stream formats write in submission order: writers wait for their turn
+        self._stream = None
+        self._next_to_write = 0
+        self._turn = threading.Condition()
+        if fmt == "png":
+            os.makedirs(output, exist_ok=True)
+        else:
+            self._stream = open(output, "wb")
+            if fmt == "y4m":
+                self._stream.write(
+                    f"YUV4MPEG2 W{width} H{height} F{fps}:1 Ip A1:1 C420jpeg\n".encode()
+                )
+
+        self._writers = [
+            threading.Thread(target=self._writer_loop, name=f"frame-writer-{i}")
+            for i in range(num_writers)
+        ]
+        for writer in self._writers:
+            writer.daemon = True
+            writer.start()
+
+    def submit(self, pixels):
+        """Queue a copy of a finished frame; returns False if it was dropped"""
+        try:
+            buffer = self._free_buffers.get(block=self.policy == "block")
+        except queue.Empty:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+        np.copyto(buffer, pixels)
+        with self._lock:
+            sequence = self._next_sequence
+            self._next_sequence += 1
+            self.queued += 1
+        self._work.put((sequence, buffer))
+        return True
+
+    def _encode(self, buffer):
+        if self.fmt == "png":
+            return encode_png(buffer)
+        if self.fmt == "y4m":
+            return b"FRAME\n" + rgb_to_yuv420(buffer)
+        return buffer.tobytes()
+
+    def _writer_loop(self):
+        while True:
+            item = self._work.get()
+            if item is None:
+                return
+            sequence, buffer = item
+            try:
+                data = self._encode(buffer)
+            except Exception:
+                logging.exception("Failed to encode frame %d", sequence)
+                data = None
+            finally:
+                # The pixels are no longer needed once encoded
+                self._free_buffers.put(buffer)
+
+            written = False
+            if self._stream is None:
+                if data is not None:
+                    path = os.path.join(self.output, f"frame_{sequence:06d}.png")
+                    try:
+                        with open(path, "wb") as f:
+                            f.write(data)
+                        written = True
+                    except OSError:
+                        logging.exception("Failed to write frame %d", sequence)
+            else:
+                # Always take our turn, even without data or when the write
+                # fails, so later frames are not stuck waiting for this
+                # sequence number
+                with self._turn:
+                    self._turn.wait_for(lambda s=sequence: self._next_to_write == s)
+                    try:
+                        if data is not None:
+                            self._stream.write(data)
+                            written = True
+                    except OSError:
+                        logging.exception("Failed to write frame %d", sequence)
+                    finally:
+                        self._next_to_write += 1
+                        self._turn.notify_all()
+
+            with self._lock:
+                if written:
+                    self.written += 1
+                else:
+                    self.failed += 1
+
+    def get_stats(self):
+        """Snapshot of the recording counters"""
+        with self._lock:
+            return {
+                "queued": self.queued,
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "in_flight": self.queued - self.written - self.failed,
+            }
+
+    def close(self):
+        """Flush every queued frame and stop the writers"""
+        for _ in self._writers:
+            self._work.put(None)
+        for writer in self._writers:
+            writer.join()
+        if self._stream is not None:
+            self._stream.close()
+        stats = self.get_stats()
+        logging.info(
+            "Recording finished: %d written, %d dropped -> %s",
+            stats["written"],
+            stats["dropped"],
+            self.output,
+        )
+        return stats
@@ -0,0 +1,268 @@
+"""
+Temporal reprojection: build most of a frame from the previous one.
+
+During a smooth camera orbit two consecutive frames are almost the same
+image seen from a slightly different place. We already know, for every
+pixel of the previous frame, its color and depth, so:
+
+1. Unproject each previous pixel to a world position (cached MVP + depth)
+2. Project it with the new camera and splat it, nearest depth wins
+3. Fill one-pixel cracks left by the splatting from their neighbours
+4. Look up the rays of still empty pixels in the previous frame as
+   directions (the background is infinitely far): those that saw the
+   background before see it again
+5. Whatever is still empty was hidden before (disocclusion) or is new at
+   the screen border: the caller re-rasterizes the tiles containing holes
+
+Every refresh_interval frames a full render resets the accumulated error.
+"""
+
+import collections
+import copy
+
+import numpy as np
+
+from projection import pixel_rays, unproject_pixels
+
+
+def compare_frames(frame, reference, threshold=24):
+    """Image quality of frame against a full render
+
+    Returns PSNR (dB), mean absolute error per channel and the fraction of
+    pixels where any channel is off by more than threshold.
+    """
+    diff = frame.astype(np.int16) - reference.astype(np.int16)
+    mse = float(np.mean(diff.astype(np.float64) ** 2))
+    psnr = float("inf") if mse == 0 else 10 * np.log10(255**2 / mse)
+    return {
+        "psnr_db": psnr,
+        "mean_abs_error": float(np.mean(np.abs(diff))),
+        "bad_pixel_fraction": float(np.mean(np.abs(diff).max(axis=2) > threshold)),
+    }
+
+
+def fill_cracks(color, depth, min_neighbours=5):
+    """Fill empty pixels surrounded by reprojected ones
+
+    Splatting one sample per pixel leaves pinholes where the new view
+    magnifies the surface. A hole with at least min_neighbours valid pixels
+    around it takes the color and depth of its nearest neighbour.
+    """
+    height, width = depth.shape
+    padded_depth = np.pad(depth, 1, constant_values=np.inf)
+    padded_color = np.pad(color, ((1, 1), (1, 1), (0, 0)))
+
+    best_depth = np.full((height, width), np.inf)
+    best_color = np.zeros_like(color)
+    valid_count = np.zeros((height, width), dtype=np.int8)
+    for dy in (-1, 0, 1):
+        for dx in (-1, 0, 1):
+            if dx == 0 and dy == 0:
+                continue
+            d = padded_depth[1 + dy : 1 + dy + height, 1 + dx : 1 + dx + width]
+            c = padded_color[1 + dy : 1 + dy + height, 1 + dx : 1 + dx + width]
+            valid_count += np.isfinite(d)
+            closer = d < best_depth
+            best_depth[closer] = d[closer]
+            best_color[closer] = c[closer]
+
+    fill = ~np.isfinite(depth) & (valid_count >= min_neighbours)
+    color[fill] = best_color[fill]
+    depth[fill] = best_depth[fill]
+    return fill
+
+
+def reproject(color, depth, camera, mvp_matrix, new_mvp_matrix):
+    """Warp a frame and its depth buffer to a new camera pose
+
+    Args:
+        color, depth: Previous frame (height, width, 3) and depth (height, width)
+        camera, mvp_matrix: Camera and matrix the previous frame was made with
+        new_mvp_matrix: Matrix of the new camera
+
+    Returns:
+        (new_color, new_depth); pixels that received nothing have depth inf
+    """
+    height, width = depth.shape
+    new_color = np.zeros_like(color)
+    new_depth = np.full((height, width), np.inf)
+
+    ys, xs = np.nonzero(np.isfinite(depth))
+    if len(xs) == 0:
+        return new_color, new_depth
+
+    world = unproject_pixels(xs, ys, depth[ys, xs], camera, mvp_matrix)
+    homogeneous = np.c_[world, np.ones(len(world))] @ np.asarray(new_mvp_matrix).T
+    w = homogeneous[:, 3]
+
+    # Same visibility rule as project_3d_to_2d_via_matrix
+    keep = np.abs(w) > 0.1
+    sx = homogeneous[keep, 0] / w[keep]
+    sy = homogeneous[keep, 1] / w[keep]
+    new_z = np.abs(w[keep])
+    src_x, src_y = xs[keep], ys[keep]
+
+    ix = sx.astype(np.int64)
+    iy = sy.astype(np.int64)
+    inside = (ix >= 0) & (ix < width) & (iy >= 0) & (iy < height)
+    ix, iy, new_z = ix[inside], iy[inside], new_z[inside]
+    src_x, src_y = src_x[inside], src_y[inside]
+
+    # Farthest first, so the nearest sample is written last and wins
+    order = np.argsort(-new_z, kind="stable")
+    ix, iy, new_z = ix[order], iy[order], new_z[order]
+    new_depth[iy, ix] = new_z
+    new_color[iy, ix] = color[src_y[order], src_x[order]]
+    return new_color, new_depth
+
+
+def background_pixels(background, camera, mvp_matrix, new_mvp_matrix, pixels):
+    """Which pixels of a new camera pose look at the previous frame's background
+
+    The background is infinitely far away, so only the direction of a ray
+    matters: each pixel's ray in the new view is projected with w = 0 into
+    the previous view (moving with the camera's rotation, not its
+    translation) and looks up the previous frame there.
+
+    Args:
+        background: (height, width) bool, empty pixels of the previous frame
+        camera, mvp_matrix: Camera and matrix the previous frame was made with
+        new_mvp_matrix: Matrix of the new camera
+        pixels: (height, width) bool, the new pixels to look up
+
+    Returns:
+        (height, width) bool, pixels whose ray hits the previous background
+    """
+    height, width = background.shape
+    found = np.zeros((height, width), dtype=bool)
+    ys, xs = np.nonzero(pixels)
+    if len(xs) == 0:
+        return found
+
+    # w grows by 1 along the rays; w has the same sign in front of every
+    # camera (negative with these matrices)
+    m = np.asarray(mvp_matrix, dtype=float)
+    forward = np.asarray(camera.target, dtype=float) - camera.position
+    w_sign = np.sign(m[3, :3] @ forward)
+    directions = w_sign * pixel_rays(xs, ys, new_mvp_matrix)
+    homogeneous = directions @ m[:, :3].T
+    w = homogeneous[:, 3]
+
+    # Only rays in front of the previous camera, to the nearest pixel
+    keep = np.sign(w) == w_sign
+    ix = np.rint(homogeneous[keep, 0] / w[keep]).astype(np.int64)
+    iy = np.rint(homogeneous[keep, 1] / w[keep]).astype(np.int64)
+    inside = (ix >= 0) & (ix < width) & (iy >= 0) & (iy < height)
+    hit = np.zeros(len(ix), dtype=bool)
+    hit[inside] = background[iy[inside], ix[inside]]
+    found[ys[keep], xs[keep]] = hit
+    return found
+
+
+def hole_tiles(depth, background, tile_size):
+    """Tiles (x0, y0, x1, y1) that contain pixels needing a real render
+
+    background marks pixels known to be empty (nothing to draw there), so
+    only holes outside it count. Runs of tiles in a row are merged, then
+    runs spanning the same columns in consecutive rows: unlike merging
+    bounding boxes, holes along two screen borders do not grow into a
+    rectangle covering the whole frame.
+    """
+    height, width = depth.shape
+    holes = ~np.isfinite(depth) & ~background
+    tiles = []
+    open_runs = {}  # (x0, x1) -> index in tiles of the run ending at this row
+    for y0 in range(0, height, tile_size):
+        y1 = min(y0 + tile_size, height)
+        runs = {}
+        x0 = None
+        for x in range(0, width + tile_size, tile_size):
+            hole = x < width and holes[y0:y1, x : x + tile_size].any()
+            if hole and x0 is None:
+                x0 = x
+            elif not hole and x0 is not None:
+                span = (x0, min(x, width))
+                if span in open_runs:
+                    i = open_runs[span]
+                    tiles[i] = (*tiles[i][:3], y1)
+                else:
+                    i = len(tiles)
+                    tiles.append((span[0], y0, span[1], y1))
+                runs[span] = i
+                x0 = None
+        open_runs = runs
+    return tiles
+
+
+class TemporalReprojector:
+    """Decides between full renders and reprojected frames, keeps the stats"""
+
+    def __init__(self, refresh_interval=8, tile_size=32):
+        """
+        Args:
+            refresh_interval: Reprojected frames between two full renders
+            tile_size: Holes are re-rendered in tiles of this many pixels
+        """
+        self.refresh_interval = refresh_interval
+        self.tile_size = tile_size
+        self.previous = None  # (color, depth, camera, mvp)
+        self.frames_since_full = 0
+
+        self.full_times = collections.deque(maxlen=30)
+        self.reprojected_times = collections.deque(maxlen=30)
+        self.tile_fractions = collections.deque(maxlen=30)
+        self.quality = None
+
+    def needs_full_frame(self, width, height):
+        """True when the next frame must be rendered from scratch"""
+        if self.previous is None or self.frames_since_full >= self.refresh_interval:
+            return True
+        # A resolution change invalidates the cached frame
+        return self.previous[1].shape != (height, width)
+
+    def reset(self):
+        self.previous = None
+
+    def store(self, color, depth, camera, mvp_matrix, seconds, full):
+        """Remember the finished frame and how long it took"""
+        self.previous = (color.copy(), depth.copy(), copy.deepcopy(camera), mvp_matrix)
+        if full:
+            self.frames_since_full = 0
+            self.full_times.append(seconds)
+        else:
+            self.frames_since_full += 1
+            self.reprojected_times.append(seconds)
+
+    def warp(self, new_mvp_matrix):
+        """Reproject the stored frame; returns (color, depth, tiles to render)"""
+        color, depth, camera, mvp_matrix = self.previous
+        new_color, new_depth = reproject(
+            color, depth, camera, mvp_matrix, new_mvp_matrix
+        )
+        fill_cracks(new_color, new_depth)
+
+        # Unreached pixels whose ray saw the background last frame are known
+        # to be empty (lines do not write depth, so only black pixels without
+        # depth count as background). Everything else unreached, like the
+        # screen borders and disocclusions, is a hole to render.
+        background = ~np.isfinite(depth) & ~color.any(axis=2)
+        empty = background_pixels(
+            background, camera, mvp_matrix, new_mvp_matrix, ~np.isfinite(new_depth)
+        )
+        tiles = hole_tiles(new_depth, empty, self.tile_size)
+        covered = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in tiles)
+        self.tile_fractions.append(covered / depth.size)
+        return new_color, new_depth, tiles
+
+    def get_stats(self):
+        full = np.mean(self.full_times) if self.full_times else 0.0
+        warped = np.mean(self.reprojected_times) if self.reprojected_times else 0.0
+        return {
+            "full_ms": full * 1000,
+            "reprojected_ms": warped * 1000,
+            "speedup": full / warped if warped else 0.0,
+            "rerendered_tile_fraction": (
+                float(np.mean(self.tile_fractions)) if self.tile_fractions else 0.0
+            ),
+            "quality": self.quality,
+        }
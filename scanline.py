@@ -0,0 +1,219 @@
+"""
+Fixed-point scanline rasterizer with the top-left fill rule.
+
+point_in_triangle divides floats for every pixel and accepts pixels exactly
+on an edge (>= 0), so a pixel on the edge shared by two triangles (all the
+diagonals and grid lines of the ground) is covered, interpolated and depth
+tested by both. This rasterizer instead:
+
+1. Snaps the vertices to integers with SUBPIXEL_BITS of subpixel precision
+   and sets up the three edge functions once per triangle, in integers
+2. Walks the rows, stepping each edge function by a constant from one row
+   to the next, and solves for the span of pixels where all three are
+   inside (no per-pixel test at all)
+3. Applies the top-left fill rule to pixels exactly on an edge: only a
+   triangle's top and left edges own them, so a pixel shared by two
+   triangles is drawn by exactly one of them
+4. Depth tests and fills each span with slice assignments
+
+Pixels are sampled at their integer coordinates, like the other
+rasterizers. Depth interpolation is the same plane, computed from the
+integer edge functions, so depths can differ from rasterize_triangle_with_depth
+in the last bits.
+"""
+
+import numpy as np
+
+import rasterization
+
+SUBPIXEL_BITS = 4
+SUBPIXEL = 1 << SUBPIXEL_BITS
+
+
+def _edge(a, b):
+    """Integer edge function a -> b: (x step, y step, value at the origin,
+    top-left bias)
+
+    E(x, y) = step_x * x + step_y * y + origin is positive on the inside of
+    a triangle wound so its area (see triangle_setup) is positive.
+    """
+    dx, dy = b[0] - a[0], b[1] - a[1]
+    step_x, step_y = -dy, dx
+    origin = dy * a[0] - dx * a[1]
+    # Left edge (inside is to its right) or top edge (horizontal, inside
+    # below): pixels exactly on it belong to this triangle
+    top_left = dy < 0 or (dy == 0 and dx > 0)
+    return step_x, step_y, origin, 0 if top_left else -1
+
+
+def triangle_setup(p1, p2, p3):
+    """Fixed-point edge functions of a triangle
+
+    Returns:
+        (edges, area, order) or None for a triangle with no area. edges
+        are _edge tuples for the edges opposite the vertices in order (two
+        vertices swapped when needed to make area positive) and area is
+        twice the triangle's area in subpixel units.
+    """
+    points = [(round(p[0] * SUBPIXEL), round(p[1] * SUBPIXEL)) for p in (p1, p2, p3)]
+    a, b, c = points
+    area = (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+    if area == 0:
+        return None
+    order = (0, 1, 2)
+    if area < 0:
+        b, c, area, order = c, b, -area, (0, 2, 1)
+    return (_edge(b, c), _edge(c, a), _edge(a, b)), area, order
+
+
+def triangle_spans(edges, min_x, max_x, min_y, max_y):
+    """Rows and inclusive pixel ranges covered by a triangle
+
+    Yields:
+        (y, x0, x1) for every row with at least one pixel
+    """
+    # Edge values at (min_x, min_y) and their steps per pixel and per row
+    values = [
+        step_x * min_x * SUBPIXEL + step_y * min_y * SUBPIXEL + origin
+        for step_x, step_y, origin, _ in edges
+    ]
+    pixel_steps = [step_x * SUBPIXEL for step_x, *_ in edges]
+    row_steps = [step_y * SUBPIXEL for _, step_y, *_ in edges]
+    biases = [bias for *_, bias in edges]
+    width = max_x - min_x
+
+    for y in range(min_y, max_y + 1):
+        lo, hi = 0, width
+        for value, step, bias in zip(values, pixel_steps, biases, strict=True):
+            # value + bias + step * k >= 0 for pixel min_x + k
+            value += bias
+            if step > 0:
+                lo = max(lo, -(value // step))
+            elif step < 0:
+                hi = min(hi, value // -step)
+            elif value < 0:
+                hi = -1
+        if lo <= hi:
+            yield y, min_x + lo, min_x + hi
+        for i, step in enumerate(row_steps):
+            values[i] += step
+
+
+def rasterize_triangle_scanline(renderer, p1, p2, p3, z1, z2, z3, color):
+    """Rasterize a triangle with z-buffering, span by span
+
+    Follows rasterization.depth_pass, clip_rect and the overdraw counter,
+    like rasterize_triangle_with_depth.
+
+    Args:
+        renderer: FrameBufferRenderer (spans written as slices) or any
+            renderer with draw_point
+        p1, p2, p3: 2D points as tuples (x, y)
+        z1, z2, z3: Depth values for each vertex
+        color: RGB color tuple (r, g, b)
+    """
+    setup = triangle_setup(p1, p2, p3)
+    min_x, max_x, min_y, max_y = rasterization.triangle_bounds(p1, p2, p3)
+    if setup is None or min_x > max_x or min_y > max_y:
+        return
+    edges, area, order = setup
+    # Depth plane: the edge functions are the unnormalized barycentrics
+    depths = [(z1, z2, z3)[i] / area for i in order]
+    corner_depth, step_x, step_y = 0.0, 0.0, 0.0
+    for (edge_x, edge_y, origin, _), depth in zip(edges, depths, strict=True):
+        corner_depth += (
+            edge_x * min_x * SUBPIXEL + edge_y * min_y * SUBPIXEL + origin
+        ) * depth
+        step_x += edge_x * SUBPIXEL * depth
+        step_y += edge_y * SUBPIXEL * depth
+    # Depth change from a span's first pixel to each of the following ones
+    ramp = step_x * np.arange(max_x - min_x + 1)
+
+    z_buffer = rasterization.z_buffer
+    overdraw = rasterization.overdraw
+    depth_pass = rasterization.depth_pass
+    pixels = getattr(renderer, "pixels", None)
+    color = tuple(color[:3])
+    if pixels is None:
+        renderer.color = (*color, 255)
+
+    for y, x0, x1 in triangle_spans(edges, min_x, max_x, min_y, max_y):
+        start = corner_depth + step_x * (x0 - min_x) + step_y * (y - min_y)
+        depth = ramp[: x1 - x0 + 1] + start
+        stored = z_buffer[y, x0 : x1 + 1]
+        if depth_pass == "equal":
+            passed = depth == stored
+            np.copyto(stored, np.nextafter(depth, -np.inf), where=passed)
+        else:
+            passed = depth < stored
+            np.copyto(stored, depth, where=passed)
+            if depth_pass == "prepass":
+                continue
+
+        if pixels is None:
+            for x in np.flatnonzero(passed):
+                renderer.draw_point((x0 + int(x), y))
+        elif passed.all():
+            pixels[y, x0 : x1 + 1] = color
+        else:
+            pixels[y, x0 : x1 + 1][passed] = color
+        if overdraw is not None:
+            overdraw[y, x0 : x1 + 1] += passed
+
+
+if __name__ == "__main__":
+    # The ground grid of the default view (512 triangles sharing edges):
+    # fragments covered by each coverage rule, how many pixels two triangles
+    # both cover, and the time of every z-buffered rasterizer
+    import time
+
+    import raster_kernels
+    from framebuffer import FrameBufferRenderer, init_frame_buffer
+    from main import benchmark_ground_view
+    from projection import project_points_via_matrix
+
+    width, height = 800, 600
+    camera, mvp, ground = benchmark_ground_view(width, height)
+    target = FrameBufferRenderer(init_frame_buffer(width, height))
+    rasterization.init_z_buffer(width, height)
+
+    p = project_points_via_matrix(ground.reshape(-1, 3), mvp)
+    triangles = [
+        (p[i][:2], p[i + 1][:2], p[i + 2][:2], p[i][2], p[i + 1][2], p[i + 2][2])
+        + ((60,) * 3,)
+        for i in range(0, len(p), 3)
+    ]
+
+    inclusive = np.zeros((height, width), dtype=np.int32)
+    top_left = np.zeros((height, width), dtype=np.int32)
+    for p1, p2, p3, *_ in triangles:
+        min_x, max_x, min_y, max_y = rasterization.triangle_bounds(p1, p2, p3)
+        for y in range(min_y, max_y + 1):
+            for x in range(min_x, max_x + 1):
+                inclusive[y, x] += rasterization.point_in_triangle(x, y, p1, p2, p3)
+        setup = triangle_setup(p1, p2, p3)
+        if setup is not None:
+            for y, x0, x1 in triangle_spans(setup[0], min_x, max_x, min_y, max_y):
+                top_left[y, x0 : x1 + 1] += 1
+    for name, counts in (("inclusive (>= 0)", inclusive), ("top-left", top_left)):
+        print(  # noqa: T201
+            f"{name:16s}: {counts.sum():7d} fragments depth tested, "
+            f"{np.count_nonzero(counts > 1):5d} pixels covered twice or more"
+        )
+
+    frames = {}
+    for name in raster_kernels.BACKENDS:
+        raster_kernels.warm_up(name)
+        best = float("inf")
+        for _ in range(1 if name == "python" else 5):
+            rasterization.init_z_buffer(width, height)
+            target.pixels[:] = 0
+            start = time.perf_counter()
+            raster_kernels.rasterize_triangles(target, triangles, name)
+            best = min(best, time.perf_counter() - start)
+        frames[name] = target.pixels.copy()
+        differing = np.count_nonzero(np.any(frames[name] != frames["python"], axis=2))
+        print(  # noqa: T201
+            f"{len(triangles)} triangles, {name:8s}: {best * 1000:8.2f} ms "
+            f"({differing} pixels differ from python)"
+        )
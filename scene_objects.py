@@ -0,0 +1,182 @@
+"""
+Typed scene object records and the draw dispatch table.
+
+Scene objects used to be dicts dispatched through an if/elif chain on
+obj["type"], with every draw function re-tinting each triangle color every
+frame. Here:
+
+- Each object kind is a slotted dataclass (attribute access, no per-object
+  __dict__, typos in field names fail loudly)
+- Drawing goes through SCENE_TYPES, a registry kind -> draw function,
+  filled with the @scene_type decorator next to each draw function
+- The tinted triangle colors of an object are computed once into
+  obj.palette (shared between objects with the same kind and color), and
+  again only when obj.color changes
+"""
+
+import functools
+from dataclasses import dataclass, field
+from typing import ClassVar
+
+DARK_GRAY_COLOR = (60, 60, 60)  # Ground plane (default GroundPlane color)
+
+# kind -> (draw function, base triangle colors)
+SCENE_TYPES = {}
+
+
+def apply_color_tint(base_color, tint, intensity=0.3):
+    """Apply a color tint to a base color"""
+    r = int(base_color[0] * (1 - intensity) + tint[0] * intensity)
+    g = int(base_color[1] * (1 - intensity) + tint[1] * intensity)
+    b = int(base_color[2] * (1 - intensity) + tint[2] * intensity)
+    return (min(255, r), min(255, g), min(255, b))
+
+
+@functools.lru_cache(maxsize=256)
+def tint_palette(base_colors, tint):
+    """Tinted version of every base color (cached per colors/tint pair)"""
+    return tuple(apply_color_tint(color, tint) for color in base_colors)
+
+
+def scene_type(kind, base_colors=()):
+    """Decorator registering the draw function for an object kind
+
+    Args:
+        kind: Value of the object's kind
+        base_colors: Colors of the kind's triangles, tinted into palettes
+    """
+
+    def register(draw):
+        SCENE_TYPES[kind] = (draw, tuple(base_colors))
+        return draw
+
+    return register
+
+
+def object_palette(obj):
+    """Tinted triangle colors of obj, cached in obj.palette for its color"""
+    color = tuple(obj.color)
+    if obj.palette is None or obj.palette[0] != color:
+        obj.palette = (color, tint_palette(SCENE_TYPES[obj.kind][1], color))
+    return obj.palette[1]
+
+
+def draw_scene_object(renderer, obj, camera):
+    """Draw one object through the registered function for its kind"""
+    SCENE_TYPES[obj.kind][0](renderer, obj, camera)
+
+
+@dataclass(slots=True)
+class SceneObject:
+    name: str
+    pos: list = field(default_factory=lambda: [0, 0, 0])
+    color: tuple = (255, 255, 255)
+    # (color, tinted triangle colors) cached by object_palette, None until
+    # computed; a changed color is noticed there
+    palette: tuple = field(default=None, repr=False, compare=False)
+
+    kind: ClassVar[str] = ""
+
+    def set_color(self, color):
+        self.color = color
+        self.palette = None
+
+
+@dataclass(slots=True)
+class GroundPlane(SceneObject):
+    size: int = 400
+    spacing: int = 50
+    color: tuple = DARK_GRAY_COLOR
+
+    kind: ClassVar[str] = "ground_plane"
+
+
+@dataclass(slots=True)
+class VerticalPlane(SceneObject):
+    size: int = 100
+
+    kind: ClassVar[str] = "vertical_plane"
+
+
+@dataclass(slots=True)
+class Cube(SceneObject):
+    scale: int = 50
+
+    kind: ClassVar[str] = "cube"
+
+
+@dataclass(slots=True)
+class Axes(SceneObject):
+    kind: ClassVar[str] = "axes"
+
+
+@dataclass(slots=True)
+class MeshModel(SceneObject):
+    """A model loaded from an OBJ or PLY file (see mesh_loader)"""
+
+    path: str = ""
+    scale: float = 1.0
+
+    kind: ClassVar[str] = "mesh"
+
+
+if __name__ == "__main__":
+    # Per-object overhead of dispatching and coloring 10,000 cubes (the
+    # drawing itself is replaced by collecting the triangle colors)
+    import random
+    import time
+
+    cube_colors = [(255, 100, 100)] * 2 + [(100, 100, 255)] * 2 + [(255, 255, 100)] * 2
+    cube_colors += [(100, 255, 100)] * 2 + [(255, 100, 255)] * 2
+    cube_colors += [(100, 255, 255)] * 2
+    tints = [(255, 255, 255), (255, 200, 200), (200, 255, 200)]
+    random.seed(0)
+    count = 10_000
+
+    def old_draw_cube(sink, obj_data):
+        for color in cube_colors:
+            sink.append(apply_color_tint(color, obj_data["color"]))
+
+    def old_render(sink, objects):
+        for obj in objects:
+            if obj["type"] == "ground_plane":
+                pass
+            elif obj["type"] == "axes":
+                pass
+            elif obj["type"] == "cube":
+                old_draw_cube(sink, obj)
+            elif obj["type"] == "vertical_plane":
+                pass
+
+    @scene_type("cube", cube_colors)
+    def new_draw_cube(sink, obj, camera):
+        for color in object_palette(obj):
+            sink.append(color)
+
+    def new_render(sink, objects):
+        for obj in objects:
+            draw_scene_object(sink, obj, None)
+
+    positions = [[random.uniform(-500, 500) for _ in range(3)] for _ in range(count)]
+    colors = [random.choice(tints) for _ in range(count)]
+    dicts = [
+        {"type": "cube", "name": f"c{i}", "pos": p, "scale": 5, "color": c}
+        for i, (p, c) in enumerate(zip(positions, colors, strict=True))
+    ]
+    records = [
+        Cube(f"c{i}", p, c, scale=5)
+        for i, (p, c) in enumerate(zip(positions, colors, strict=True))
+    ]
+
+    for name, render, objects in (
+        ("dicts + if/elif + tint per triangle", old_render, dicts),
+        ("slotted records + registry + palette", new_render, records),
+    ):
+        sink = []
+        render(sink, objects)  # Warm up (and fill the palettes)
+        start = time.perf_counter()
+        for _ in range(10):
+            sink.clear()
+            render(sink, objects)
+        per_object = (time.perf_counter() - start) / 10 / count
+        print(f"{name:38s} {per_object * 1e6:6.2f} us per object")  # noqa: T201
@@ -0,0 +1,229 @@
+"""
+Shared-memory frame and depth buffers for multi-process rasterization.
+
+Sending full frames between processes means pickling megabytes every frame.
+Instead, the parent allocates the color and depth buffers once in a
+multiprocessing.shared_memory segment, and worker processes attach to the
+same memory and rasterize straight into it. The parent presents or encodes
+the frame without any copy.
+
+Ownership rules:
+- The parent creates the segment and is the only one that unlinks it
+  (explicitly with close(), or via a finalizer at exit / on errors)
+- Workers attach with track=False, so a worker that exits or crashes never
+  removes the segment or leaves resource-tracker state behind
+- The screen is split into horizontal bands, one task per band, so two
+  workers never touch the same pixel of the depth buffer
+"""
+
+import logging
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import rasterization
+from framebuffer import FrameBufferRenderer
+
+DEPTH_DTYPE = np.float64
+COLOR_DTYPE = np.uint8
+
+
+def _segment_size(width, height):
+    depth_bytes = width * height * np.dtype(DEPTH_DTYPE).itemsize
+    color_bytes = width * height * 3 * np.dtype(COLOR_DTYPE).itemsize
+    return depth_bytes, depth_bytes + color_bytes
+
+
+def _release_segment(shm, owner):
+    """Finalizer: unmap the segment and, if we own it, remove it"""
+    try:
+        shm.close()
+    except BufferError:
+        # Someone still holds a view (e.g. the global z-buffer); the mapping
+        # goes away with the process, unlinking below is what matters.
+        pass
+    if owner:
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class SharedFrameBuffers:
+    """Color (height, width, 3) and depth (height, width) arrays in shared memory"""
+
+    def __init__(self, shm, width, height, owner):
+        self.shm = shm
+        self.width = width
+        self.height = height
+        self.owner = owner
+
+        depth_bytes, _ = _segment_size(width, height)
+        self.depth = np.ndarray((height, width), dtype=DEPTH_DTYPE, buffer=shm.buf)
+        self.color = np.ndarray(
+            (height, width, 3), dtype=COLOR_DTYPE, buffer=shm.buf, offset=depth_bytes
+        )
+        self._finalizer = weakref.finalize(self, _release_segment, shm, owner)
+
+    @classmethod
+    def create(cls, width, height):
+        """Allocate a new segment (parent side)"""
+        _, total_bytes = _segment_size(width, height)
+        shm = shared_memory.SharedMemory(create=True, size=total_bytes)
+        buffers = cls(shm, width, height, owner=True)
+        buffers.color.fill(0)
+        buffers.depth.fill(float("inf"))
+        return buffers
+
+    @classmethod
+    def attach(cls, name, width, height):
+        """Attach to an existing segment by name (worker side)"""
+        shm = shared_memory.SharedMemory(name=name, track=False)
+        return cls(shm, width, height, owner=False)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self):
+        """Drop our views and release the segment (unlinks it if we own it)"""
+        self.depth = None
+        self.color = None
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+# Per-process state for workers: attached once by the pool initializer
+_worker_buffers = None
+
+
+def _attach_worker(name, width, height):
+    global _worker_buffers
+    _worker_buffers = SharedFrameBuffers.attach(name, width, height)
+
+
+def rasterize_band(color, depth, y0, y1, triangles, depth_pass="less"):
+    """Rasterize triangles into rows [y0, y1) of the given buffers
+
+    Works on views of the band, so coordinates are shifted by y0 and the
+    rasterizer's bounding-box clipping keeps every write inside the band.
+    Overdraw is not counted here (the counter is not in shared memory).
+
+    Args:
+        color, depth: Full-frame color and depth arrays
+        y0, y1: Row range owned by this call
+        triangles: List of (p1, p2, p3, z1, z2, z3, color) in screen space
+        depth_pass: rasterization.set_depth_pass mode to draw with
+    """
+    previous_z_buffer = rasterization.z_buffer
+    previous_depth_pass = rasterization.depth_pass
+    previous_overdraw = rasterization.overdraw
+    rasterization.set_z_buffer(depth[y0:y1])
+    rasterization.set_depth_pass(depth_pass)
+    rasterization.set_overdraw(None)
+    target = FrameBufferRenderer(color[y0:y1])
+
+    try:
+        for p1, p2, p3, z1, z2, z3, tri_color in triangles:
+            if max(p1[1], p2[1], p3[1]) < y0 or min(p1[1], p2[1], p3[1]) >= y1:
+                continue
+            rasterization.rasterize_triangle_with_depth(
+                target,
+                (p1[0], p1[1] - y0),
+                (p2[0], p2[1] - y0),
+                (p3[0], p3[1] - y0),
+                z1,
+                z2,
+                z3,
+                tri_color,
+            )
+    finally:
+        rasterization.set_z_buffer(previous_z_buffer)
+        rasterization.set_depth_pass(previous_depth_pass)
+        rasterization.set_overdraw(previous_overdraw)
+
+
+def _rasterize_band_task(y0, y1, triangles, depth_pass):
+    rasterize_band(
+        _worker_buffers.color, _worker_buffers.depth, y0, y1, triangles, depth_pass
+    )
+    return y0, y1
+
+
+class RasterWorkerPool:
+    """Pool of processes rasterizing into a SharedFrameBuffers instance"""
+
+    def __init__(self, buffers, num_workers=4):
+        self.buffers = buffers
+        self.num_workers = num_workers
+        edges = np.linspace(0, buffers.height, num_workers + 1).astype(int)
+        self.bands = list(zip(edges[:-1], edges[1:], strict=True))
+        self.restarts = 0
+        self._executor = None
+        self._start()
+
+    def _start(self):
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            initializer=_attach_worker,
+            initargs=(self.buffers.name, self.buffers.width, self.buffers.height),
+        )
+
+    def rasterize(self, triangles):
+        """Rasterize one batch of triangles, one band per worker
+
+        If a worker dies, the pool is restarted and the unfinished bands are
+        rasterized in this process, so the frame is still complete. Workers
+        use this process's current rasterization.depth_pass.
+        """
+        if not triangles:
+            return
+        depth_pass = rasterization.depth_pass
+        futures = [
+            self._executor.submit(
+                _rasterize_band_task, int(y0), int(y1), triangles, depth_pass
+            )
+            for y0, y1 in self.bands
+        ]
+
+        lost_bands = []
+        for band, future in zip(self.bands, futures, strict=True):
+            try:
+                future.result()
+            except BrokenProcessPool:
+                lost_bands.append(band)
+
+        if lost_bands:
+            logging.warning(
+                "Raster worker died, restarting pool (%d bands redone locally)",
+                len(lost_bands),
+            )
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self.restarts += 1
+            self._start()
+            for y0, y1 in lost_bands:
+                rasterize_band(
+                    self.buffers.color,
+                    self.buffers.depth,
+                    int(y0),
+                    int(y1),
+                    triangles,
+                    depth_pass,
+                )
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,149 @@
+"""
+Startup benchmark: cold import time and time to first frame.
+
+Every measurement runs in a fresh interpreter, so nothing is already in
+sys.modules:
+
+- Cold import of the core modules and of main, from python -X importtime,
+  along with whether SDL got loaded on the way
+- Time to first frame, windowed: import main, initialize SDL and create the
+  window, render one frame and present it
+- Time to first frame, headless: import main and render one frame into a
+  FrameBufferRenderer, without ever initializing SDL
+
+Without a display the windowed run uses SDL's dummy video driver.
+
+Usage: python startup_benchmark.py [runs]
+"""
+
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+
+CORE_MODULES = ["projection", "rasterization", "framebuffer", "shared_buffers"]
+
+
+def import_time(module):
+    """Cold import of module in a new interpreter
+
+    Returns:
+        (cumulative import time in ms, whether any sdl2 module was imported)
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    cumulative = 0.0
+    loads_sdl = False
+    # Lines look like "import time:   self [us] | cumulative | imported package"
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, total, name = line.split("|")
+        name = name.strip()
+        loads_sdl |= name.split(".")[0] == "sdl2"
+        if name == module:
+            cumulative = int(total) / 1000
+    return cumulative, loads_sdl
+
+
+def first_frame(mode):
+    """Render one frame the way main() does and time each phase (child process)
+
+    Returns:
+        Dict of phase timings in ms since this function was called, and
+        whether SDL ended up initialized
+    """
+    start = time.perf_counter()
+    marks = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        import main as app
+
+        marks["import"] = time.perf_counter()
+        if mode == "windowed":
+            _, renderer, width, height = app.setup_display_and_renderer()
+            frame_output = app.setup_frame_output(renderer, width, height)
+        else:
+            frame_output = {"texture": None}
+            pixels = app.init_frame_buffer(app.WIDTH, app.HEIGHT)
+            app.init_z_buffer(app.WIDTH, app.HEIGHT)
+            frame_output["target"] = app.FrameBufferRenderer(pixels)
+        marks["output"] = time.perf_counter()
+
+        scene_objects = app.create_scene_objects()
+        camera, _ = app.setup_camera_and_projection()
+        target = frame_output["target"]
+        app.render_cpu_frame(target, camera, scene_objects)
+        if frame_output["texture"] is not None:
+            app.present_frame_buffer(renderer, frame_output["texture"], target.pixels)
+        marks["first_frame"] = time.perf_counter()
+
+        sdl_initialized = "sdl2" in sys.modules and bool(
+            sys.modules["sdl2"].SDL_WasInit(0)
+        )
+        if mode == "windowed":
+            app.cleanup(frame_output)
+
+    timings = {name: (mark - start) * 1000 for name, mark in marks.items()}
+    timings["sdl_initialized"] = sdl_initialized
+    return timings
+
+
+def run_first_frame(mode):
+    """Run first_frame(mode) in a new interpreter
+
+    Returns:
+        The child's phase timings plus "process": wall time in ms from
+        launching the interpreter to the child exiting
+    """
+    env = dict(os.environ)
+    if mode == "windowed" and not (env.get("DISPLAY") or env.get("WAYLAND_DISPLAY")):
+        env.setdefault("SDL_VIDEODRIVER", "dummy")
+        env.setdefault("SDL_RENDER_DRIVER", "software")
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--first-frame", mode],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=env,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    timings = json.loads(result.stdout.splitlines()[-1])
+    timings["process"] = (time.perf_counter() - start) * 1000
+    return timings
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--first-frame"]:
+        print(json.dumps(first_frame(sys.argv[2])))  # noqa: T201
+        sys.exit()
+
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    print(f"Cold import (best of {runs}, python -X importtime):")  # noqa: T201
+    for module in CORE_MODULES + ["main"]:
+        results = [import_time(module) for _ in range(runs)]
+        best = min(total for total, _ in results)
+        sdl = "loads SDL" if results[0][1] else "no SDL"
+        print(f"  {module:16s} {best:7.1f} ms  ({sdl})")  # noqa: T201
+
+    print(  # noqa: T201
+        f"Time to first frame (best of {runs}, ms from interpreter start):"
+    )
+    for mode in ("windowed", "headless"):
+        results = [run_first_frame(mode) for _ in range(runs)]
+        best = min(results, key=lambda timings: timings["first_frame"])
+        print(  # noqa: T201
+            f"  {mode:9s} import {best['import']:6.1f}, "
+            f"output ready {best['output']:6.1f}, "
+            f"first frame {best['first_frame']:7.1f}, "
+            f"whole process {best['process']:7.1f}  "
+            f"(SDL initialized: {best['sdl_initialized']})"
+        )
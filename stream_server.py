@@ -0,0 +1,353 @@
+"""
+Stream rendered frames to remote viewers over a local socket.
+
+The render boxes are headless, so instead of exporting files we serve the
+latest frame with asyncio from a background thread:
+
+- "mjpeg": HTTP multipart/x-mixed-replace stream, open it in a browser
+  (JPEG needs Pillow; without it the parts are PNG, which browsers also show)
+- "raw": length-prefixed RGB24 frames (see RAW_HEADER), for tools and tests
+
+Design:
+- publish() is the only call made from the render loop: it copies the frame
+  and wakes the server. Encoding runs in a thread pool, once per frame,
+  shared by every client.
+- Clients never queue frames. Each one waits for a version newer than the
+  last it sent, so a slow client simply skips to the newest frame.
+- Per-client stats: frames sent/skipped, throughput and latency (time from
+  publish() to the frame being flushed to the socket).
+"""
+
+import asyncio
+import collections
+import contextlib
+import io
+import logging
+import os
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from recorder import encode_png
+
+try:
+    from PIL import Image
+except ImportError:  # Optional: MJPEG falls back to PNG parts
+    Image = None
+
+FORMATS = ("mjpeg", "raw")
+
+# magic, width, height, frame version, publish time, payload length
+RAW_HEADER = struct.Struct("<4sIIQdI")
+RAW_MAGIC = b"RGB8"
+
+BOUNDARY = b"frame"
+
+
+class ClientStats:
+    """Counters for one connected viewer"""
+
+    def __init__(self, peer):
+        self.peer = peer
+        self.connected_at = time.perf_counter()
+        self.disconnected_at = None
+        self.frames_sent = 0
+        self.frames_skipped = 0
+        self.bytes_sent = 0
+        self.total_latency = 0.0
+        self.last_latency = 0.0
+
+    def as_dict(self):
+        # Rates of a disconnected client stop at the disconnection
+        end = self.disconnected_at or time.perf_counter()
+        elapsed = max(end - self.connected_at, 1e-9)
+        sent = max(self.frames_sent, 1)
+        return {
+            "peer": self.peer,
+            "frames_sent": self.frames_sent,
+            "frames_skipped": self.frames_skipped,
+            "fps": self.frames_sent / elapsed,
+            "mbit_per_s": self.bytes_sent * 8 / elapsed / 1e6,
+            "avg_latency_ms": self.total_latency / sent * 1000,
+            "last_latency_ms": self.last_latency * 1000,
+        }
+
+
+class FrameStreamServer:
+    """Serve the newest published frame to any number of clients"""
+
+    def __init__(self, host="127.0.0.1", port=8765, unix_path=None, fmt="mjpeg"):
+        """
+        Args:
+            host, port: TCP address (use port=0 to pick a free port)
+            unix_path: Serve on this UNIX socket instead of TCP
+            fmt: One of FORMATS
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown stream format {fmt!r}, expected {FORMATS}")
+        self.host = host
+        self.port = port
+        self.unix_path = unix_path
+        self.fmt = fmt
+        self.address = None
+
+        # Latest raw frame, written by the render thread
+        self._lock = threading.Lock()
+        self._latest = None  # (version, publish_time, pixels)
+        self._version = 0
+
+        # Loop-side state, created in the server thread
+        self._loop = None
+        self._published = None
+        self._encoded_ready = None
+        self._encoded = None  # (version, publish_time, payload, shape)
+        self._stop = None
+        self._clients = {}
+        self._disconnected = collections.deque(maxlen=32)
+        self._client_tasks = set()
+
+        self._encoder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="encode")
+        self._thread = None
+        self._started = threading.Event()
+        self._start_error = None
+
+    # --- Render thread side -------------------------------------------------
+
+    def start(self):
+        """Start the server thread and wait until it is listening"""
+        self._thread = threading.Thread(
+            target=self._run, name="frame-stream", daemon=True
+        )
+        self._thread.start()
+        self._started.wait()
+        if self._start_error is not None:
+            raise self._start_error
+        return self.address
+
+    def publish(self, pixels):
+        """Make a copy of the frame available to the clients (non-blocking)"""
+        frame = np.array(pixels, copy=True)
+        with self._lock:
+            self._version += 1
+            self._latest = (self._version, time.perf_counter(), frame)
+        self._wake(self._published)
+
+    def get_client_stats(self, include_disconnected=False):
+        """Snapshot of per-client throughput and latency"""
+        clients = list(self._clients.values())
+        if include_disconnected:
+            clients = list(self._disconnected) + clients
+        return [stats.as_dict() for stats in clients]
+
+    def _wake(self, event):
+        """Set an event of the server loop, unless the server has stopped"""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        with contextlib.suppress(RuntimeError):  # Closed after the check
+            loop.call_soon_threadsafe(event.set)
+
+    def stop(self):
+        """Disconnect every client and stop the server thread"""
+        self._wake(self._stop)
+        if self._thread is not None:
+            self._thread.join()
+        self._encoder.shutdown(wait=True)
+
+    # --- Server thread side -------------------------------------------------
+
+    def _run(self):
+        try:
+            asyncio.run(self._serve())
+        except Exception as e:
+            if not self._started.is_set():
+                self._start_error = e
+                self._started.set()
+            else:
+                logging.exception("Frame stream server crashed")
+        finally:
+            # publish() and stop() become no-ops once the loop is gone
+            self._loop = None
+            if self.unix_path is not None and self._started.is_set():
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(self.unix_path)
+
+    async def _serve(self):
+        self._published = asyncio.Event()
+        self._encoded_ready = asyncio.Condition()
+        self._stop = asyncio.Event()
+
+        if self.unix_path is not None:
+            server = await asyncio.start_unix_server(
+                self._handle_client, path=self.unix_path
+            )
+            self.address = self.unix_path
+        else:
+            server = await asyncio.start_server(
+                self._handle_client, self.host, self.port
+            )
+            self.address = server.sockets[0].getsockname()[:2]
+
+        encoder_task = asyncio.create_task(self._encoder_loop())
+        self._loop = asyncio.get_running_loop()
+        self._started.set()
+
+        await self._stop.wait()
+
+        server.close()
+        encoder_task.cancel()
+        for task in list(self._client_tasks):
+            task.cancel()
+        await asyncio.gather(encoder_task, *self._client_tasks, return_exceptions=True)
+        await server.wait_closed()
+
+    def _encode(self, pixels):
+        if self.fmt == "raw":
+            return pixels.tobytes(), None
+        if Image is not None:
+            out = io.BytesIO()
+            Image.fromarray(pixels).save(out, format="JPEG", quality=80)
+            return out.getvalue(), b"image/jpeg"
+        return encode_png(pixels), b"image/png"
+
+    async def _encoder_loop(self):
+        """Encode the newest frame each time the render loop publishes one"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._published.wait()
+            self._published.clear()
+            with self._lock:
+                version, publish_time, pixels = self._latest
+            payload = await loop.run_in_executor(self._encoder, self._encode, pixels)
+            async with self._encoded_ready:
+                self._encoded = (version, publish_time, payload, pixels.shape)
+                self._encoded_ready.notify_all()
+
+    async def _handle_client(self, reader, writer):
+        task = asyncio.current_task()
+        self._client_tasks.add(task)
+        peer = writer.get_extra_info("peername") or "unix"
+        stats = ClientStats(peer)
+        self._clients[id(writer)] = stats
+        logging.info("Stream client connected: %s", peer)
+
+        try:
+            if self.fmt == "mjpeg":
+                # Read (and ignore) the HTTP request before starting the stream
+                await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=5)
+                writer.write(
+                    b"HTTP/1.0 200 OK\r\n"
+                    b"Cache-Control: no-cache\r\n"
+                    b"Content-Type: multipart/x-mixed-replace; boundary="
+                    + BOUNDARY
+                    + b"\r\n\r\n"
+                )
+
+            last_version = 0
+            while True:
+                async with self._encoded_ready:
+                    await self._encoded_ready.wait_for(
+                        lambda last=last_version: self._encoded is not None
+                        and self._encoded[0] > last
+                    )
+                    version, publish_time, (payload, mime), shape = self._encoded
+
+                if last_version:
+                    stats.frames_skipped += version - last_version - 1
+                last_version = version
+
+                if self.fmt == "raw":
+                    header = RAW_HEADER.pack(
+                        RAW_MAGIC,
+                        shape[1],
+                        shape[0],
+                        version,
+                        publish_time,
+                        len(payload),
+                    )
+                else:
+                    header = (
+                        b"--" + BOUNDARY + b"\r\n"
+                        b"Content-Type: " + mime + b"\r\n"
+                        b"Content-Length: " + str(len(payload)).encode() + b"\r\n\r\n"
+                    )
+                writer.write(header)
+                writer.write(payload)
+                if self.fmt == "mjpeg":
+                    writer.write(b"\r\n")
+                await writer.drain()
+
+                latency = time.perf_counter() - publish_time
+                stats.frames_sent += 1
+                stats.bytes_sent += len(header) + len(payload)
+                stats.last_latency = latency
+                stats.total_latency += latency
+        except (
+            ConnectionError,
+            asyncio.IncompleteReadError,
+            asyncio.LimitOverrunError,
+            TimeoutError,
+            ValueError,
+        ):
+            # Disconnects, and oversized or malformed requests: close quietly
+            pass
+        finally:
+            logging.info("Stream client disconnected: %s", peer)
+            stats.disconnected_at = time.perf_counter()
+            self._clients.pop(id(writer), None)
+            self._disconnected.append(stats)
+            self._client_tasks.discard(task)
+            writer.close()
+
+
+async def read_raw_frames(count, host="127.0.0.1", port=8765, unix_path=None):
+    """Minimal "raw" client: read `count` frames as (version, pixels) pairs"""
+    if unix_path is not None:
+        reader, writer = await asyncio.open_unix_connection(unix_path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+
+    frames = []
+    try:
+        for _ in range(count):
+            header = await reader.readexactly(RAW_HEADER.size)
+            magic, width, height, version, _, length = RAW_HEADER.unpack(header)
+            if magic != RAW_MAGIC:
+                raise ValueError(f"Unexpected frame header {magic!r}")
+            payload = await reader.readexactly(length)
+            pixels = np.frombuffer(payload, dtype=np.uint8).reshape(height, width, 3)
+            frames.append((version, pixels))
+    finally:
+        writer.close()
+        await writer.wait_closed()
+    return frames
+
+
+if __name__ == "__main__":
+    # Self-check: publish synthetic frames and read them back with a local client
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    server = FrameStreamServer(port=0, fmt="raw")
+    host, port = server.start()
+
+    def render_loop():
+        frame = np.zeros((120, 160, 3), dtype=np.uint8)
+        for i in range(200):
+            frame[:] = i % 256
+            server.publish(frame)
+            time.sleep(0.005)
+
+    producer = threading.Thread(target=render_loop)
+    producer.start()
+    frames = asyncio.run(read_raw_frames(20, host, port))
+    producer.join()
+
+    versions = [version for version, _ in frames]
+    print(  # noqa: T201
+        f"Received {len(frames)} frames, versions {versions[0]}..{versions[-1]}"
+    )
+    for stats in server.get_client_stats(include_disconnected=True):
+        print(stats)  # noqa: T201
+    server.stop()
@@ -0,0 +1,222 @@
+"""
+Streaming ground terrain: tiles generated around the camera, kept in an LRU cache.
+
+Instead of one fixed square, the ground is an endless grid of square tiles.
+Every frame the tiles within view_radius tiles of the camera are needed:
+
+1. A needed tile is looked up in the cache (hit) or built now (miss)
+2. Its LOD level and border stitching come from ground_lod, so a tile mesh
+   is identified by (i, j, level, snaps) and rebuilt when those change
+3. Used tiles move to the end of the LRU order; once the cache holds more
+   than capacity meshes the least recently used ones (tiles the camera
+   left behind) are evicted, so memory stays flat however far it travels
+
+With background=True a worker thread also builds the ring of tiles just
+outside the view radius, so they are usually ready when the camera gets
+there.
+"""
+
+import collections
+import concurrent.futures
+import logging
+import math
+import threading
+import time
+
+from ground_lod import build_tile_lines, build_tile_triangles, lod_level
+
+
+class TerrainTileCache:
+    """Bounded LRU cache of ground tile meshes around the camera"""
+
+    def __init__(
+        self,
+        tile_size=200,
+        spacing=50,
+        view_radius=2,
+        lod_distance=400,
+        capacity=64,
+        background=False,
+    ):
+        """
+        Args:
+            tile_size: Side of a tile in world units (a multiple of spacing)
+            spacing: Cell size at the finest LOD level
+            view_radius: Tiles drawn in each direction from the camera's tile
+            lod_distance: Tiles closer than this use the finest level
+            capacity: Maximum number of tile meshes kept (raised to fit the
+                visible tiles plus the prefetch ring)
+            background: Prefetch the next ring of tiles on a worker thread
+        """
+        if tile_size % spacing:
+            raise ValueError("tile_size must be a multiple of spacing")
+        self.tile_size = tile_size
+        self.spacing = spacing
+        self.view_radius = view_radius
+        self.lod_distance = lod_distance
+        self.max_level = int(math.log2(tile_size // spacing))
+        self.capacity = max(capacity, (2 * view_radius + 3) ** 2)
+
+        self._tiles = collections.OrderedDict()  # key -> (triangles, lines)
+        self._lock = threading.Lock()
+        self._pending = {}  # key -> Future of a background build
+        self._executor = None
+        if background:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="terrain"
+            )
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.generation_times = collections.deque(maxlen=200)
+
+    def camera_tile(self, camera_position):
+        return (
+            math.floor(camera_position[0] / self.tile_size),
+            math.floor(camera_position[2] / self.tile_size),
+        )
+
+    def tile_level(self, i, j, camera_position):
+        half = self.tile_size / 2
+        center = (i * self.tile_size + half, 0, j * self.tile_size + half)
+        distance = math.dist(camera_position, center)
+        return lod_level(distance, self.lod_distance, self.max_level)
+
+    def tile_key(self, i, j, camera_position):
+        """(i, j, level, snaps) identifying the mesh tile (i, j) needs now"""
+        level = self.tile_level(i, j, camera_position)
+        snaps = tuple(
+            2 ** max(0, self.tile_level(ni, nj, camera_position) - level)
+            for ni, nj in ((i - 1, j), (i + 1, j), (i, j - 1), (i, j + 1))
+        )
+        return (i, j, level, snaps)
+
+    def build_tile(self, key, color):
+        """Create the triangles and grid lines of one tile"""
+        start = time.perf_counter()
+        i, j, level, snaps = key
+        x0, z0 = i * self.tile_size, j * self.tile_size
+        step = self.spacing * 2**level
+        mesh = (
+            build_tile_triangles(x0, z0, self.tile_size, step, snaps, color),
+            build_tile_lines(x0, z0, self.tile_size, step),
+        )
+        self.generation_times.append(time.perf_counter() - start)
+        return mesh
+
+    def _store(self, key, mesh):
+        with self._lock:
+            self._tiles[key] = mesh
+            self._tiles.move_to_end(key)
+            while len(self._tiles) > self.capacity:
+                self._tiles.popitem(last=False)
+                self.evictions += 1
+
+    def _lookup(self, key, color):
+        with self._lock:
+            mesh = self._tiles.get(key)
+            if mesh is not None:
+                self._tiles.move_to_end(key)
+                self.hits += 1
+                return mesh
+            future = self._pending.pop(key, None)
+
+        mesh = None
+        if future is not None:
+            # Prefetch was started but has not landed yet: wait for it
+            try:
+                mesh = future.result()
+            except Exception:
+                logging.exception("Terrain tile %s prefetch failed, rebuilding", key)
+        hit = mesh is not None
+        if not hit:
+            mesh = self.build_tile(key, color)
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        self._store(key, mesh)
+        return mesh
+
+    def _prefetch(self, key, color):
+        with self._lock:
+            if key in self._tiles or key in self._pending:
+                return
+            future = self._executor.submit(self.build_tile, key, color)
+            self._pending[key] = future
+
+        def done(future):
+            with self._lock:
+                # Only store it if nobody took it over in _lookup
+                if self._pending.get(key) is not future:
+                    return
+                del self._pending[key]
+            if future.cancelled():  # close() dropped it
+                return
+            if future.exception() is not None:
+                logging.error("Terrain tile %s failed: %s", key, future.exception())
+                return
+            self._store(key, future.result())
+
+        future.add_done_callback(done)
+
+    def visible_tiles(self, camera_position, color):
+        """(triangles, lines) meshes of every tile around the camera"""
+        ci, cj = self.camera_tile(camera_position)
+        r = self.view_radius
+        meshes = [
+            self._lookup(self.tile_key(i, j, camera_position), color)
+            for i in range(ci - r, ci + r + 1)
+            for j in range(cj - r, cj + r + 1)
+        ]
+
+        if self._executor is not None:
+            for i in range(ci - r - 1, ci + r + 2):
+                for j in range(cj - r - 1, cj + r + 2):
+                    if max(abs(i - ci), abs(j - cj)) == r + 1:
+                        self._prefetch(self.tile_key(i, j, camera_position), color)
+        return meshes
+
+    def triangles(self, camera_position, color):
+        """All ground triangles around the camera"""
+        meshes = self.visible_tiles(camera_position, color)
+        return [triangle for mesh in meshes for triangle in mesh[0]]
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def get_stats(self):
+        lookups = self.hits + self.misses
+        times = list(self.generation_times)
+        return {
+            "tiles": len(self._tiles),
+            "capacity": self.capacity,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "avg_generation_ms": sum(times) / len(times) * 1000 if times else 0.0,
+            "max_generation_ms": max(times) * 1000 if times else 0.0,
+        }
+
+
+if __name__ == "__main__":
+    # Fly the camera in a straight line over thousands of tiles and check
+    # that the cache (and process memory) stays bounded
+    import tracemalloc
+
+    tracemalloc.start()
+    cache = TerrainTileCache(background=True)
+    color = (60, 60, 60)
+    for step in range(2001):
+        position = (step * 37.0, 200.0, step * 11.0)
+        cache.triangles(position, color)
+        if step % 500 == 0:
+            current, _ = tracemalloc.get_traced_memory()
+            print(  # noqa: T201
+                f"step {step:5d}: {current / 1e6:6.2f} MB traced, {cache.get_stats()}"
+            )
+    cache.close()
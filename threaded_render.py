@@ -0,0 +1,162 @@
+"""
+Render thread / present thread split with double or triple buffering.
+
+The main thread keeps doing the cheap, latency-sensitive work (SDL events,
+camera update, present), while a render thread rasterizes the next frame.
+
+Handoff protocol (FrameExchange):
+1. Render thread: acquire_back() takes a free slot
+2. Render thread: fills slot.pixels, then publish(slot) makes it "ready"
+   (an older ready frame that was never shown goes back to the free list)
+3. Present thread: take_ready() swaps the ready slot in as "front" and
+   releases the previous front
+4. The front slot is never written while it is being presented
+
+With 2 slots the render thread waits for the present thread to release the
+front buffer; with 3 it can always start the next frame immediately.
+
+Latency is measured from the moment the input/camera state used by a frame
+was sampled until that frame is presented.
+"""
+
+import collections
+import copy
+import logging
+import threading
+import time
+
+import numpy as np
+
+
+class FrameSlot:
+    """One frame buffer plus the timing info travelling with it"""
+
+    def __init__(self, width, height):
+        self.pixels = np.zeros((height, width, 3), dtype=np.uint8)
+        self.frame_id = 0
+        self.input_time = 0.0  # When the state rendered in this frame was sampled
+        self.render_time = 0.0  # Seconds spent rasterizing
+
+
+class FrameExchange:
+    """Lock-protected double/triple buffer handoff"""
+
+    def __init__(self, width, height, count=3):
+        if count < 2:
+            raise ValueError("Need at least two frame slots")
+        self._free = collections.deque(FrameSlot(width, height) for _ in range(count))
+        self._ready = None
+        self._front = None
+        self._cond = threading.Condition()
+        self.frames_published = 0
+        self.frames_discarded = 0  # Rendered but replaced before being presented
+
+    def acquire_back(self, timeout=None):
+        """Render thread: get a slot to draw into (None on timeout)"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._free, timeout=timeout):
+                return None
+            return self._free.popleft()
+
+    def publish(self, slot):
+        """Render thread: hand a finished frame to the present thread"""
+        with self._cond:
+            if self._ready is not None:
+                self._free.append(self._ready)
+                self.frames_discarded += 1
+            self._ready = slot
+            self.frames_published += 1
+            self._cond.notify_all()
+
+    def take_ready(self):
+        """Present thread: newest finished frame, or None if nothing new"""
+        with self._cond:
+            if self._ready is None:
+                return None
+            if self._front is not None:
+                self._free.append(self._front)
+            self._front, self._ready = self._ready, None
+            self._cond.notify_all()
+            return self._front
+
+
+class InputState:
+    """Latest camera state, written by the main thread, read by the render thread"""
+
+    def __init__(self, camera):
+        self._lock = threading.Lock()
+        self._camera = copy.deepcopy(camera)
+        self._sample_time = time.perf_counter()
+
+    def update(self, camera):
+        snapshot = copy.deepcopy(camera)
+        with self._lock:
+            self._camera = snapshot
+            self._sample_time = time.perf_counter()
+
+    def snapshot(self):
+        with self._lock:
+            return self._camera, self._sample_time
+
+
+class LatencyStats:
+    """Input-to-present latency over a sliding window of frames"""
+
+    def __init__(self, window=120):
+        self.samples = collections.deque(maxlen=window)
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+
+    def summary(self):
+        if not self.samples:
+            return {"avg_ms": 0.0, "max_ms": 0.0, "frames": 0}
+        values = np.array(self.samples) * 1000
+        return {
+            "avg_ms": float(values.mean()),
+            "max_ms": float(values.max()),
+            "frames": len(values),
+        }
+
+
+class RenderThread(threading.Thread):
+    """Rasterizes frames from the latest input state into the exchange"""
+
+    def __init__(self, exchange, input_state, render_frame):
+        """
+        Args:
+            exchange: FrameExchange shared with the present thread
+            input_state: InputState the camera is read from
+            render_frame: Callable(pixels, camera) drawing one frame into pixels
+        """
+        super().__init__(name="render-thread", daemon=True)
+        self.exchange = exchange
+        self.input_state = input_state
+        self.render_frame = render_frame
+        self._stop_event = threading.Event()
+        self.error = None
+
+    def run(self):
+        frame_id = 0
+        try:
+            while not self._stop_event.is_set():
+                slot = self.exchange.acquire_back(timeout=0.1)
+                if slot is None:
+                    continue
+                camera, sample_time = self.input_state.snapshot()
+
+                start = time.perf_counter()
+                self.render_frame(slot.pixels, camera)
+                frame_id += 1
+                slot.frame_id = frame_id
+                slot.input_time = sample_time
+                slot.render_time = time.perf_counter() - start
+
+                self.exchange.publish(slot)
+        except Exception as e:
+            logging.exception("Render thread failed")
+            self.error = e
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()